@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for cell ID parsing on the /api/route hot path.
+
+Compares the original path (stdlib JSON decode, full CellRequest model with a
+validator that rebuilds the list of cells on every call) with the current
+model and the compiled fast path. Runs on a single core and reports
+operations per second for each variant.
+
+It then measures whole ``POST /api/route`` requests per second of CPU time
+(per core) in-process, as ``bench_hot_path.py`` does. With ``--against`` the
+``src`` of that git revision, such as the commit before the fast path, is
+measured the same way for a before/after comparison.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_cell_parsing.py [--seconds 2] [--against REVISION]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import bench_hot_path  # noqa: E402
+
+from pydantic import BaseModel, Field, field_validator  # noqa: E402
+
+from config import settings  # noqa: E402
+from models import CellRequest, json_loads, parse_cell_id  # noqa: E402
+
+
+class LegacyCellRequest(BaseModel):
+    """The model as it was before the fast path: the valid cells are rebuilt per call."""
+    cellID: str = Field(..., min_length=1, max_length=10)
+
+    @field_validator('cellID')
+    @classmethod
+    def validate_cell_id(cls, v):
+        valid_cells = list(settings.nginx_urls.keys())
+        if v not in valid_cells:
+            raise ValueError(f'cellID must be one of: {", ".join(valid_cells)}')
+        return v
+
+
+BODY = b'{"cellID": "2"}'
+
+
+def legacy(body: bytes) -> str:
+    return LegacyCellRequest(**json.loads(body)).cellID
+
+
+def model(body: bytes) -> str:
+    return CellRequest.model_validate(json_loads(body)).cellID
+
+
+def fast_path(body: bytes) -> str:
+    return parse_cell_id(json_loads(body))
+
+
+def measure(fn, seconds: float) -> float:
+    """Return calls per second of CPU time."""
+    iterations = 0
+    batch = 1000
+    start = time.process_time()
+    deadline = start + seconds
+    while time.process_time() < deadline:
+        for _ in range(batch):
+            fn(BODY)
+        iterations += batch
+    return iterations / (time.process_time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=2.0, help="CPU seconds per variant")
+    parser.add_argument("--against", help="Git revision whose /api/route is measured as the before case")
+    args = parser.parse_args()
+
+    results = {name: measure(fn, args.seconds) for name, fn in (
+        ("legacy", legacy),
+        ("model", model),
+        ("fast_path", fast_path),
+    )}
+
+    baseline = results["legacy"]
+    print(f"{'variant':<12}{'ops/s/core':>14}{'speedup':>10}")
+    for name, ops in results.items():
+        print(f"{name:<12}{ops:>14,.0f}{ops / baseline:>9.1f}x")
+
+    # Whole requests through the app, each tree in a fresh process
+    route_args = argparse.Namespace(seconds=args.seconds, concurrency=1, warmup=200, scenarios=["route_auth_off"])
+    with tempfile.TemporaryDirectory(prefix="bench-before-") as tmp:
+        trees = [("working tree", bench_hot_path.SRC)]
+        if args.against:
+            trees.insert(0, (args.against, bench_hot_path.export_src(args.against, tmp)))
+        route = {
+            name: bench_hot_path.measure_in_subprocess(src, route_args)["route_auth_off"]["rps_per_core"]
+            for name, src in trees
+        }
+
+    before = next(iter(route.values()))
+    print()
+    print(f"{'/api/route':<16}{'req/s/core':>14}{'speedup':>10}")
+    for name, rps in route.items():
+        print(f"{name:<16}{rps:>14,.0f}{rps / before:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
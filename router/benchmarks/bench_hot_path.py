@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+In-process hot-path benchmark for the router.
+
+Runs the real ``main.app`` through ``httpx.ASGITransport`` with every cell
+answered by an ``httpx.MockTransport``, so it needs no network, cluster or
+stub server and measures only the cost of the code in ``src``: middleware,
+auth, validation, routing, metrics and serialisation. Each scenario is
+driven by ``--concurrency`` client coroutines for ``--seconds`` and reports
+requests per second and latency percentiles.
+
+The working tree is compared with the ``src`` of a git revision
+(``--against``, default ``HEAD``) measured in the same run: both are
+benchmarked in fresh processes, alternating for ``--rounds`` rounds, and
+the medians are compared. Absolute numbers differ from machine to machine
+and from run to run on the same machine, so only the ratio between the two
+trees is checked; a scenario whose throughput drops or whose p50 latency
+grows by more than ``--threshold`` (15% by default) is flagged and the
+script exits with status 1. Results are written to
+``benchmarks/results/hot_path.json``.
+
+Usage:
+    python benchmarks/bench_hot_path.py [--against main] [--rounds 3] [--seconds 2] [--threshold 0.15]
+    python benchmarks/bench_hot_path.py --no-compare   # just measure the working tree
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from typing import Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "results")
+SRC = os.path.normpath(os.path.join(HERE, "..", "src"))
+
+API_KEY = "bench-key"
+UPSTREAM_BODY = b'{"cell": "stub", "status": "ok"}'
+
+# name -> (method, path, JSON body, send API key, API key auth enabled)
+SCENARIOS = {
+    "route_auth_off": ("POST", "/api/route", {"cellID": "1"}, False, False),
+    "route_auth_on": ("POST", "/api/route", {"cellID": "1"}, True, True),
+    "health": ("GET", "/health", None, False, False),
+    "metrics": ("GET", "/metrics", None, False, False),
+}
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def measure(src: str, scenarios: List[str], seconds: float, concurrency: int, warmup: int) -> Dict[str, Dict]:
+    """Benchmark the app in ``src``; runs in a fresh process per tree and round."""
+    # Configure the app before it is imported: quiet logs and a known API key
+    os.environ["LOG_LEVEL"] = "WARNING"
+    os.environ["API_KEYS_JSON"] = json.dumps({API_KEY: "bench-client"})
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    sys.path.insert(0, src)
+
+    import httpx
+    import dependencies
+    from config import settings
+    from main import app
+
+    try:
+        from cells import cell_registry as cell_ids
+    except ImportError:
+        # Trees from before the cell registry configure the cells in settings
+        cell_ids = settings.nginx_urls
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=UPSTREAM_BODY, headers={"content-type": "application/json"})
+
+    # Answer every cell from an in-memory transport instead of the network
+    for cell_id in cell_ids:
+        dependencies._http_clients[cell_id] = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+
+    async def run_scenario(name: str) -> Dict[str, float]:
+        """Drive one scenario and return its throughput and latency in milliseconds."""
+        method, path, body, send_key, auth_enabled = SCENARIOS[name]
+        settings.api_key_enabled = auth_enabled
+        headers = {"X-API-Key": API_KEY} if send_key else {}
+        latencies: List[float] = []
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://router") as client:
+            for _ in range(warmup):
+                response = await client.request(method, path, json=body, headers=headers)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{name}: {method} {path} answered {response.status_code}: {response.text}")
+
+            deadline = time.perf_counter() + seconds
+
+            async def worker():
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    await client.request(method, path, json=body, headers=headers)
+                    latencies.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+            cpu_elapsed = time.process_time() - cpu_start
+
+        latencies.sort()
+        return {
+            "rps": round(len(latencies) / elapsed, 1),
+            "rps_per_core": round(len(latencies) / cpu_elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 4),
+            "p90_ms": round(percentile(latencies, 90) * 1000, 4),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 4),
+            "requests": len(latencies),
+        }
+
+    async def run_all():
+        return {name: await run_scenario(name) for name in scenarios}
+
+    return asyncio.run(run_all())
+
+
+def measure_in_subprocess(src: str, args) -> Dict[str, Dict]:
+    command = [
+        sys.executable, __file__, "--measure", src,
+        "--seconds", str(args.seconds), "--concurrency", str(args.concurrency),
+        "--warmup", str(args.warmup), "--scenarios", *args.scenarios,
+    ]
+    # Only the tree being measured may be importable, not one from PYTHONPATH
+    env = {name: value for name, value in os.environ.items() if name != "PYTHONPATH"}
+    output = subprocess.run(command, check=True, capture_output=True, text=True, env=env).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def export_src(revision: str, destination: str) -> str:
+    """Write the ``router/src`` tree of a git revision into ``destination`` and return its path."""
+    root = subprocess.run(
+        ["git", "rev-parse", "--show-toplevel"], cwd=HERE, check=True, capture_output=True, text=True
+    ).stdout.strip()
+    prefix = os.path.relpath(SRC, root)
+    archive = subprocess.run(["git", "archive", revision, prefix], cwd=root, check=True, capture_output=True).stdout
+    subprocess.run(["tar", "-x", "-C", destination], input=archive, check=True)
+    return os.path.join(destination, prefix)
+
+
+def median_results(runs: List[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """Per scenario and metric, the median over the rounds."""
+    return {
+        name: {metric: round(statistics.median(run[name][metric] for run in runs), 4) for metric in runs[0][name]}
+        for name in runs[0]
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Return a message for every scenario that regressed beyond the threshold."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {result['rps']:,.0f} req/s vs baseline {base['rps']:,.0f}")
+        if result["p50_ms"] > base["p50_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p50 {result['p50_ms']:.3f} ms vs baseline {base['p50_ms']:.3f} ms")
+    return regressions
+
+
+def print_table(title: str, results: Dict[str, Dict]):
+    print(title)
+    print(f"{'scenario':<16}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<16}{result['rps']:>10,.0f}{result['p50_ms']:>10.3f}{result['p90_ms']:>10.3f}{result['p99_ms']:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=2.0, help="Measurement time per scenario and round")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent client coroutines")
+    parser.add_argument("--warmup", type=int, default=200, help="Unmeasured requests per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--against", default="HEAD", help="Git revision whose src is the baseline")
+    parser.add_argument("--rounds", type=int, default=3, help="Alternating measurements of each tree")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed relative regression")
+    parser.add_argument("--no-compare", action="store_true", help="Only measure the working tree")
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "hot_path.json"))
+    parser.add_argument("--measure", metavar="SRC", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.scenarios, args.seconds, args.concurrency, args.warmup)))
+        return 0
+
+    current_runs: List[Dict[str, Dict]] = []
+    baseline_runs: List[Dict[str, Dict]] = []
+    with tempfile.TemporaryDirectory(prefix="bench-baseline-") as tmp:
+        baseline_src = None if args.no_compare else export_src(args.against, tmp)
+        for round_index in range(args.rounds):
+            # Alternate which tree goes first so drift during the run hits both alike
+            order = [("current", SRC), ("baseline", baseline_src)]
+            if round_index % 2:
+                order.reverse()
+            for side, src in order:
+                if src is not None:
+                    (current_runs if side == "current" else baseline_runs).append(measure_in_subprocess(src, args))
+
+    results = median_results(current_runs)
+    print_table("working tree (median of rounds)", results)
+    baseline = None
+    if baseline_runs:
+        baseline = median_results(baseline_runs)
+        print()
+        print_table(f"{args.against} (median of rounds)", baseline)
+        print()
+
+    report = {
+        "benchmark": "hot_path",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "concurrency": args.concurrency,
+        "rounds": args.rounds,
+        "against": None if baseline is None else args.against,
+        "results": results,
+        "baseline": baseline,
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    if baseline is None:
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} of {args.against}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for encoding the /api/route response.
+
+Compares the original path (decode the upstream JSON, build a RouteResponse,
+re-validate it as the response model and render it with the stdlib encoder),
+the same path rendered with orjson, and the current path that splices the
+upstream bytes into a pre-encoded envelope. Runs on a single core and
+reports operations per second for each variant.
+
+Usage:
+    PYTHONPATH=src python benchmarks/bench_response_encoding.py [--seconds 2] [--keys 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from fastapi.responses import JSONResponse, ORJSONResponse, Response  # noqa: E402
+
+from models import RouteResponse, encode_route_response, json_loads, json_payload  # noqa: E402
+
+
+def legacy(content: bytes) -> bytes:
+    result = RouteResponse(cellID="2", upstream="nginx-2", status=200, response=json.loads(content))
+    # FastAPI validates the returned model again as the response model before encoding it
+    validated = RouteResponse.model_validate(result.model_dump())
+    return JSONResponse(validated.model_dump(mode="json")).body
+
+
+def orjson_model(content: bytes) -> bytes:
+    result = RouteResponse(cellID="2", upstream="nginx-2", status=200, response=json_loads(content))
+    validated = RouteResponse.model_validate(result.model_dump())
+    return ORJSONResponse(validated.model_dump(mode="json")).body
+
+
+def spliced(content: bytes) -> bytes:
+    result = encode_route_response("2", 200, json_payload(content))
+    return Response(result.body, media_type="application/json").body
+
+
+def measure(fn, body: bytes, seconds: float) -> float:
+    """Return calls per second of CPU time."""
+    iterations = 0
+    batch = 1000
+    start = time.process_time()
+    deadline = start + seconds
+    while time.process_time() < deadline:
+        for _ in range(batch):
+            fn(body)
+        iterations += batch
+    return iterations / (time.process_time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=2.0, help="CPU seconds per variant")
+    parser.add_argument("--keys", type=int, default=20, help="Number of keys in the upstream JSON object")
+    args = parser.parse_args()
+
+    body = json.dumps({f"field_{i}": f"value {i}" for i in range(args.keys)}).encode()
+    assert json.loads(spliced(body)) == json.loads(legacy(body))
+
+    results = {name: measure(fn, body, args.seconds) for name, fn in (
+        ("legacy", legacy),
+        ("orjson", orjson_model),
+        ("spliced", spliced),
+    )}
+
+    baseline = results["legacy"]
+    print(f"upstream body: {len(body)} bytes")
+    print(f"{'variant':<12}{'ops/s/core':>14}{'speedup':>10}")
+    for name, ops in results.items():
+        print(f"{name:<12}{ops:>14,.0f}{ops / baseline:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the router.
+
+Starts ``server.py`` as a fresh process against a local stub upstream and
+measures the time from process start until the first ``/api/route``
+request succeeds and until ``/ready`` reports ready (pools warmed and a
+health probe round done), with and without ``FAST_STARTUP``. Every cell points at
+the stub, so ``--cells`` shows how startup scales with the size of the
+registry. Runs offline.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--cells 3]
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List, Tuple
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.01)
+    raise RuntimeError(f"Nothing is listening on port {port}")
+
+
+def time_to_success(client: httpx.Client, process: subprocess.Popen, start: float, timeout: float, send) -> float:
+    """Retry a request until it answers 200 and return the seconds since ``start``."""
+    while time.perf_counter() - start < timeout:
+        try:
+            if send(client).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError(f"Router exited with code {process.returncode}")
+        time.sleep(0.005)
+    raise RuntimeError(f"No successful answer within {timeout}s")
+
+
+def time_startup(env: Dict[str, str], port: int, timeout: float) -> Tuple[float, float]:
+    """Start the router and return the seconds until the first routed request and until ready."""
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "server.py"], cwd=SRC, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=base_url, timeout=1.0) as client:
+            route = time_to_success(client, process, start, timeout,
+                                    lambda c: c.post("/api/route", json={"cellID": "1"}))
+            ready = time_to_success(client, process, start, timeout, lambda c: c.get("/ready"))
+        return route, ready
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Process starts per mode")
+    parser.add_argument("--cells", type=int, default=3, help="Number of cells in the registry")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Give up on a start after this many seconds")
+    args = parser.parse_args()
+
+    upstream_port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "stub_upstream.py"), "--port", str(upstream_port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    openapi_file = os.path.join(HERE, "results", "openapi.json")
+    os.makedirs(os.path.dirname(openapi_file), exist_ok=True)
+    subprocess.run([sys.executable, "export_openapi.py", openapi_file], cwd=SRC, check=True, stdout=subprocess.DEVNULL)
+
+    base_env = {
+        key: value for key, value in os.environ.items()
+        if not key.startswith("NGINX_") and key not in ("CELLS_FILE", "FAST_STARTUP", "OPENAPI_FILE")
+    }
+    base_env.update(LOG_LEVEL="WARNING", WORKERS="1", API_KEY_ENABLED="false")
+    for cell in range(1, args.cells + 1):
+        base_env[f"NGINX_{cell}_URL"] = f"http://127.0.0.1:{upstream_port}"
+
+    modes = {
+        "default": {},
+        "fast_startup": {"FAST_STARTUP": "true", "OPENAPI_FILE": openapi_file},
+    }
+    results: Dict[str, List[Tuple[float, float]]] = {}
+    try:
+        wait_for_port(upstream_port)
+        for name, overrides in modes.items():
+            results[name] = []
+            for _ in range(args.runs):
+                port = free_port()
+                env = dict(base_env, PORT=str(port), **overrides)
+                results[name].append(time_startup(env, port, args.timeout))
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    print(f"cells: {args.cells}, runs per mode: {args.runs}")
+    print(f"{'mode':<14}{'first route ms':>16}{'ready ms':>10}  (median, min-max)")
+    for name, runs in results.items():
+        route = [r for r, _ in runs]
+        ready = [r for _, r in runs]
+        print(
+            f"{name:<14}{statistics.median(route) * 1000:>16.0f}{statistics.median(ready) * 1000:>10.0f}"
+            f"  ({min(route) * 1000:.0f}-{max(route) * 1000:.0f}, {min(ready) * 1000:.0f}-{max(ready) * 1000:.0f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Throughput scaling benchmark for the multi-worker server.
+
+Starts a stub upstream, then for each worker count launches ``server.py``
+with ``WORKERS=<n>`` and drives ``POST /api/route`` from several load
+processes for a fixed time. Prints successful requests per second per
+worker count, and writes the results as JSON with ``--output``.
+
+Usage:
+    python benchmarks/bench_workers.py [--workers 1 2 4] [--seconds 10]
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+import multiprocessing
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+CELL_IDS = ["1", "2", "3"]
+
+
+def wait_for(url: str, timeout: float = 30.0):
+    """Wait until a URL answers 200."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+async def drive(url: str, concurrency: int, seconds: float) -> int:
+    """Send requests over keep-alive connections and count successes."""
+    ok = 0
+    deadline = time.monotonic() + seconds
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=10.0) as client:
+        async def loop():
+            nonlocal ok
+            while time.monotonic() < deadline:
+                response = await client.post(url, json={"cellID": random.choice(CELL_IDS)})
+                if response.status_code == 200:
+                    ok += 1
+
+        await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return ok
+
+
+def load_process(url: str, concurrency: int, seconds: float, results):
+    results.put(asyncio.run(drive(url, concurrency, seconds)))
+
+
+def measure(port: int, procs: int, concurrency: int, seconds: float) -> float:
+    """Run the load processes against the router and return requests per second."""
+    url = f"http://127.0.0.1:{port}/api/route"
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [context.Process(target=load_process, args=(url, concurrency, seconds, results)) for _ in range(procs)]
+    for process in processes:
+        process.start()
+    total = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return total / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--load-procs", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--concurrency", type=int, default=32, help="Connections per load process")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--upstream-port", type=int, default=9001)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    stub = subprocess.Popen([sys.executable, os.path.join(HERE, "stub_upstream.py"), "--port", str(args.upstream_port)])
+    results = []
+    try:
+        for workers in args.workers:
+            env = dict(
+                os.environ,
+                WORKERS=str(workers),
+                PORT=str(args.port),
+                HOST="127.0.0.1",
+                LOG_LEVEL="WARNING",
+                API_KEY_ENABLED="false",
+                **{f"NGINX_{cell_id}_URL": f"http://127.0.0.1:{args.upstream_port}" for cell_id in CELL_IDS},
+            )
+            env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+            server = subprocess.Popen([sys.executable, "server.py"], cwd=SRC, env=env)
+            try:
+                wait_for(f"http://127.0.0.1:{args.port}/")
+                # Let every worker finish starting before measuring
+                time.sleep(1.0)
+                rps = measure(args.port, args.load_procs, args.concurrency, args.seconds)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+            results.append({"workers": workers, "rps": round(rps, 1)})
+            print(f"workers={workers:<3} {rps:>10,.0f} req/s  ({rps / results[0]['rps']:.2f}x)", flush=True)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"benchmark": "workers", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Minimal keep-alive HTTP/1.1 server standing in for an NGINX cell.
+
+Answers every request with a small JSON body, so router benchmarks can run
+offline without a cluster. Point the router at it with
+NGINX_<n>_URL=http://127.0.0.1:<port>.
+
+Usage:
+    python benchmarks/stub_upstream.py [--port 9001] [--delay-ms 0]
+"""
+import argparse
+import asyncio
+
+RESPONSE_BODY = b'{"cell": "stub", "status": "ok"}'
+RESPONSE = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"content-type: application/json\r\n"
+    b"content-length: " + str(len(RESPONSE_BODY)).encode() + b"\r\n"
+    b"\r\n" + RESPONSE_BODY
+)
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delay: float):
+    """Serve requests on one connection until the client closes it."""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line[:15].lower() == b"content-length:":
+                    length = int(line[15:])
+            if length:
+                await reader.readexactly(length)
+            if delay:
+                await asyncio.sleep(delay)
+            writer.write(RESPONSE)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int, delay: float):
+    server = await asyncio.start_server(lambda r, w: handle(r, w, delay), host, port, backlog=2048)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Artificial latency per response")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.delay_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
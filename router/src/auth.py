@@ -1,10 +1,14 @@
 """Authentication module for API key validation."""
 import json
+import time
 import logging
 from typing import Optional, Dict
-from fastapi import HTTPException, Security, status
+from fastapi import HTTPException, Request, Security, status
 from fastapi.security import APIKeyHeader
-from config import settings
+from config import Settings, settings
+from file_watch import FileWatcher
+from key_store import ApiKeyStore, load_key_file, parse_key_document
+from timing import get_timer
 
 logger = logging.getLogger(__name__)
 
@@ -12,17 +16,25 @@ logger = logging.getLogger(__name__)
 API_KEY_HEADER = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 # Load valid API keys
-def load_api_keys() -> Dict[str, str]:
-    """Load API keys from configuration."""
+def load_api_keys() -> Dict[bytes, str]:
+    """Load hashed API keys from configuration."""
     api_keys = {}
 
     if settings.api_keys_json:
         try:
-            api_keys = json.loads(settings.api_keys_json)
+            api_keys = parse_key_document(json.loads(settings.api_keys_json))
             logger.info(f"Loaded {len(api_keys)} API keys from configuration")
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, ValueError):
             logger.error("Failed to parse API_KEYS_JSON - ensure it's valid JSON")
 
+    if settings.api_keys_file:
+        try:
+            file_keys = load_key_file(settings.api_keys_file)
+            api_keys.update(file_keys)
+            logger.info(f"Loaded {len(file_keys)} API keys from {settings.api_keys_file}")
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load API_KEYS_FILE {settings.api_keys_file}: {str(e)}")
+
     if not api_keys and settings.api_key_enabled:
         logger.warning("API authentication is enabled but no API keys are configured!")
 
@@ -30,14 +42,50 @@ def load_api_keys() -> Dict[str, str]:
 
 
 # Initialize API keys
-VALID_API_KEYS = load_api_keys()
+key_store = ApiKeyStore(load_api_keys())
+
+
+def read_api_keys(config: Settings = settings) -> Dict[bytes, str]:
+    """Read the API keys from API_KEYS_JSON and API_KEYS_FILE for a settings reload.
+
+    Unlike ``load_api_keys`` this raises ``ValueError`` or ``OSError``
+    instead of skipping a bad source, so a failed reload keeps the current keys.
+    """
+    api_keys = parse_key_document(json.loads(config.api_keys_json)) if config.api_keys_json else {}
+    if config.api_keys_file:
+        api_keys.update(load_key_file(config.api_keys_file))
+    return api_keys
 
 
-async def verify_api_key(api_key: str = Security(API_KEY_HEADER)) -> Optional[str]:
+async def reload_api_keys():
+    """Reload the API key file, keeping the keys from API_KEYS_JSON."""
+    env_keys = parse_key_document(json.loads(settings.api_keys_json)) if settings.api_keys_json else {}
+    await key_store.reload_file(settings.api_keys_file, env_keys)
+
+
+# Watches the API key file for changes, if one is configured
+key_file_watcher = (
+    FileWatcher(settings.api_keys_file, settings.api_keys_reload_interval, reload_api_keys)
+    if settings.api_keys_file else None
+)
+
+
+async def verify_api_key(request: Request, api_key: str = Security(API_KEY_HEADER)) -> Optional[str]:
     """Verify API key if authentication is enabled."""
     if not settings.api_key_enabled:
         return "anonymous"
 
+    start_time = time.perf_counter()
+    try:
+        return check_api_key(api_key)
+    finally:
+        timer = get_timer(request)
+        if timer is not None:
+            timer.add("auth", time.perf_counter() - start_time)
+
+
+def check_api_key(api_key: Optional[str]) -> str:
+    """Look up the client ID for an API key, raising 401 or 403 if it is missing or unknown."""
     if not api_key:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -45,11 +93,12 @@ async def verify_api_key(api_key: str = Security(API_KEY_HEADER)) -> Optional[st
             headers={"WWW-Authenticate": "ApiKey"},
         )
 
-    if api_key not in VALID_API_KEYS:
+    client_id = key_store.lookup(api_key)
+    if client_id is None:
         logger.warning(f"Invalid API key attempt: {api_key[:8]}...")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Invalid API key"
         )
 
-    return VALID_API_KEYS[api_key]
\ No newline at end of file
+    return client_id
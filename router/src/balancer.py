@@ -0,0 +1,196 @@
+"""Load balancing across the replica endpoints of a cell.
+
+Every request reports its latency and outcome back to the endpoint it was
+sent to, so the strategies work from the latencies the router actually
+sees rather than from a Service VIP that spreads connections blindly.
+Endpoints that fail several times in a row are ejected for a while.
+"""
+import math
+import time
+import random
+import logging
+import importlib
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from config import settings
+from cells import cell_registry, CellMap
+from metrics import upstream_endpoint_ejections
+
+logger = logging.getLogger(__name__)
+
+
+class Endpoint:
+    """A replica URL with the request statistics the strategies balance on."""
+
+    __slots__ = ("url", "outstanding", "ewma", "last_update", "consecutive_failures", "ejected_until")
+
+    def __init__(self, url: str, ewma: float = 0.0):
+        self.url = url
+        self.outstanding = 0
+        # Prior latency until the first response replaces it, so a new replica is not free
+        self.ewma = ewma
+        self.last_update = 0.0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.url!r}, outstanding={self.outstanding}, ewma={self.ewma:.4f})"
+
+    def is_available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+    def cost(self) -> float:
+        """Expected latency of one more request: EWMA latency scaled by the queue ahead of it."""
+        return self.ewma * (self.outstanding + 1)
+
+    def start(self):
+        """Record that a request was sent to this endpoint."""
+        self.outstanding += 1
+
+    def cancel(self):
+        """Record that a started request was abandoned without an outcome."""
+        self.outstanding -= 1
+
+    def finish(self, cell_id: str, latency: Optional[float], ok: bool):
+        """Record the outcome of a request started with ``start``."""
+        self.outstanding -= 1
+        now = time.monotonic()
+
+        if not ok:
+            # Count failures as slow, so a replica answering errors quickly does not attract traffic
+            latency = max(latency or 0.0, settings.balancer_failure_penalty)
+
+        if latency is not None:
+            if self.last_update:
+                # Time-decayed EWMA, so old samples fade at the same rate whatever the traffic
+                weight = math.exp(-(now - self.last_update) / settings.balancer_ewma_decay)
+                self.ewma = self.ewma * weight + latency * (1.0 - weight)
+            else:
+                self.ewma = latency
+            self.last_update = now
+
+        if ok:
+            self.consecutive_failures = 0
+            return
+
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= settings.balancer_ejection_failures and self.is_available(now):
+            self.ejected_until = now + settings.balancer_ejection_duration
+            upstream_endpoint_ejections.labels(cell_id=cell_id).inc()
+            logger.warning(
+                f"Ejected {self.url} of cell {cell_id} for {settings.balancer_ejection_duration}s "
+                f"after {self.consecutive_failures} consecutive failures"
+            )
+
+
+Strategy = Callable[["CellBalancer", Sequence[Endpoint]], Endpoint]
+
+
+def round_robin(balancer: "CellBalancer", candidates: Sequence[Endpoint]) -> Endpoint:
+    """Cycle through the endpoints in order."""
+    balancer.counter += 1
+    return candidates[balancer.counter % len(candidates)]
+
+
+def least_outstanding(balancer: "CellBalancer", candidates: Sequence[Endpoint]) -> Endpoint:
+    """Pick the endpoint with the fewest in-flight requests, breaking ties randomly."""
+    fewest = min(endpoint.outstanding for endpoint in candidates)
+    return random.choice([endpoint for endpoint in candidates if endpoint.outstanding == fewest])
+
+
+def p2c_ewma(balancer: "CellBalancer", candidates: Sequence[Endpoint]) -> Endpoint:
+    """Power of two choices: sample two endpoints and take the one with the lower cost."""
+    if len(candidates) == 1:
+        return candidates[0]
+    first, second = random.sample(candidates, 2)
+    return first if first.cost() <= second.cost() else second
+
+
+# Built-in strategies selectable with LOAD_BALANCER_STRATEGY
+STRATEGIES: Dict[str, Strategy] = {
+    "round_robin": round_robin,
+    "least_outstanding": least_outstanding,
+    "p2c_ewma": p2c_ewma,
+}
+
+
+def load_strategy(name: str) -> Strategy:
+    """Resolve a built-in strategy name or a ``module:function`` import path."""
+    if name in STRATEGIES:
+        return STRATEGIES[name]
+
+    module_name, _, attr = name.partition(":")
+    try:
+        return getattr(importlib.import_module(module_name), attr)
+    except (ImportError, AttributeError, ValueError):
+        logger.error(f"Unknown LOAD_BALANCER_STRATEGY {name!r}, using p2c_ewma")
+        return p2c_ewma
+
+
+class CellBalancer:
+    """Chooses one of a cell's replica endpoints for each request.
+
+    Ejected endpoints are skipped; if every endpoint is ejected, all of them
+    are considered again rather than failing the request outright. Hedges
+    and retries pass the endpoints already tried so they land elsewhere.
+    """
+
+    def __init__(self, cell_id: str, urls: Sequence[str], strategy: Strategy):
+        self.cell_id = cell_id
+        self.strategy = strategy
+        self.counter = -1
+        self.endpoints: Tuple[Endpoint, ...] = ()
+        self.update(urls)
+
+    def prior_latency(self) -> float:
+        """Latency to assume for a new endpoint: the mean EWMA of the cell's measured endpoints."""
+        measured = [endpoint.ewma for endpoint in self.endpoints if endpoint.last_update]
+        return sum(measured) / len(measured) if measured else settings.balancer_initial_latency
+
+    def update(self, urls: Sequence[str]):
+        """Replace the endpoint list, keeping the statistics of URLs that remain."""
+        existing = {endpoint.url: endpoint for endpoint in self.endpoints}
+        prior = self.prior_latency()
+        self.endpoints = tuple(existing.get(url) or Endpoint(url, prior) for url in urls)
+
+    def pick(self, exclude: Sequence[Endpoint] = ()) -> Endpoint:
+        """Choose the endpoint for the next request, avoiding ``exclude`` if possible."""
+        endpoints = self.endpoints
+        if len(endpoints) == 1:
+            return endpoints[0]
+
+        now = time.monotonic()
+        candidates = [endpoint for endpoint in endpoints if endpoint.is_available(now)] or list(endpoints)
+        if exclude:
+            candidates = [endpoint for endpoint in candidates if endpoint not in exclude] or candidates
+        return self.strategy(self, candidates)
+
+
+# Strategy used by all cells
+strategy = load_strategy(settings.load_balancer_strategy)
+
+# Balancer registry, one per cell
+_balancers: Dict[str, CellBalancer] = {}
+
+
+def get_balancer(cell_id: str) -> Optional[CellBalancer]:
+    """Get or create the balancer for a cell, or None if the cell has no endpoints."""
+    balancer = _balancers.get(cell_id)
+    if balancer is None:
+        urls = cell_registry.urls(cell_id)
+        if not urls:
+            return None
+        balancer = _balancers[cell_id] = CellBalancer(cell_id, urls, strategy)
+    return balancer
+
+
+def update_balancers(old: CellMap, new: CellMap):
+    """Registry listener keeping the balancers in step with the cell registry."""
+    for cell_id, balancer in list(_balancers.items()):
+        urls = new.get(cell_id)
+        if not urls:
+            del _balancers[cell_id]
+        elif urls != old.get(cell_id):
+            balancer.update(urls)
+
+
+cell_registry.subscribe(update_balancers)
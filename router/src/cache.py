@@ -0,0 +1,136 @@
+"""In-process TTL/LRU cache for upstream cell responses."""
+import json
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+from fastapi import Request
+from config import settings
+from metrics import cache_hits, cache_misses, cache_evictions, cache_size_bytes
+
+logger = logging.getLogger(__name__)
+
+# Cache-Control directives that forbid storing a response in a shared cache
+UNCACHEABLE_DIRECTIVES = {"no-store", "no-cache", "private"}
+
+
+class CacheEntry(NamedTuple):
+    """A cached value with its accounting data."""
+    cell_id: str
+    value: Any
+    size: int
+    expires_at: float
+
+
+class ResponseCache:
+    """LRU cache bounded by the total size of the cached bodies, with per-entry expiry."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, cell_id: str) -> Optional[Any]:
+        """Return the cached value for a key, or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            cache_misses.labels(cell_id=cell_id).inc()
+            return None
+
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            cache_misses.labels(cell_id=cell_id).inc()
+            return None
+
+        self._entries.move_to_end(key)
+        cache_hits.labels(cell_id=cell_id).inc()
+        return entry.value
+
+    def set(self, key: Hashable, cell_id: str, value: Any, size: int, ttl: float):
+        """Store a value, evicting least recently used entries to stay within the size bound."""
+        if ttl <= 0 or size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = CacheEntry(cell_id, value, size, time.monotonic() + ttl)
+        self.size += size
+
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+            cache_evictions.labels(cell_id=evicted.cell_id).inc()
+
+        cache_size_bytes.set(self.size)
+
+    def clear(self):
+        """Drop every entry."""
+        self._entries.clear()
+        self.size = 0
+        cache_size_bytes.set(0)
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+        cache_size_bytes.set(self.size)
+
+
+def load_cache_ttls() -> Dict[str, float]:
+    """Load per-cell cache TTLs from configuration."""
+    if not settings.cache_ttl_json:
+        return {}
+
+    try:
+        return {cell_id: float(ttl) for cell_id, ttl in json.loads(settings.cache_ttl_json).items()}
+    except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+        logger.error("Failed to parse CACHE_TTL_JSON - ensure it's a JSON object of cell ID to seconds")
+        return {}
+
+
+# Initialize per-cell TTLs and the headers that are part of the cache key
+CELL_CACHE_TTLS = load_cache_ttls()
+VARY_HEADERS = tuple(h.strip().lower() for h in settings.cache_vary_headers.split(",") if h.strip())
+
+
+def cache_key(cell_id: str, client_id: str, request: Request) -> Tuple:
+    """Build the cache key: the cell ID plus the configured parts of the request."""
+    key = (cell_id, client_id if settings.cache_vary_client else None)
+    if VARY_HEADERS:
+        key += tuple(request.headers.get(name) for name in VARY_HEADERS)
+    return key
+
+
+def cache_ttl(cell_id: str, cache_control: Optional[str]) -> float:
+    """Resolve how long a response may be cached.
+
+    ``Cache-Control`` from the cell takes precedence over the configured TTL:
+    ``no-store``, ``no-cache`` and ``private`` disable caching, ``s-maxage``
+    and ``max-age`` set the TTL.
+    """
+    ttl = CELL_CACHE_TTLS.get(cell_id, settings.cache_ttl)
+    if not cache_control:
+        return ttl
+
+    directives = {}
+    for directive in cache_control.lower().split(","):
+        name, _, value = directive.strip().partition("=")
+        directives[name] = value.strip('"')
+
+    if UNCACHEABLE_DIRECTIVES & directives.keys():
+        return 0.0
+
+    for name in ("s-maxage", "max-age"):
+        if name in directives:
+            try:
+                return float(directives[name])
+            except ValueError:
+                return 0.0
+    return ttl
+
+
+# Global response cache instance
+response_cache = ResponseCache(settings.cache_max_bytes)
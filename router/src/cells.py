@@ -0,0 +1,249 @@
+"""Cell registry: the single source of truth for which cells exist and where they live.
+
+Cells come from ``CELLS_FILE`` when it is set, otherwise from the
+``NGINX_<n>_URL`` settings. The file is either a mapping of cell ID to
+URL(s)::
+
+    {"cells": {"1": "http://nginx-1", "2": ["http://nginx-2a", "http://nginx-2b"],
+               "3": {"urls": ["http://nginx-3"], "weight": 2}}}
+
+or a Kubernetes ``Endpoints`` / ``EndpointsList`` document, where each
+Endpoints object is one cell identified by its ``cell-id`` label and every
+ready address becomes a replica URL on the port named or numbered
+``CELL_PORT``.
+"""
+import json
+import asyncio
+import logging
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple, Union
+from config import Settings, settings
+from file_watch import FileWatcher
+
+logger = logging.getLogger(__name__)
+
+CellMap = Mapping[str, Tuple[str, ...]]
+RegistryListener = Callable[[CellMap, CellMap], None]
+
+# Number of cell IDs listed in validation errors before the list is shortened
+MAX_LISTED_CELLS = 20
+
+# Length limits of a cell ID, enforced on requests (see models.py) and on cell files
+CELL_ID_MIN_LENGTH = 1
+CELL_ID_MAX_LENGTH = 10
+
+
+def _as_urls(value: Union[str, List[str], Dict[str, Any]]) -> Tuple[str, ...]:
+    if isinstance(value, str):
+        return tuple(url.strip().rstrip("/") for url in value.split(",") if url.strip())
+    if isinstance(value, dict):
+        return _as_urls(value.get("urls", value.get("url", [])))
+    if isinstance(value, list):
+        if not all(isinstance(url, str) for url in value):
+            raise ValueError(f"Invalid cell URL list, every URL must be a string: {value!r}")
+        return tuple(url.rstrip("/") for url in value)
+    raise ValueError(f"Invalid cell URL entry: {value!r}")
+
+
+def select_ports(ports: List[Mapping[str, Any]], port: str) -> List[Mapping[str, Any]]:
+    """Pick the Endpoints ports named or numbered ``port``; a single port is used whatever its name."""
+    if len(ports) == 1:
+        return ports
+    return [candidate for candidate in ports if port in (candidate.get("name"), str(candidate.get("port")))]
+
+
+def parse_endpoints(document: Mapping[str, Any], cell_id_label: str, port: str = "http") -> Dict[str, Tuple[str, ...]]:
+    """Build cells from a Kubernetes Endpoints or EndpointsList document.
+
+    Each Endpoints object must carry the cell ID in its ``cell_id_label``
+    label; objects without one are skipped, since object names rarely make
+    valid cell IDs.
+    """
+    items = document.get("items", []) if document.get("kind") == "EndpointsList" else [document]
+    cells = {}
+    for item in items:
+        metadata = item.get("metadata", {})
+        cell_id = metadata.get("labels", {}).get(cell_id_label)
+        if not cell_id:
+            logger.warning(f"Skipping Endpoints {metadata.get('name')!r} without a {cell_id_label!r} label")
+            continue
+
+        urls = []
+        for subset in item.get("subsets", []):
+            for selected in select_ports(subset.get("ports", []), port):
+                scheme = "https" if selected.get("name") == "https" or selected.get("port") == 443 else "http"
+                for address in subset.get("addresses", []):
+                    urls.append(f"{scheme}://{address['ip']}:{selected['port']}")
+        cells[str(cell_id)] = tuple(urls)
+    return cells
+
+
+def parse_cell_document(
+    document: Mapping[str, Any],
+    cell_id_label: str = "cell-id",
+    port: str = "http"
+) -> Dict[str, Tuple[str, ...]]:
+    """Parse a cell file document into a cell ID to replica URLs mapping.
+
+    Cells whose ID could never pass request validation are logged and left out.
+    """
+    if not isinstance(document, Mapping):
+        raise ValueError("Cell document must be a JSON object")
+
+    if document.get("kind") in ("Endpoints", "EndpointsList"):
+        cells = parse_endpoints(document, cell_id_label, port)
+    else:
+        cells = {str(cell_id): _as_urls(value) for cell_id, value in document.get("cells", document).items()}
+
+    invalid = [cell_id for cell_id in cells if not CELL_ID_MIN_LENGTH <= len(cell_id) <= CELL_ID_MAX_LENGTH]
+    if invalid:
+        logger.warning(
+            f"Skipping cells with IDs longer than {CELL_ID_MAX_LENGTH} characters or empty: {', '.join(sorted(invalid))}"
+        )
+        for cell_id in invalid:
+            del cells[cell_id]
+
+    empty = [cell_id for cell_id, urls in cells.items() if not urls]
+    if empty:
+        logger.warning(f"Cells without endpoints: {', '.join(sorted(empty))}")
+    return cells
+
+
+def parse_cell_weights(document: Mapping[str, Any]) -> Dict[str, float]:
+    """Read the consistent-hash weights of cells given as ``{"urls": [...], "weight": 2}``.
+
+    Cells without a weight get the default weight of 1.
+    """
+    if document.get("kind") in ("Endpoints", "EndpointsList"):
+        return {}
+    return {
+        str(cell_id): float(value["weight"])
+        for cell_id, value in document.get("cells", document).items()
+        if isinstance(value, dict) and "weight" in value
+    }
+
+
+def load_cell_file(path: str, config: Settings = settings) -> Tuple[Dict[str, Tuple[str, ...]], Dict[str, float]]:
+    """Read and parse a cell file into cells and weights."""
+    with open(path, "rb") as f:
+        document = json.load(f)
+    return parse_cell_document(document, config.cell_id_label, config.cell_port), parse_cell_weights(document)
+
+
+def cells_from_settings(config: Settings = settings) -> Dict[str, Tuple[str, ...]]:
+    """Build cells from the NGINX_<n>_URL settings."""
+    return {cell_id: _as_urls(url) for cell_id, url in config.nginx_urls.items()}
+
+
+def read_cells(config: Settings = settings) -> Tuple[Dict[str, Tuple[str, ...]], Dict[str, float]]:
+    """Read the cells and weights to reload: CELLS_FILE, or the NGINX_<n>_URL settings without one.
+
+    Raises ``OSError``, ``ValueError`` or ``KeyError`` for a cell file that
+    cannot be read or parsed.
+    """
+    if config.cells_file:
+        return load_cell_file(config.cells_file, config)
+    return cells_from_settings(config), {}
+
+
+class CellRegistry:
+    """Immutable snapshot of the configured cells, swapped atomically on reload.
+
+    Lookups are dict and frozenset operations on the current snapshot, so
+    they stay O(1) with thousands of cells and never take a lock. Listeners
+    registered with ``subscribe`` are called with the old and new cell maps
+    after every swap.
+    """
+
+    def __init__(
+        self,
+        cells: Optional[Mapping[str, Tuple[str, ...]]] = None,
+        weights: Optional[Mapping[str, float]] = None
+    ):
+        self._listeners: List[RegistryListener] = []
+        self._set(cells or {}, weights or {})
+
+    def _set(self, cells: Mapping[str, Tuple[str, ...]], weights: Mapping[str, float]):
+        self.cells: CellMap = MappingProxyType(dict(cells))
+        self.weights: Mapping[str, float] = MappingProxyType({
+            cell_id: weight for cell_id, weight in weights.items() if cell_id in self.cells
+        })
+        self.cell_ids = frozenset(self.cells)
+        listed = sorted(self.cells, key=lambda cell_id: (len(cell_id), cell_id))
+        if len(listed) > MAX_LISTED_CELLS:
+            listed = listed[:MAX_LISTED_CELLS] + [f"... ({len(self.cells) - MAX_LISTED_CELLS} more)"]
+        self.invalid_cell_message = f'cellID must be one of: {", ".join(listed)}'
+
+    def __contains__(self, cell_id: object) -> bool:
+        return cell_id in self.cell_ids
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.cells)
+
+    def urls(self, cell_id: str) -> Tuple[str, ...]:
+        """Return the replica URLs of a cell, or an empty tuple for an unknown cell."""
+        return self.cells.get(cell_id, ())
+
+    def url(self, cell_id: str) -> Optional[str]:
+        """Return the primary URL of a cell, or None for an unknown cell."""
+        urls = self.cells.get(cell_id)
+        return urls[0] if urls else None
+
+    def weight(self, cell_id: str) -> float:
+        """Return the consistent-hash weight of a cell."""
+        return self.weights.get(cell_id, 1.0)
+
+    def subscribe(self, listener: RegistryListener):
+        """Call ``listener(old_cells, new_cells)`` after every reload."""
+        self._listeners.append(listener)
+
+    def replace(self, cells: Mapping[str, Tuple[str, ...]], weights: Optional[Mapping[str, float]] = None):
+        """Atomically swap in a new set of cells and notify listeners."""
+        old, old_weights = self.cells, self.weights
+        self._set(cells, weights or {})
+        if dict(old) == dict(self.cells) and dict(old_weights) == dict(self.weights):
+            return
+
+        added = self.cell_ids - old.keys()
+        removed = old.keys() - self.cell_ids
+        logger.info(f"Cell registry updated: {len(self.cells)} cells, {len(added)} added, {len(removed)} removed")
+        for listener in self._listeners:
+            try:
+                listener(old, self.cells)
+            except Exception as e:
+                logger.error(f"Cell registry listener failed: {str(e)}")
+
+    async def reload_file(self, path: str):
+        """Load a cell file in a worker thread and swap it in."""
+        self.replace(*await asyncio.to_thread(load_cell_file, path))
+
+
+def load_cells() -> Tuple[Dict[str, Tuple[str, ...]], Dict[str, float]]:
+    """Load the initial cells and weights from CELLS_FILE, falling back to the settings."""
+    if settings.cells_file:
+        try:
+            cells, weights = load_cell_file(settings.cells_file)
+            logger.info(f"Loaded {len(cells)} cells from {settings.cells_file}")
+            return cells, weights
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Failed to load CELLS_FILE {settings.cells_file}, using NGINX_<n>_URL settings: {str(e)}")
+    return cells_from_settings(), {}
+
+
+# Global cell registry instance
+cell_registry = CellRegistry(*load_cells())
+
+
+async def reload_cells():
+    """Reload CELLS_FILE into the global registry."""
+    await cell_registry.reload_file(settings.cells_file)
+
+
+# Watches the cell file for changes, if one is configured
+cell_file_watcher = (
+    FileWatcher(settings.cells_file, settings.cells_reload_interval, reload_cells)
+    if settings.cells_file else None
+)
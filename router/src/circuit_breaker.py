@@ -0,0 +1,105 @@
+"""Per-cell circuit breakers for fast-failing requests to broken upstreams."""
+import time
+import logging
+from typing import Dict
+from config import settings
+from metrics import circuit_breaker_state, circuit_breaker_transitions
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+
+class CircuitBreaker:
+    """Circuit breaker with closed, open and half-open states.
+
+    The circuit opens after ``failure_threshold`` consecutive failures. Once
+    ``recovery_timeout`` seconds have passed, up to ``half_open_max_calls``
+    trial requests are let through: a success closes the circuit again, a
+    failure re-opens it.
+    """
+
+    def __init__(self, cell_id: str, failure_threshold: int, recovery_timeout: float, half_open_max_calls: int):
+        self.cell_id = cell_id
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        circuit_breaker_state.labels(cell_id=cell_id).set(STATE_VALUES[CLOSED])
+
+    def _transition(self, new_state: str):
+        """Move to a new state and export the transition."""
+        old_state = self.state
+        self.state = new_state
+        if new_state == OPEN:
+            self.opened_at = time.monotonic()
+        self.half_open_calls = 0
+        circuit_breaker_state.labels(cell_id=self.cell_id).set(STATE_VALUES[new_state])
+        circuit_breaker_transitions.labels(cell_id=self.cell_id, from_state=old_state, to_state=new_state).inc()
+        logger.warning(f"Circuit breaker for nginx-{self.cell_id} changed from {old_state} to {new_state}")
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a trial request through."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.recovery_timeout - time.monotonic())
+
+    def allow_request(self) -> bool:
+        """Return whether a request may be sent to the upstream."""
+        if self.state == CLOSED:
+            return True
+
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                return False
+            self._transition(HALF_OPEN)
+
+        if self.half_open_calls < self.half_open_max_calls:
+            self.half_open_calls += 1
+            return True
+        return False
+
+    def record_success(self):
+        """Record a request that reached the upstream."""
+        if self.state == HALF_OPEN:
+            self._transition(CLOSED)
+        self.failures = 0
+
+    def record_failure(self):
+        """Record a timeout or connection error."""
+        if self.state == HALF_OPEN:
+            self._transition(OPEN)
+            return
+
+        self.failures += 1
+        if self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._transition(OPEN)
+
+    def release(self):
+        """Give back a half-open trial slot for a request with no upstream outcome."""
+        if self.state == HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+
+# Circuit breakers by cell ID
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(cell_id: str) -> CircuitBreaker:
+    """Get or create the circuit breaker for a cell."""
+    breaker = _breakers.get(cell_id)
+    if breaker is None:
+        breaker = _breakers[cell_id] = CircuitBreaker(
+            cell_id,
+            failure_threshold=settings.circuit_breaker_failure_threshold,
+            recovery_timeout=settings.circuit_breaker_recovery_timeout,
+            half_open_max_calls=settings.circuit_breaker_half_open_max_calls,
+        )
+    return breaker
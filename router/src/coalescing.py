@@ -0,0 +1,100 @@
+"""Single-flight coalescing of identical concurrent upstream calls.
+
+The upstream call is made once, with the headers of the request that started
+it. A key function that includes the client sets ``per_client = True``; calls
+coalesced by any other key are shared across clients, so they are sent without
+the client-specific ``X-Client-ID`` and ``X-Forwarded-For`` headers rather than
+with the first caller's. Upstreams that answer per client need a per-client key.
+"""
+import asyncio
+import logging
+import importlib
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from fastapi import Request
+from config import settings
+from metrics import coalesced_requests
+
+logger = logging.getLogger(__name__)
+
+KeyFunction = Callable[[str, str, Request], Hashable]
+
+
+def key_by_cell(cell_id: str, client_id: str, request: Request) -> Hashable:
+    """Coalesce every concurrent request for the same cell."""
+    return cell_id
+
+
+def key_by_cell_and_client(cell_id: str, client_id: str, request: Request) -> Hashable:
+    """Coalesce concurrent requests for the same cell from the same client."""
+    return cell_id, client_id
+
+
+key_by_cell_and_client.per_client = True
+
+# Built-in key functions selectable with COALESCE_KEY
+KEY_FUNCTIONS: Dict[str, KeyFunction] = {
+    "cell": key_by_cell,
+    "cell_client": key_by_cell_and_client,
+}
+
+
+def load_key_function(name: str) -> KeyFunction:
+    """Resolve a built-in key function name or a ``module:function`` import path."""
+    if name in KEY_FUNCTIONS:
+        return KEY_FUNCTIONS[name]
+
+    module_name, _, attr = name.partition(":")
+    try:
+        return getattr(importlib.import_module(module_name), attr)
+    except (ImportError, AttributeError, ValueError):
+        logger.error(f"Unknown COALESCE_KEY {name!r}, coalescing by cell and client")
+        return key_by_cell_and_client
+
+
+def is_per_client(key_function: KeyFunction) -> bool:
+    """Return whether calls coalesced by ``key_function`` are only shared by requests from the same client."""
+    return getattr(key_function, "per_client", False)
+
+
+class SingleFlight:
+    """Shares one in-flight call between concurrent callers with the same key.
+
+    The call runs in its own task, so a caller that goes away (for example a
+    disconnected client) does not cancel it for the others. At most
+    ``max_waiters`` callers join a call; the next caller starts a fresh one.
+    """
+
+    def __init__(self, max_waiters: int):
+        self.max_waiters = max_waiters
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, cell_id: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fn`` or join the identical call already in flight."""
+        task = self._calls.get(key)
+        if task is not None and self._waiters[key] < self.max_waiters:
+            self._waiters[key] += 1
+            coalesced_requests.labels(cell_id=cell_id).inc()
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        self._waiters[key] = 0
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+        # Mark the outcome as retrieved when every caller went away before it finished
+        if not task.cancelled():
+            task.exception()
+
+
+# Global single-flight group and key function
+single_flight = SingleFlight(settings.coalesce_max_waiters)
+coalesce_key = load_key_function(settings.coalesce_key)
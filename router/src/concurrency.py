@@ -0,0 +1,154 @@
+"""Adaptive per-cell concurrency limits with a short bounded queue.
+
+Each cell's limit follows AIMD on observed upstream latency: it grows by
+about one per round trip while latency stays within ``tolerance`` times the
+recent minimum, and is cut by ``backoff`` when latency climbs past that or
+requests fail. Requests over the limit wait in a small queue for at most
+``queue_timeout`` seconds and are shed with a 503 otherwise, so an
+overloaded cell fails fast instead of queueing work until it times out.
+"""
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, Optional
+from config import settings
+from metrics import concurrency_limit, concurrency_inflight, concurrency_queue_depth, concurrency_rejections
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed because the cell is at its concurrency limit."""
+
+    def __init__(self, cell_id: str, reason: str):
+        super().__init__(f"nginx-{cell_id} is at its concurrency limit ({reason})")
+        self.reason = reason
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for one cell, with a FIFO queue of waiting requests."""
+
+    def __init__(
+        self,
+        cell_id: str,
+        initial_limit: float,
+        min_limit: float,
+        max_limit: float,
+        tolerance: float,
+        backoff: float,
+        queue_size: int,
+        queue_timeout: float,
+        min_rtt_window: float,
+    ):
+        self.cell_id = cell_id
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.min_rtt_window = min_rtt_window
+        self.inflight = 0
+        self.min_rtt: Optional[float] = None
+        self.min_rtt_reset_at = 0.0
+        self.last_decrease = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        self._limit_gauge = concurrency_limit.labels(cell_id=cell_id)
+        self._inflight_gauge = concurrency_inflight.labels(cell_id=cell_id)
+        self._queue_gauge = concurrency_queue_depth.labels(cell_id=cell_id)
+        self._limit_gauge.set(self.limit)
+
+    async def acquire(self):
+        """Take a slot, waiting briefly in the queue if the cell is at its limit.
+
+        Raises ``Overloaded`` when the queue is full or the wait times out.
+        """
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            self._inflight_gauge.set(self.inflight)
+            return
+
+        if len(self._waiters) >= self.queue_size:
+            self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._queue_gauge.set(len(self._waiters))
+        try:
+            # A slot handed over by release() is already counted in inflight
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject("queue_timeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._queue_gauge.set(len(self._waiters))
+
+    def _reject(self, reason: str):
+        concurrency_rejections.labels(cell_id=self.cell_id, reason=reason).inc()
+        raise Overloaded(self.cell_id, reason)
+
+    def release(self, latency: Optional[float], ok: bool):
+        """Return a slot and adjust the limit from the request's latency and outcome."""
+        now = time.monotonic()
+        if ok and latency is not None:
+            if self.min_rtt is None or latency < self.min_rtt or now >= self.min_rtt_reset_at:
+                if now >= self.min_rtt_reset_at:
+                    self.min_rtt_reset_at = now + self.min_rtt_window
+                self.min_rtt = latency
+
+        if ok and latency is not None and latency <= self.min_rtt * self.tolerance:
+            # Additive increase, only while the limit is actually being used
+            if self.inflight >= self.limit / 2:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        elif now - self.last_decrease >= (latency or self.min_rtt or 0.0):
+            # Multiplicative decrease, at most once per round trip
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self.last_decrease = now
+        self._limit_gauge.set(self.limit)
+
+        self._release_slot()
+
+    def abandon(self):
+        """Return a slot without adjusting the limit, for requests cancelled by the client."""
+        self._release_slot()
+
+    def _release_slot(self):
+        # Hand the slot straight to the next waiter while under the limit
+        while self._waiters and self.inflight <= int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._queue_gauge.set(len(self._waiters))
+                return
+        self.inflight -= 1
+        self._inflight_gauge.set(self.inflight)
+
+
+# Limiter registry, one per cell
+_limiters: Dict[str, AdaptiveLimiter] = {}
+
+
+def get_limiter(cell_id: str) -> AdaptiveLimiter:
+    """Get or create the concurrency limiter for a cell."""
+    limiter = _limiters.get(cell_id)
+    if limiter is None:
+        limiter = _limiters[cell_id] = AdaptiveLimiter(
+            cell_id,
+            initial_limit=settings.concurrency_initial_limit,
+            min_limit=settings.concurrency_min_limit,
+            max_limit=settings.concurrency_max_limit,
+            tolerance=settings.concurrency_latency_tolerance,
+            backoff=settings.concurrency_backoff,
+            queue_size=settings.concurrency_queue_size,
+            queue_timeout=settings.concurrency_queue_timeout,
+            min_rtt_window=settings.concurrency_min_rtt_window,
+        )
+    return limiter
@@ -1,27 +1,140 @@
 """Configuration management for the router application."""
 import os
-from typing import Dict, List
+import re
+from typing import Any, Dict, List
+from dotenv import dotenv_values
 from pydantic_settings import BaseSettings
 from pydantic import Field, field_validator
 
 
+# Only numbered cells, so unrelated variables such as NGINX_PROXY_URL are not taken for cells
+NGINX_URL_ENV = re.compile(r"^NGINX_(\d+)_URL$", re.IGNORECASE)
+
+
+def nginx_urls_from_env() -> Dict[str, str]:
+    """Read the cell URLs from NGINX_<n>_URL environment variables at instantiation."""
+    urls = {
+        "1": "http://nginx-1-nginx-cell.nginx.svc.cluster.local",
+        "2": "http://nginx-2-nginx-cell.nginx.svc.cluster.local",
+        "3": "http://nginx-3-nginx-cell.nginx.svc.cluster.local",
+    }
+    for name, value in os.environ.items():
+        match = NGINX_URL_ENV.match(name)
+        if match:
+            urls[match.group(1)] = value
+    return urls
+
+
 class Settings(BaseSettings):
     """Application settings with validation."""
 
     # API Authentication
     api_key_enabled: bool = Field(default=False, env="API_KEY_ENABLED")
     api_keys_json: str = Field(default="", env="API_KEYS_JSON")
+    api_keys_file: str = Field(default="", env="API_KEYS_FILE")
+    api_keys_reload_interval: float = Field(default=5.0, env="API_KEYS_RELOAD_INTERVAL")
 
-    # Upstream services
-    nginx_urls: Dict[str, str] = {
-        "1": os.getenv("NGINX_1_URL", "http://nginx-1-nginx-cell.nginx.svc.cluster.local"),
-        "2": os.getenv("NGINX_2_URL", "http://nginx-2-nginx-cell.nginx.svc.cluster.local"),
-        "3": os.getenv("NGINX_3_URL", "http://nginx-3-nginx-cell.nginx.svc.cluster.local"),
-    }
+    # Upstream services (see cells.py; CELLS_FILE takes precedence over NGINX_<n>_URL)
+    nginx_urls: Dict[str, str] = Field(default_factory=nginx_urls_from_env)
+    cells_file: str = Field(default="", env="CELLS_FILE")
+    cells_reload_interval: float = Field(default=5.0, env="CELLS_RELOAD_INTERVAL")
+    cell_id_label: str = Field(default="cell-id", env="CELL_ID_LABEL")
+    # Port of Endpoints objects in CELLS_FILE to route to, by name or number
+    cell_port: str = Field(default="http", env="CELL_PORT")
+
+    # Load balancing across the replica endpoints of a cell
+    load_balancer_strategy: str = Field(default="p2c_ewma", env="LOAD_BALANCER_STRATEGY")
+    balancer_ewma_decay: float = Field(default=10.0, env="BALANCER_EWMA_DECAY")
+    balancer_ejection_failures: int = Field(default=3, env="BALANCER_EJECTION_FAILURES")
+    balancer_ejection_duration: float = Field(default=30.0, env="BALANCER_EJECTION_DURATION")
+    # Latency assumed for a replica with no samples when its cell has none either,
+    # and the least latency recorded for a failed request
+    balancer_initial_latency: float = Field(default=0.1, env="BALANCER_INITIAL_LATENCY")
+    balancer_failure_penalty: float = Field(default=1.0, env="BALANCER_FAILURE_PENALTY")
+
+    # Consistent-hash routing of arbitrary routing keys (POST /api/route/key)
+    hash_ring_vnodes: int = Field(default=100, env="HASH_RING_VNODES")
+    hash_ring_cache_size: int = Field(default=65536, env="HASH_RING_CACHE_SIZE")
+
+    # Hedged requests and budgeted retries (connection failures only)
+    hedge_enabled: bool = Field(default=False, env="HEDGE_ENABLED")
+    hedge_delay: float = Field(default=0.0, env="HEDGE_DELAY")
+    hedge_percentile: float = Field(default=0.95, env="HEDGE_PERCENTILE")
+    hedge_min_delay: float = Field(default=0.005, env="HEDGE_MIN_DELAY")
+    retry_enabled: bool = Field(default=False, env="RETRY_ENABLED")
+    retry_max_attempts: int = Field(default=2, env="RETRY_MAX_ATTEMPTS")
+    retry_budget_ratio: float = Field(default=0.1, env="RETRY_BUDGET_RATIO")
+    retry_budget_min_per_second: float = Field(default=1.0, env="RETRY_BUDGET_MIN_PER_SECOND")
+
+    # Adaptive per-cell concurrency limits (AIMD on upstream latency) and load shedding
+    concurrency_limit_enabled: bool = Field(default=False, env="CONCURRENCY_LIMIT_ENABLED")
+    concurrency_initial_limit: float = Field(default=20.0, env="CONCURRENCY_INITIAL_LIMIT")
+    concurrency_min_limit: float = Field(default=1.0, env="CONCURRENCY_MIN_LIMIT")
+    concurrency_max_limit: float = Field(default=200.0, env="CONCURRENCY_MAX_LIMIT")
+    concurrency_latency_tolerance: float = Field(default=2.0, env="CONCURRENCY_LATENCY_TOLERANCE")
+    concurrency_backoff: float = Field(default=0.9, env="CONCURRENCY_BACKOFF")
+    concurrency_queue_size: int = Field(default=50, env="CONCURRENCY_QUEUE_SIZE")
+    concurrency_queue_timeout: float = Field(default=0.1, env="CONCURRENCY_QUEUE_TIMEOUT")
+    concurrency_min_rtt_window: float = Field(default=30.0, env="CONCURRENCY_MIN_RTT_WINDOW")
+
+    # Per-phase request timing (histograms always, Server-Timing header on request)
+    phase_timing_enabled: bool = Field(default=True, env="PHASE_TIMING_ENABLED")
+    server_timing_enabled: bool = Field(default=False, env="SERVER_TIMING_ENABLED")
 
     # Request configuration
     request_timeout: float = Field(default=30.0, env="REQUEST_TIMEOUT")
 
+    # Upstream connection pools (defaults for every cell, see CELL_POOLS_JSON for overrides)
+    pool_max_connections: int = Field(default=100, env="POOL_MAX_CONNECTIONS")
+    pool_max_keepalive_connections: int = Field(default=20, env="POOL_MAX_KEEPALIVE_CONNECTIONS")
+    pool_keepalive_expiry: float = Field(default=5.0, env="POOL_KEEPALIVE_EXPIRY")
+    pool_http2: bool = Field(default=False, env="POOL_HTTP2")
+    cell_pools_json: str = Field(default="", env="CELL_POOLS_JSON")
+
+    # Connections opened to each replica before /ready, then kept alive (see prewarm.py)
+    pool_prewarm_connections: int = Field(default=2, env="POOL_PREWARM_CONNECTIONS")
+    pool_prewarm_timeout: float = Field(default=5.0, env="POOL_PREWARM_TIMEOUT")
+    pool_keepalive_interval: float = Field(default=2.5, env="POOL_KEEPALIVE_INTERVAL")
+
+    # Background upstream health monitoring
+    health_check_interval: float = Field(default=10.0, env="HEALTH_CHECK_INTERVAL")
+    health_check_jitter: float = Field(default=0.1, env="HEALTH_CHECK_JITTER")
+    health_check_timeout: float = Field(default=5.0, env="HEALTH_CHECK_TIMEOUT")
+    health_check_concurrency: int = Field(default=100, env="HEALTH_CHECK_CONCURRENCY")
+
+    # Per-cell circuit breaker
+    circuit_breaker_enabled: bool = Field(default=True, env="CIRCUIT_BREAKER_ENABLED")
+    circuit_breaker_failure_threshold: int = Field(default=5, env="CIRCUIT_BREAKER_FAILURE_THRESHOLD")
+    circuit_breaker_recovery_timeout: float = Field(default=30.0, env="CIRCUIT_BREAKER_RECOVERY_TIMEOUT")
+    circuit_breaker_half_open_max_calls: int = Field(default=1, env="CIRCUIT_BREAKER_HALF_OPEN_MAX_CALLS")
+
+    # Response cache
+    cache_enabled: bool = Field(default=False, env="CACHE_ENABLED")
+    cache_max_bytes: int = Field(default=64 * 1024 * 1024, env="CACHE_MAX_BYTES")
+    cache_ttl: float = Field(default=1.0, env="CACHE_TTL")
+    cache_ttl_json: str = Field(default="", env="CACHE_TTL_JSON")
+    cache_vary_client: bool = Field(default=True, env="CACHE_VARY_CLIENT")
+    cache_vary_headers: str = Field(default="", env="CACHE_VARY_HEADERS")
+
+    # Request coalescing (single-flight) of identical concurrent upstream calls.
+    # COALESCE_KEY=cell shares calls across clients, which are then sent without
+    # X-Client-ID and X-Forwarded-For; the default cell_client keeps them
+    coalesce_enabled: bool = Field(default=False, env="COALESCE_ENABLED")
+    coalesce_key: str = Field(default="cell_client", env="COALESCE_KEY")
+    coalesce_max_waiters: int = Field(default=100, env="COALESCE_MAX_WAITERS")
+
+    # Per-client, per-cell token-bucket rate limiting; limits apply per worker
+    # process, so with WORKERS > 1 a client can reach WORKERS times the rate
+    rate_limit_enabled: bool = Field(default=False, env="RATE_LIMIT_ENABLED")
+    rate_limit_rate: float = Field(default=50.0, gt=0, env="RATE_LIMIT_RATE")
+    rate_limit_burst: float = Field(default=100.0, ge=1, env="RATE_LIMIT_BURST")
+    rate_limits_json: str = Field(default="", env="RATE_LIMITS_JSON")
+    rate_limit_idle_ttl: float = Field(default=300.0, env="RATE_LIMIT_IDLE_TTL")
+
+    # Batch routing
+    batch_max_items: int = Field(default=100, env="BATCH_MAX_ITEMS")
+    batch_concurrency: int = Field(default=10, env="BATCH_CONCURRENCY")
+
     # Application metadata
     app_name: str = "Cell Router API"
     app_version: str = "1.0.0"
@@ -30,7 +143,22 @@ class Settings(BaseSettings):
     # Server configuration
     host: str = "0.0.0.0"
     port: int = 8000
+    workers: int = Field(default=1, env="WORKERS")
     log_level: str = Field(default="INFO", env="LOG_LEVEL")
+    log_format: str = Field(default="text", env="LOG_FORMAT")
+    log_queue_size: int = Field(default=10000, env="LOG_QUEUE_SIZE")
+    log_sampling_json: str = Field(default="", env="LOG_SAMPLING_JSON")
+
+    # Startup: FAST_STARTUP creates cell pools on first use and never generates the
+    # OpenAPI schema in-process (docs are only served from a pre-built OPENAPI_FILE)
+    fast_startup: bool = Field(default=False, env="FAST_STARTUP")
+    docs_enabled: bool = Field(default=True, env="DOCS_ENABLED")
+    openapi_file: str = Field(default="", env="OPENAPI_FILE")
+
+    # Live reload (see live_reload.py): a dotenv-style file whose values override
+    # the environment, re-read when it changes and on SIGHUP
+    settings_file: str = Field(default="", env="SETTINGS_FILE")
+    settings_reload_interval: float = Field(default=5.0, env="SETTINGS_RELOAD_INTERVAL")
 
     @field_validator("api_key_enabled", mode='before')
     @classmethod
@@ -46,5 +174,32 @@ class Settings(BaseSettings):
         case_sensitive = False
 
 
-# Global settings instance
-settings = Settings()
\ No newline at end of file
+def load_settings(path: str) -> Settings:
+    """Build settings from the environment, overridden by the values in a dotenv-style file.
+
+    ``NGINX_<n>_URL`` entries in the file are added to the ones from the
+    environment. Raises ``OSError`` if the file cannot be read and
+    ``pydantic.ValidationError`` for invalid values.
+    """
+    with open(path) as f:
+        values = dotenv_values(stream=f)
+
+    overrides: Dict[str, Any] = {}
+    urls: Dict[str, str] = {}
+    for name, value in values.items():
+        if value is None:
+            continue
+        match = NGINX_URL_ENV.match(name)
+        if match:
+            urls[match.group(1)] = value
+        elif name.lower() in Settings.model_fields:
+            overrides[name.lower()] = value
+    if urls:
+        overrides["nginx_urls"] = {**nginx_urls_from_env(), **urls}
+    return Settings(**overrides)
+
+
+# Global settings instance; modules keep a reference to it, so a reload updates it in place
+settings = Settings()
+if settings.settings_file:
+    settings = load_settings(settings.settings_file)
\ No newline at end of file
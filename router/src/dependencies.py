@@ -1,23 +1,161 @@
 """Shared dependencies for the application."""
+import ssl
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, Optional, Set
 import httpx
-from functools import lru_cache
-from config import settings
+from config import Settings, settings
+from cells import cell_registry, CellMap
 
-# Global HTTP client instance
-_http_client = None
+logger = logging.getLogger(__name__)
 
+# Pool settings that may be overridden per cell
+POOL_OPTIONS = ("max_connections", "max_keepalive_connections", "keepalive_expiry", "http2")
 
-async def get_http_client() -> httpx.AsyncClient:
-    """Get or create the global HTTP client."""
-    global _http_client
-    if _http_client is None:
-        _http_client = httpx.AsyncClient(timeout=settings.request_timeout)
-    return _http_client
+# HTTP client instances, one connection pool per cell
+_http_clients: Dict[str, httpx.AsyncClient] = {}
+
+# Drain tasks of pools of removed or reconfigured cells, referenced until they finish
+_closing: Set[asyncio.Task] = set()
+
+# Seconds between checks whether a draining pool has finished its requests
+DRAIN_POLL_INTERVAL = 0.1
+
+# TLS context shared by every pool; building one per client loads the CA bundle each time
+_ssl_context: Optional[ssl.SSLContext] = None
+
+
+def load_pool_overrides(config: Settings = settings) -> Dict[str, Dict[str, Any]]:
+    """Load per-cell connection pool overrides from configuration."""
+    overrides = {}
+
+    if config.cell_pools_json:
+        try:
+            overrides = json.loads(config.cell_pools_json)
+        except json.JSONDecodeError:
+            logger.error("Failed to parse CELL_POOLS_JSON - ensure it's valid JSON")
+            return {}
+
+    if not isinstance(overrides, dict):
+        logger.error("Failed to parse CELL_POOLS_JSON - expected a JSON object of cell ID to pool options")
+        return {}
+
+    for cell_id, options in list(overrides.items()):
+        if not isinstance(options, dict):
+            logger.warning(f"Ignoring pool options for cell {cell_id}: expected a JSON object, got {options!r}")
+            del overrides[cell_id]
+            continue
+        unknown = set(options) - set(POOL_OPTIONS)
+        if unknown:
+            logger.warning(f"Ignoring unknown pool options for cell {cell_id}: {', '.join(sorted(unknown))}")
+            for key in unknown:
+                del options[key]
+
+    return overrides
+
+
+# Initialize per-cell pool overrides
+CELL_POOL_OVERRIDES = load_pool_overrides()
+
+
+def get_pool_config(cell_id: str) -> Dict[str, Any]:
+    """Get the connection pool settings for a cell."""
+    config = {
+        "max_connections": settings.pool_max_connections,
+        "max_keepalive_connections": settings.pool_max_keepalive_connections,
+        "keepalive_expiry": settings.pool_keepalive_expiry,
+        "http2": settings.pool_http2,
+    }
+    config.update(CELL_POOL_OVERRIDES.get(cell_id, {}))
+    return config
+
+
+def get_ssl_context() -> ssl.SSLContext:
+    """Get the TLS context shared by all upstream pools, creating it on first use."""
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = httpx.create_ssl_context()
+    return _ssl_context
+
+
+def create_http_client(cell_id: str) -> httpx.AsyncClient:
+    """Create an HTTP client with its own connection pool for a cell."""
+    config = get_pool_config(cell_id)
+    limits = httpx.Limits(
+        max_connections=config["max_connections"],
+        max_keepalive_connections=config["max_keepalive_connections"],
+        keepalive_expiry=config["keepalive_expiry"],
+    )
+    options = dict(timeout=settings.request_timeout, limits=limits, verify=get_ssl_context())
+
+    try:
+        return httpx.AsyncClient(http2=config["http2"], **options)
+    except ImportError:
+        logger.warning(f"HTTP/2 requested for cell {cell_id!r} but the 'h2' package is not installed, using HTTP/1.1")
+        return httpx.AsyncClient(**options)
+
+
+async def get_http_client(cell_id: Optional[str] = None) -> httpx.AsyncClient:
+    """Get or create the HTTP client for a cell.
+
+    Without a cell ID the shared client with the default pool settings is returned.
+    """
+    key = cell_id or ""
+    client = _http_clients.get(key)
+    if client is None:
+        client = _http_clients[key] = create_http_client(key)
+    return client
 
 
 async def close_http_client():
-    """Close the global HTTP client."""
-    global _http_client
-    if _http_client:
-        await _http_client.aclose()
-        _http_client = None
+    """Close all HTTP clients."""
+    clients = list(_http_clients.values())
+    _http_clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+async def drain_http_client(client: httpx.AsyncClient, timeout: float):
+    """Close a client once none of its connections is serving a request, or after ``timeout`` seconds."""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    deadline = time.monotonic() + timeout
+    while pool is not None and time.monotonic() < deadline:
+        if all(connection.is_idle() or connection.is_closed() for connection in pool.connections):
+            break
+        await asyncio.sleep(DRAIN_POLL_INTERVAL)
+    await client.aclose()
+
+
+def retire_clients(cell_ids: Iterable[str]):
+    """Take the cells' pools out of use and drain them in the background.
+
+    Requests already holding a client finish on it; new requests get a fresh
+    pool from ``get_http_client``.
+    """
+    retired = [_http_clients.pop(cell_id) for cell_id in cell_ids if cell_id in _http_clients]
+    if not retired:
+        return
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    for client in retired:
+        task = loop.create_task(drain_http_client(client, settings.request_timeout))
+        _closing.add(task)
+        task.add_done_callback(_closing.discard)
+
+
+def retire_changed_cell_clients(old: CellMap, new: CellMap):
+    """Registry listener draining the pools of cells that were removed or whose URLs changed."""
+    retire_clients(cell_id for cell_id, urls in old.items() if new.get(cell_id) != urls)
+
+
+def retire_reconfigured_clients(old_configs: Dict[str, Dict[str, Any]]):
+    """Drain the pools whose settings differ from the ones they were created with."""
+    retire_clients([cell_id for cell_id, config in old_configs.items() if get_pool_config(cell_id) != config])
+
+
+cell_registry.subscribe(retire_changed_cell_clients)
@@ -0,0 +1,34 @@
+"""Export the OpenAPI schema for ``OPENAPI_FILE``.
+
+Run when the image is built so that pods serve ``/openapi.json`` from the file
+instead of generating the schema, which ``FAST_STARTUP`` never does in-process.
+
+Usage:
+    python export_openapi.py openapi.json
+"""
+import os
+import sys
+
+# Generate the schema even if a pre-built one is configured in this environment
+os.environ.pop("OPENAPI_FILE", None)
+os.environ.pop("FAST_STARTUP", None)
+
+from fastapi import FastAPI  # noqa: E402
+
+from main import app  # noqa: E402
+from models import json_dumps  # noqa: E402
+
+
+def main() -> int:
+    if len(sys.argv) != 2:
+        print(__doc__.strip(), file=sys.stderr)
+        return 2
+
+    with open(sys.argv[1], "wb") as f:
+        f.write(json_dumps(FastAPI.openapi(app)))
+    print(f"Wrote OpenAPI schema to {sys.argv[1]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""Polling file watcher for hot-reloading configuration files."""
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FileSignature = Optional[Tuple[int, int, int]]
+
+
+def file_signature(path: str) -> FileSignature:
+    """Identify a file version by inode, size and modification time.
+
+    The inode changes when a Kubernetes secret or ConfigMap volume swaps its
+    symlinked data directory, even if size and mtime happen to match.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class FileWatcher:
+    """Calls ``on_change`` whenever the watched file changes.
+
+    ``stat`` runs in a worker thread so a slow volume never blocks the event
+    loop. Errors raised by ``on_change`` are logged and the previous version
+    stays active.
+    """
+
+    def __init__(self, path: str, interval: float, on_change: Callable[[], Awaitable[None]]):
+        self.path = path
+        self.interval = interval
+        self.on_change = on_change
+        self.signature: FileSignature = file_signature(path)
+        self._task: Optional[asyncio.Task] = None
+
+    async def check(self) -> bool:
+        """Run ``on_change`` if the file changed since the last check."""
+        signature = await asyncio.to_thread(file_signature, self.path)
+        if signature is None or signature == self.signature:
+            return False
+
+        self.signature = signature
+        try:
+            await self.on_change()
+        except Exception as e:
+            logger.error(f"Failed to reload {self.path}, keeping the previous version: {str(e)}")
+            return False
+        return True
+
+    async def run(self):
+        """Poll the file forever."""
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    def start(self):
+        """Start the background polling task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name=f"watch:{self.path}")
+
+    async def stop(self):
+        """Stop the background polling task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,108 @@
+"""Consistent-hash ring mapping arbitrary routing keys to cells.
+
+Every cell owns ``HASH_RING_VNODES * weight`` points on a 64-bit ring and a
+key belongs to the first point at or after its hash, so adding or removing
+one of N cells moves only about 1/N of the keys. Lookups are a binary
+search over a sorted list, memoised per ring in a bounded LRU cache.
+"""
+import bisect
+import struct
+import asyncio
+import hashlib
+import logging
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional, Set, Tuple
+from config import settings
+from cells import cell_registry, CellMap
+
+logger = logging.getLogger(__name__)
+
+
+def hash_key(key: str) -> int:
+    """Hash a key to a position on the 64-bit ring."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+def vnode_points(cell_id: str, count: int) -> Tuple[int, ...]:
+    """Positions of a cell's virtual nodes, all read from one extendable-output hash."""
+    return struct.unpack(f">{count}Q", hashlib.shake_128(cell_id.encode()).digest(8 * count))
+
+
+class HashRing:
+    """Immutable consistent-hash ring; build a new one when the cells change."""
+
+    def __init__(self, weights: Mapping[str, float], vnodes: int, cache_size: int = 0):
+        owners: Dict[int, str] = {}
+        for cell_id, weight in sorted(weights.items()):
+            if weight > 0:
+                owners.update(dict.fromkeys(vnode_points(cell_id, max(1, round(vnodes * weight))), cell_id))
+
+        self._hashes: List[int] = sorted(owners)
+        self._cells: List[str] = [owners[point] for point in self._hashes]
+        self.cell_ids = frozenset(self._cells)
+        if cache_size:
+            self.lookup = lru_cache(maxsize=cache_size)(self.lookup)
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the cell owning a routing key, or None if the ring is empty."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect_left(self._hashes, hash_key(key))
+        return self._cells[index if index < len(self._cells) else 0]
+
+
+def build_ring(cells: CellMap) -> HashRing:
+    """Build a ring from the cells that have endpoints."""
+    weights = {cell_id: cell_registry.weight(cell_id) for cell_id, urls in cells.items() if urls}
+    return HashRing(weights, settings.hash_ring_vnodes, settings.hash_ring_cache_size)
+
+
+# Global ring, replaced as a whole whenever the registry changes
+hash_ring = build_ring(cell_registry.cells)
+
+# Incremented on every registry change so a slow rebuild never replaces a newer ring
+_generation = 0
+
+# Rebuild tasks in progress, referenced until they finish
+_builds: Set[asyncio.Task] = set()
+
+
+def swap_ring(ring: HashRing, generation: int):
+    global hash_ring
+    if generation == _generation:
+        hash_ring = ring
+        logger.info(f"Rebuilt hash ring: {len(ring.cell_ids)} cells, {len(ring)} points")
+
+
+def rebuild_ring(old: CellMap, new: CellMap):
+    """Registry listener building a ring for the new cells.
+
+    With thousands of cells a build takes long enough to stall the event
+    loop, so it runs in a worker thread and the old ring keeps serving until
+    the new one is ready.
+    """
+    global _generation
+    _generation += 1
+    generation = _generation
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        swap_ring(build_ring(new), generation)
+        return
+
+    async def build():
+        try:
+            swap_ring(await asyncio.to_thread(build_ring, new), generation)
+        except Exception as e:
+            logger.error(f"Failed to rebuild hash ring: {str(e)}")
+
+    task = loop.create_task(build())
+    _builds.add(task)
+    task.add_done_callback(_builds.discard)
+
+
+cell_registry.subscribe(rebuild_ring)
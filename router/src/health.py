@@ -3,8 +3,10 @@ import logging
 from fastapi import APIRouter, HTTPException
 from models import HealthResponse
 from config import settings
-from auth import VALID_API_KEYS
-from dependencies import get_http_client
+from cells import cell_registry
+import auth
+from upstream_monitor import monitor
+from prewarm import warmer
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["health"])
@@ -12,24 +14,28 @@ router = APIRouter(tags=["health"])
 
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint with upstream status."""
-    http_client = await get_http_client()
+    """Health check endpoint with upstream status from the background monitor."""
+    snapshot = monitor.snapshot
     upstream_status = {}
-    
-    for cell_id, url in settings.nginx_urls.items():
-        try:
-            response = await http_client.get(f"{url}/health", timeout=5)
-            upstream_status[f"nginx-{cell_id}"] = "healthy" if response.status_code == 200 else "unhealthy"
-        except Exception as e:
-            logger.warning(f"Health check failed for nginx-{cell_id}: {str(e)}")
-            upstream_status[f"nginx-{cell_id}"] = "unreachable"
-    
+    upstream_latency = {}
+    upstream_endpoints = {}
+
+    for cell_id in cell_registry:
+        state = snapshot.get(cell_id)
+        upstream_status[f"nginx-{cell_id}"] = state.status if state else "unknown"
+        if state and state.latency is not None:
+            upstream_latency[f"nginx-{cell_id}"] = round(state.latency * 1000, 3)
+        if state and state.endpoints:
+            upstream_endpoints[f"nginx-{cell_id}"] = state.endpoints
+
     return HealthResponse(
         status="healthy",
         version=settings.app_version,
         upstreams=upstream_status,
+        upstream_latency_ms=upstream_latency,
+        upstream_endpoints=upstream_endpoints,
         auth_enabled=settings.api_key_enabled,
-        auth_configured=bool(VALID_API_KEYS) if settings.api_key_enabled else True
+        auth_configured=bool(auth.key_store) if settings.api_key_enabled else True
     )
 
 
@@ -37,20 +43,18 @@ async def health_check():
 async def readiness_check():
     """Readiness probe endpoint."""
     # Check auth configuration
-    if settings.api_key_enabled and not VALID_API_KEYS:
+    if settings.api_key_enabled and not auth.key_store:
         raise HTTPException(
             status_code=503,
             detail="Authentication enabled but no API keys configured"
         )
-    
-    # Check upstream availability
-    http_client = await get_http_client()
-    for cell_id, url in settings.nginx_urls.items():
-        try:
-            response = await http_client.get(f"{url}/health", timeout=5)
-            if response.status_code == 200:
-                return {"status": "ready", "auth_enabled": settings.api_key_enabled}
-        except Exception:
-            continue
-    
+
+    # Wait for the upstream connection pools to be warmed up
+    if warmer.warming:
+        raise HTTPException(status_code=503, detail="Warming up upstream connection pools")
+
+    # Check upstream availability from the last probe round
+    if monitor.is_ready():
+        return {"status": "ready", "auth_enabled": settings.api_key_enabled}
+
     raise HTTPException(status_code=503, detail="No healthy upstreams available")
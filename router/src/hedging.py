@@ -0,0 +1,192 @@
+"""Hedged requests and budgeted retries against slow or failing replicas.
+
+A hedge is a duplicate attempt started when the first one has not answered
+within the cell's recent latency percentile; whichever answers first wins
+and the other is cancelled. A retry is a new attempt after a failure that
+never reached the upstream (connection errors), so it is always safe to
+repeat. Hedges and retries both draw from one global budget that earns a
+fraction of a token per request, so extra attempts cannot multiply load
+during an outage.
+"""
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+import httpx
+from config import settings
+from metrics import extra_attempts, extra_attempt_wins, retry_budget_exhausted
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Failures where the request never reached the upstream
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Latency samples kept per cell, and how often the percentile is recomputed
+LATENCY_WINDOW = 1000
+PERCENTILE_REFRESH = 50
+MIN_LATENCY_SAMPLES = 20
+
+
+class RetryBudget:
+    """Allows extra attempts up to ``ratio`` of requests, plus ``min_per_second`` for low traffic."""
+
+    def __init__(self, ratio: float, min_per_second: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max(10.0, min_per_second * 10)
+        self.tokens = self.max_tokens
+        self.updated = time.monotonic()
+
+    def _refill(self, earned: float):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + earned + (now - self.updated) * self.min_per_second)
+        self.updated = now
+
+    def deposit(self):
+        """Earn budget for one original request."""
+        self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        """Spend budget on one extra attempt; return False if the budget is exhausted."""
+        self._refill(0.0)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        retry_budget_exhausted.inc()
+        return False
+
+
+class LatencyTracker:
+    """Sliding window of a cell's upstream latencies with a cached percentile."""
+
+    def __init__(self, percentile: float):
+        self.percentile = percentile
+        self.samples: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.value: Optional[float] = None
+        self._since_refresh = 0
+
+    def record(self, latency: float):
+        self.samples.append(latency)
+        self._since_refresh += 1
+        if self._since_refresh >= PERCENTILE_REFRESH or self.value is None:
+            self._since_refresh = 0
+            if len(self.samples) >= MIN_LATENCY_SAMPLES:
+                ordered = sorted(self.samples)
+                self.value = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+
+
+# Global retry budget shared by all cells
+retry_budget = RetryBudget(settings.retry_budget_ratio, settings.retry_budget_min_per_second)
+
+# Latency tracker registry, one per cell
+_trackers: Dict[str, LatencyTracker] = {}
+
+
+def get_tracker(cell_id: str) -> LatencyTracker:
+    """Get or create the latency tracker for a cell."""
+    tracker = _trackers.get(cell_id)
+    if tracker is None:
+        tracker = _trackers[cell_id] = LatencyTracker(settings.hedge_percentile)
+    return tracker
+
+
+def hedge_delay(cell_id: str) -> Optional[float]:
+    """Seconds to wait before hedging, or None while there is no latency estimate yet."""
+    if settings.hedge_delay > 0:
+        return settings.hedge_delay
+    observed = get_tracker(cell_id).value
+    return None if observed is None else max(settings.hedge_min_delay, observed)
+
+
+def can_retry(cell_id: str, error: BaseException, retries_left: int) -> bool:
+    """Return whether a failed attempt may be retried, spending retry budget if so."""
+    if retries_left <= 0 or not isinstance(error, RETRYABLE_ERRORS) or not retry_budget.withdraw():
+        return False
+    logger.warning(f"Retrying request to nginx-{cell_id} after {type(error).__name__}")
+    extra_attempts.labels(cell_id=cell_id, kind="retry").inc()
+    return True
+
+
+async def call_with_hedging(cell_id: str, attempt: Callable[[], Awaitable[T]], hedge: bool = True) -> T:
+    """Run ``attempt`` with optional hedging and budgeted retries; return the first success.
+
+    ``attempt`` is called once per try and should pick a different replica
+    each time. The error of the last failed attempt is raised when nothing
+    succeeds.
+    """
+    retry_budget.deposit()
+    retries = settings.retry_max_attempts if settings.retry_enabled else 0
+    if hedge and settings.hedge_enabled:
+        delay = hedge_delay(cell_id)
+        if delay is not None:
+            return await _race(cell_id, attempt, delay, retries)
+
+    # Without hedging the attempts run one after another in the caller's task
+    tracker = get_tracker(cell_id)
+    retried = False
+    while True:
+        start_time = time.perf_counter()
+        try:
+            result = await attempt()
+        except Exception as e:
+            if not can_retry(cell_id, e, retries):
+                raise
+            retries -= 1
+            retried = True
+            continue
+        tracker.record(time.perf_counter() - start_time)
+        if retried:
+            extra_attempt_wins.labels(cell_id=cell_id, kind="retry").inc()
+        return result
+
+
+async def _race(cell_id: str, attempt: Callable[[], Awaitable[T]], delay: float, retries: int) -> T:
+    """Run attempts as tasks, hedging once after ``delay``; the first success wins."""
+    tracker = get_tracker(cell_id)
+    started: Dict[asyncio.Task, float] = {}
+    kinds: Dict[asyncio.Task, str] = {}
+
+    def launch(kind: str):
+        task = asyncio.ensure_future(attempt())
+        started[task] = time.perf_counter()
+        kinds[task] = kind
+
+    launch("original")
+    timeout: Optional[float] = delay
+
+    try:
+        while True:
+            pending = {task for task in started if not task.done()}
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # The first attempt is slow: hedge once, then wait for whichever answers first
+                timeout = None
+                if retry_budget.withdraw():
+                    extra_attempts.labels(cell_id=cell_id, kind="hedge").inc()
+                    launch("hedge")
+                continue
+
+            winner = next((task for task in done if task.exception() is None), None)
+            if winner is not None:
+                tracker.record(time.perf_counter() - started[winner])
+                if kinds[winner] != "original":
+                    extra_attempt_wins.labels(cell_id=cell_id, kind=kinds[winner]).inc()
+                return winner.result()
+
+            if any(not task.done() for task in started):
+                continue
+            error = next(iter(done)).exception()
+            if not can_retry(cell_id, error, retries):
+                raise error
+            retries -= 1
+            launch("retry")
+    finally:
+        for task in started:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # Mark the errors of losing attempts as retrieved
+                task.exception()
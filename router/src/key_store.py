@@ -0,0 +1,83 @@
+"""Hashed API key store with atomic hot reload."""
+import sys
+import json
+import hashlib
+import asyncio
+import logging
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Prefix marking an entry that is already a hex SHA-256 digest of the key
+HASH_PREFIX = "sha256:"
+
+
+def hash_api_key(api_key: str) -> bytes:
+    """Hash an API key for storage and lookup."""
+    return hashlib.sha256(api_key.encode()).digest()
+
+
+def parse_key_document(document: Mapping[str, str]) -> Dict[bytes, str]:
+    """Convert a key-to-client mapping into a hash-to-client mapping.
+
+    Keys written as ``sha256:<hex digest>`` are stored as given, any other
+    key is treated as plaintext and hashed; the plaintext is not kept.
+    """
+    if not isinstance(document, Mapping):
+        raise ValueError("API key document must be a JSON object of key to client ID")
+
+    hashed = {}
+    for key, client_id in document.items():
+        if key.startswith(HASH_PREFIX):
+            hashed[bytes.fromhex(key[len(HASH_PREFIX):])] = client_id
+        else:
+            hashed[hash_api_key(key)] = client_id
+    return hashed
+
+
+def load_key_file(path: str) -> Dict[bytes, str]:
+    """Read and hash the API keys in a JSON file."""
+    with open(path, "rb") as f:
+        return parse_key_document(json.load(f))
+
+
+class ApiKeyStore:
+    """API keys held only as SHA-256 digests.
+
+    Lookups read an immutable snapshot; a reload builds a new snapshot and
+    swaps the reference in one assignment, so verification never takes a lock
+    and in-flight requests always see a complete key set.
+    """
+
+    def __init__(self, keys: Optional[Mapping[bytes, str]] = None):
+        self._keys = MappingProxyType(dict(keys or {}))
+
+    @classmethod
+    def from_plaintext(cls, keys: Mapping[str, str]) -> "ApiKeyStore":
+        """Build a store from a plaintext key-to-client mapping."""
+        return cls(parse_key_document(keys))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def lookup(self, api_key: str) -> Optional[str]:
+        """Return the client ID for an API key, or None if the key is unknown."""
+        return self._keys.get(hash_api_key(api_key))
+
+    def replace(self, keys: Mapping[bytes, str]):
+        """Atomically swap in a new set of hashed keys."""
+        self._keys = MappingProxyType(dict(keys))
+
+    async def reload_file(self, path: str, extra_keys: Optional[Mapping[bytes, str]] = None):
+        """Load a key file in a worker thread and swap it in."""
+        keys = dict(extra_keys or {})
+        keys.update(await asyncio.to_thread(load_key_file, path))
+        self.replace(keys)
+        logger.info(f"Reloaded {len(keys)} API keys from {path}")
+
+
+if __name__ == "__main__":
+    # Print the hashed form of a key, for use in an API key file
+    for key in sys.argv[1:] or [sys.stdin.readline().strip()]:
+        print(f"{HASH_PREFIX}{hash_api_key(key).hex()}")
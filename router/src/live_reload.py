@@ -0,0 +1,147 @@
+"""Live reload of settings, upstreams and API keys without a restart.
+
+A reload runs on SIGHUP and whenever ``SETTINGS_FILE`` changes. The new
+``Settings``, and the cells, API keys and pool options derived from them, are
+built and validated in a worker thread; if any of that fails the running
+configuration stays in place. Otherwise the settings are copied into the
+existing ``settings`` object, which every module already holds a reference
+to, and the derived state is swapped in with them in one step:
+
+- the cell registry is rebuilt from ``CELLS_FILE`` or the ``NGINX_<n>_URL``
+  settings; pools of unchanged cells are kept, while pools of removed cells or
+  cells with new URLs drain their in-flight requests before closing
+- pools whose ``POOL_*`` or ``CELL_POOLS_JSON`` settings changed are replaced
+  the same way
+- the API keys are reloaded
+- ``REQUEST_TIMEOUT`` applies from the next upstream request
+
+Settings in ``RESTART_REQUIRED`` are captured when the process starts; changes
+to them are logged and ignored until the next restart.
+"""
+import signal
+import asyncio
+import logging
+from typing import Any, Dict, NamedTuple, Optional, Set, Tuple
+from config import Settings, settings, load_settings
+from file_watch import FileWatcher
+import auth
+import cells
+import dependencies
+
+logger = logging.getLogger(__name__)
+
+RESTART_REQUIRED = frozenset({
+    # Server, logging and application metadata
+    "host", "port", "workers", "log_level", "log_format", "log_queue_size", "log_sampling_json",
+    "app_name", "app_version", "app_description", "fast_startup", "docs_enabled", "openapi_file",
+    # Watched files and their poll intervals
+    "settings_file", "settings_reload_interval", "cells_file", "cells_reload_interval",
+    "api_keys_file", "api_keys_reload_interval",
+    # Read once when the module or the per-cell state is created
+    "load_balancer_strategy", "hash_ring_vnodes", "hash_ring_cache_size", "health_check_concurrency",
+    "hedge_percentile", "retry_budget_ratio", "retry_budget_min_per_second",
+    "concurrency_initial_limit", "concurrency_min_limit", "concurrency_max_limit",
+    "concurrency_latency_tolerance", "concurrency_backoff", "concurrency_queue_size",
+    "concurrency_queue_timeout", "concurrency_min_rtt_window",
+    "circuit_breaker_failure_threshold", "circuit_breaker_recovery_timeout",
+    "circuit_breaker_half_open_max_calls",
+    "cache_max_bytes", "cache_ttl_json", "cache_vary_headers", "coalesce_key", "coalesce_max_waiters",
+    "rate_limit_rate", "rate_limit_burst", "rate_limits_json", "rate_limit_idle_ttl", "batch_max_items",
+})
+
+# One reload at a time; created on first use inside the running loop
+_lock: Optional[asyncio.Lock] = None
+
+# Reloads started from the signal handler, referenced until they finish
+_tasks: Set[asyncio.Task] = set()
+
+
+def build_settings() -> Settings:
+    """Build and validate new settings from the environment and SETTINGS_FILE."""
+    return load_settings(settings.settings_file) if settings.settings_file else Settings()
+
+
+class PreparedReload(NamedTuple):
+    """Everything a reload swaps in, built before any of it is applied."""
+    settings: Settings
+    applied: Set[str]
+    ignored: Set[str]
+    pool_overrides: Dict[str, Dict[str, Any]]
+    cells: Dict[str, Tuple[str, ...]]
+    weights: Dict[str, float]
+    api_keys: Dict[bytes, str]
+
+
+def prepare_reload() -> PreparedReload:
+    """Build the new settings and the state derived from them, raising if any of it is invalid."""
+    new = build_settings()
+
+    changed = {name for name in Settings.model_fields if getattr(new, name) != getattr(settings, name)}
+    ignored = changed & RESTART_REQUIRED
+    for name in ignored:
+        setattr(new, name, getattr(settings, name))
+
+    return PreparedReload(
+        new, changed - ignored, ignored,
+        dependencies.load_pool_overrides(new), *cells.read_cells(new), auth.read_api_keys(new),
+    )
+
+
+async def reload_settings():
+    """Rebuild the settings off the event loop and apply them, keeping the old ones if they are invalid."""
+    global _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+
+    async with _lock:
+        reload = await asyncio.to_thread(prepare_reload)
+        if reload.ignored:
+            logger.warning(f"Settings changed that only apply after a restart: {', '.join(sorted(reload.ignored))}")
+
+        # Swap everything in one step; nothing below awaits or validates anything
+        old_pool_configs = {cell_id: dependencies.get_pool_config(cell_id) for cell_id in dependencies._http_clients}
+        settings.__dict__.update(reload.settings.__dict__)
+        dependencies.CELL_POOL_OVERRIDES = reload.pool_overrides
+        dependencies.retire_reconfigured_clients(old_pool_configs)
+        cells.cell_registry.replace(reload.cells, reload.weights)
+        auth.key_store.replace(reload.api_keys)
+
+        applied = sorted(reload.applied)
+        logger.info(f"Reloaded settings: {', '.join(applied) if applied else 'no changes'}")
+
+
+async def _reload_logged():
+    try:
+        await reload_settings()
+    except Exception as e:
+        logger.error(f"Failed to reload settings, keeping the previous version: {str(e)}")
+
+
+def handle_sighup():
+    """Signal handler starting a reload in the background."""
+    task = asyncio.get_running_loop().create_task(_reload_logged())
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def install_signal_handler() -> bool:
+    """Reload on SIGHUP; returns False where signal handlers cannot be installed (such as a non-main thread)."""
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, handle_sighup)
+    except (NotImplementedError, RuntimeError, ValueError, AttributeError):
+        return False
+    return True
+
+
+def remove_signal_handler():
+    try:
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+    except (NotImplementedError, RuntimeError, ValueError, AttributeError):
+        pass
+
+
+# Watches the settings file for changes, if one is configured
+settings_file_watcher = (
+    FileWatcher(settings.settings_file, settings.settings_reload_interval, reload_settings)
+    if settings.settings_file else None
+)
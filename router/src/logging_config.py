@@ -1,23 +1,122 @@
-"""Logging configuration for the application."""
-import logging
+"""Logging configuration for the application.
+
+Records are put on a bounded queue by the calling coroutine and written to
+stdout by a background thread, so a slow log collector never blocks the
+event loop. When the queue is full, records are dropped and counted in
+``router_log_records_dropped_total`` instead.
+"""
 import sys
+import json
+import queue
+import atexit
+import random
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
 from config import settings
+from metrics import log_records_dropped
+
+try:
+    import orjson
+
+    def json_dumps(data) -> str:
+        return orjson.dumps(data, default=str).decode()
+except ImportError:  # pragma: no cover - orjson is an optional speed-up
+    def json_dumps(data) -> str:
+        return json.dumps(data, default=str)
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Background listener writing queued records, started once by setup_logging
+_listener: Optional[QueueListener] = None
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that never blocks: records that do not fit are dropped and counted."""
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens in the listener thread, not on the event loop
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json_dumps(entry)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of a logger's INFO and DEBUG records; warnings and errors always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.INFO or random.random() < self.rate
+
+
+def load_sampling_rates() -> Dict[str, float]:
+    """Load per-logger sampling rates from configuration."""
+    if not settings.log_sampling_json:
+        return {}
+
+    try:
+        return {name: float(rate) for name, rate in json.loads(settings.log_sampling_json).items()}
+    except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+        logging.getLogger(__name__).error('Failed to parse LOG_SAMPLING_JSON - expected {"routing": 0.1}')
+        return {}
 
 
 def setup_logging():
     """Configure application logging."""
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    
-    logging.basicConfig(
-        level=getattr(logging, settings.log_level.upper()),
-        format=log_format,
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
-    
+    global _listener
+
+    if _listener is None:
+        stream_handler = logging.StreamHandler(sys.stdout)
+        if settings.log_format.lower() == "json":
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+        log_queue = queue.Queue(maxsize=settings.log_queue_size)
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        logging.basicConfig(
+            level=getattr(logging, settings.log_level.upper()),
+            handlers=[
+                DroppingQueueHandler(log_queue)
+            ]
+        )
+
     # Set specific loggers
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
     logging.getLogger("httpx").setLevel(logging.WARNING)
-    
+
+    # Sample the per-request lines of busy loggers
+    for name, rate in load_sampling_rates().items():
+        logger = logging.getLogger(name)
+        for existing in [f for f in logger.filters if isinstance(f, SamplingFilter)]:
+            logger.removeFilter(existing)
+        if rate < 1.0:
+            logger.addFilter(SamplingFilter(rate))
+
     return logging.getLogger(__name__)
@@ -1,19 +1,31 @@
 """Main application entry point."""
 import logging
 from contextlib import asynccontextmanager
+from typing import Any, Dict
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import CONTENT_TYPE_LATEST
 from starlette.responses import Response, PlainTextResponse
 
 from config import settings
 from logging_config import setup_logging
-from middleware import track_requests_middleware, auth_exception_handler
-from metrics import registry
+from middleware import TrackRequestsMiddleware, auth_exception_handler
+from metrics import render_metrics
 from dependencies import get_http_client, close_http_client
+from upstream_monitor import monitor
+from prewarm import warmer
+from cells import cell_registry, cell_file_watcher
+from models import json_loads
 import health
 import routing
 import auth
+import live_reload
+
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:  # pragma: no cover - orjson is an optional speed-up
+    from fastapi.responses import JSONResponse as DefaultResponse
 
 # Setup logging
 logger = setup_logging()
@@ -24,29 +36,84 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     # Startup
     logger.info(f"Starting {settings.app_name}")
-    logger.info(f"Configured upstreams: {settings.nginx_urls}")
+    logger.info(f"Configured cells: {len(cell_registry)} from {settings.cells_file or 'NGINX_<n>_URL settings'}")
+    logger.info(f"Upstream pools: max_connections={settings.pool_max_connections}, http2={settings.pool_http2}")
     logger.info(f"API Key authentication: {'ENABLED' if settings.api_key_enabled else 'DISABLED'}")
 
-    # Initialize HTTP client
-    await get_http_client()
+    # Initialize HTTP clients, one connection pool per cell; with fast startup
+    # they are created on first use (or by the pool warmer) instead
+    if not settings.fast_startup:
+        for cell_id in cell_registry:
+            await get_http_client(cell_id)
+
+    # Open upstream connections before reporting ready, then keep them alive
+    warmer.start()
+
+    # Start background upstream health probes
+    monitor.start()
+
+    # Hot-reload the API key file
+    if auth.key_file_watcher is not None:
+        auth.key_file_watcher.start()
+
+    # Hot-reload the cell file
+    if cell_file_watcher is not None:
+        cell_file_watcher.start()
+
+    # Reload settings, upstreams and API keys on SIGHUP or when the settings file changes
+    if not live_reload.install_signal_handler():
+        logger.warning("Cannot handle SIGHUP here, live reload only follows the settings file")
+    if live_reload.settings_file_watcher is not None:
+        live_reload.settings_file_watcher.start()
 
     yield
 
     # Shutdown
     logger.info("Shutting down router application")
+    live_reload.remove_signal_handler()
+    if live_reload.settings_file_watcher is not None:
+        await live_reload.settings_file_watcher.stop()
+    await monitor.stop()
+    await warmer.stop()
+    if auth.key_file_watcher is not None:
+        await auth.key_file_watcher.stop()
+    if cell_file_watcher is not None:
+        await cell_file_watcher.stop()
     await close_http_client()
 
 
+# With fast startup the schema is never generated in-process, so the docs are
+# only served when a pre-built OPENAPI_FILE is configured
+docs_enabled = settings.docs_enabled and (bool(settings.openapi_file) or not settings.fast_startup)
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
     description=settings.app_description,
     version=settings.app_version,
     lifespan=lifespan,
-    docs_url="/docs",
-    redoc_url="/redoc",
+    default_response_class=DefaultResponse,
+    docs_url="/docs" if docs_enabled else None,
+    redoc_url="/redoc" if docs_enabled else None,
+    openapi_url="/openapi.json" if docs_enabled else None,
 )
 
+
+def prebuilt_openapi() -> Dict[str, Any]:
+    """Serve the schema exported by export_openapi.py instead of generating it."""
+    if app.openapi_schema is None:
+        try:
+            with open(settings.openapi_file, "rb") as f:
+                app.openapi_schema = json_loads(f.read())
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load OPENAPI_FILE {settings.openapi_file}, generating the schema: {str(e)}")
+            return FastAPI.openapi(app)
+    return app.openapi_schema
+
+
+if settings.openapi_file:
+    app.openapi = prebuilt_openapi
+
 # Add middleware
 app.add_middleware(
     CORSMiddleware,
@@ -57,7 +124,7 @@ app.add_middleware(
 )
 
 # Add custom middleware
-app.middleware("http")(track_requests_middleware)
+app.add_middleware(TrackRequestsMiddleware)
 
 # Add exception handlers
 app.add_exception_handler(HTTPException, auth_exception_handler)
@@ -70,53 +137,30 @@ app.include_router(routing.router)
 @app.get("/metrics", response_class=PlainTextResponse)
 async def metrics():
     """Prometheus metrics endpoint."""
-    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.get("/")
 async def root():
     """Root endpoint with API information."""
+    endpoints = {
+        "route": "/api/route" + (" (requires auth)" if settings.api_key_enabled else ""),
+        "health": "/health",
+        "ready": "/ready",
+        "metrics": "/metrics",
+    }
+    if docs_enabled:
+        endpoints.update(docs="/docs", redoc="/redoc")
     return {
         "service": settings.app_name,
         "version": settings.app_version,
         "auth_enabled": settings.api_key_enabled,
-        "auth_configured": bool(auth.VALID_API_KEYS) if settings.api_key_enabled else True,
-        "endpoints": {
-            "route": "/api/route" + (" (requires auth)" if settings.api_key_enabled else ""),
-            "health": "/health",
-            "ready": "/ready",
-            "metrics": "/metrics",
-            "docs": "/docs",
-            "redoc": "/redoc"
-        }
+        "auth_configured": bool(auth.key_store) if settings.api_key_enabled else True,
+        "endpoints": endpoints
     }
 
 
 if __name__ == "__main__":
-    import uvicorn
-
-    uvicorn.run(
-        "main:app",
-        host=settings.host,
-        port=settings.port,
-        log_config={
-            "version": 1,
-            "disable_existing_loggers": False,
-            "formatters": {
-                "default": {
-                    "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-                },
-            },
-            "handlers": {
-                "default": {
-                    "formatter": "default",
-                    "class": "logging.StreamHandler",
-                    "stream": "ext://sys.stdout",
-                },
-            },
-            "root": {
-                "level": settings.log_level.upper(),
-                "handlers": ["default"],
-            },
-        }
-    )
\ No newline at end of file
+    from server import main as serve
+
+    serve()
@@ -1,5 +1,12 @@
-"""Prometheus metrics configuration."""
-from prometheus_client import Counter, Histogram, CollectorRegistry
+"""Prometheus metrics configuration.
+
+When ``PROMETHEUS_MULTIPROC_DIR`` is set (see ``server.py``), every worker
+process writes its samples to that directory and ``render_metrics`` merges
+them, so ``/metrics`` reports all workers no matter which one serves it.
+Gauges declare how their per-process values are combined.
+"""
+import os
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, generate_latest, multiprocess
 
 # Create registry
 registry = CollectorRegistry()
@@ -32,3 +39,175 @@ auth_failures = Counter(
     ['reason'],
     registry=registry
 )
+
+upstream_up = Gauge(
+    'router_upstream_up',
+    'Whether at least one replica of the upstream passed the last background health probe',
+    ['cell_id'],
+    registry=registry,
+    multiprocess_mode='livemax'
+)
+
+upstream_probe_latency = Gauge(
+    'router_upstream_probe_latency_seconds',
+    'Mean latency of the last background health probe over the upstream replicas',
+    ['cell_id'],
+    registry=registry,
+    multiprocess_mode='livemostrecent'
+)
+
+circuit_breaker_state = Gauge(
+    'router_circuit_breaker_state',
+    'Circuit breaker state by cell_id (0=closed, 1=open, 2=half_open)',
+    ['cell_id'],
+    registry=registry,
+    multiprocess_mode='livemax'
+)
+
+circuit_breaker_transitions = Counter(
+    'router_circuit_breaker_transitions_total',
+    'Total number of circuit breaker state transitions',
+    ['cell_id', 'from_state', 'to_state'],
+    registry=registry
+)
+
+circuit_breaker_rejections = Counter(
+    'router_circuit_breaker_rejections_total',
+    'Total number of requests rejected by an open circuit breaker',
+    ['cell_id'],
+    registry=registry
+)
+
+cache_hits = Counter(
+    'router_cache_hits_total',
+    'Total number of responses served from the response cache',
+    ['cell_id'],
+    registry=registry
+)
+
+cache_misses = Counter(
+    'router_cache_misses_total',
+    'Total number of response cache lookups that went upstream',
+    ['cell_id'],
+    registry=registry
+)
+
+cache_evictions = Counter(
+    'router_cache_evictions_total',
+    'Total number of response cache entries evicted to stay within the size bound',
+    ['cell_id'],
+    registry=registry
+)
+
+cache_size_bytes = Gauge(
+    'router_cache_size_bytes',
+    'Current size of the cached response bodies in bytes',
+    registry=registry,
+    multiprocess_mode='livesum'
+)
+
+coalesced_requests = Counter(
+    'router_coalesced_requests_total',
+    'Total number of requests served by joining an identical in-flight upstream call',
+    ['cell_id'],
+    registry=registry
+)
+
+rate_limited_requests = Counter(
+    'router_rate_limited_total',
+    'Total number of requests rejected by the per-client rate limiter',
+    ['client', 'cell_id'],
+    registry=registry
+)
+
+log_records_dropped = Counter(
+    'router_log_records_dropped_total',
+    'Total number of log records dropped because the log queue was full',
+    registry=registry
+)
+
+upstream_endpoint_ejections = Counter(
+    'router_upstream_endpoint_ejections_total',
+    'Total number of replica endpoints ejected after consecutive failures',
+    ['cell_id'],
+    registry=registry
+)
+
+extra_attempts = Counter(
+    'router_upstream_extra_attempts_total',
+    'Total number of hedged or retried upstream attempts',
+    ['cell_id', 'kind'],
+    registry=registry
+)
+
+extra_attempt_wins = Counter(
+    'router_upstream_extra_attempt_wins_total',
+    'Total number of requests answered by a hedged or retried attempt',
+    ['cell_id', 'kind'],
+    registry=registry
+)
+
+retry_budget_exhausted = Counter(
+    'router_retry_budget_exhausted_total',
+    'Total number of hedges and retries skipped because the retry budget was exhausted',
+    registry=registry
+)
+
+concurrency_limit = Gauge(
+    'router_concurrency_limit',
+    'Current adaptive concurrency limit per cell',
+    ['cell_id'],
+    registry=registry,
+    multiprocess_mode='livesum'
+)
+
+concurrency_inflight = Gauge(
+    'router_concurrency_inflight',
+    'Requests currently holding a concurrency slot per cell',
+    ['cell_id'],
+    registry=registry,
+    multiprocess_mode='livesum'
+)
+
+concurrency_queue_depth = Gauge(
+    'router_concurrency_queue_depth',
+    'Requests waiting for a concurrency slot per cell',
+    ['cell_id'],
+    registry=registry,
+    multiprocess_mode='livesum'
+)
+
+concurrency_rejections = Counter(
+    'router_concurrency_rejections_total',
+    'Total number of requests shed by the concurrency limiter',
+    ['cell_id', 'reason'],
+    registry=registry
+)
+
+
+request_phase_duration = Histogram(
+    'router_request_phase_duration_seconds',
+    'Time spent in each phase of a request (see timing.py)',
+    ['phase'],
+    # From tens of microseconds for the in-process phases (auth, validation,
+    # serialize) up to slow upstream connects and responses
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    registry=registry
+)
+
+
+pool_warm_failures = Counter(
+    'router_pool_warm_failures_total',
+    'Total number of failed connection pre-warming and keepalive requests',
+    ['cell_id'],
+    registry=registry
+)
+
+
+def render_metrics() -> bytes:
+    """Render the metrics in the Prometheus text format, merging all workers if needed."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        collector_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collector_registry)
+        return generate_latest(collector_registry)
+    return generate_latest(registry)
@@ -3,65 +3,97 @@ import time
 import logging
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from metrics import request_count, request_duration, auth_failures
+from cells import cell_registry
+from config import settings
+from timing import PhaseTimer
 
 logger = logging.getLogger(__name__)
 
 
-async def track_requests_middleware(request: Request, call_next):
-    """Track request metrics and add security headers."""
-    start_time = time.time()
-
-    # Skip metrics endpoint
-    if request.url.path == "/metrics":
-        return await call_next(request)
-
-    # Initialize default values
-    request.state.client_id = "unknown"
-    request.state.cell_id = ""  # Empty string for "no cell ID"
-
-    response = await call_next(request)
-
-    # Track metrics for all requests (not just API calls)
-    duration = time.time() - start_time
-    
-    # Get cell_id from request state, default to empty string if not set
-    cell_id = getattr(request.state, "cell_id", "")
-    
-    # Handle different cases of cell_id
-    if cell_id == "":
-        # This is for health checks, root endpoint, etc.
-        metric_cell_id = ""  # Will show as "No Cell ID" in dashboard
-    elif cell_id not in ["1", "2", "3"]:
-        # Invalid cell IDs
-        metric_cell_id = "unknown"  # Will show as "Invalid Cell ID" in dashboard
-    else:
-        # Valid cell IDs
-        metric_cell_id = cell_id
-    
-    client_id = getattr(request.state, "client_id", "unknown")
-
-    request_duration.labels(cell_id=metric_cell_id, method=request.method).observe(duration)
-    request_count.labels(
-        cell_id=metric_cell_id,
-        status=response.status_code,
-        method=request.method,
-        client=client_id
-    ).inc()
-
-    # Add security headers
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-    response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-
-    # Remove server header
-    if "server" in response.headers:
-        del response.headers["server"]
-
-    return response
+# Security headers added to every response, pre-encoded for the ASGI message
+SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+]
+
+
+class TrackRequestsMiddleware:
+    """Track request metrics and add security headers.
+
+    Implemented as a pure ASGI middleware: the security headers are added to
+    the ``http.response.start`` message and the response body is passed
+    through untouched, so streamed responses are never buffered or wrapped.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Skip non-HTTP traffic and the metrics endpoint
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+
+        # Initialize default values, read back through request.state by the routes
+        state = scope.setdefault("state", {})
+        state["client_id"] = "unknown"
+        state["cell_id"] = ""  # Empty string for "no cell ID"
+        timer = state["timings"] = PhaseTimer() if settings.phase_timing_enabled else None
+
+        status_code = 500
+
+        async def send_with_headers(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Remove server header and add security headers
+                headers = [header for header in message.get("headers", ()) if header[0] != b"server"]
+                headers.extend(SECURITY_HEADERS)
+                if timer is not None:
+                    now = time.perf_counter()
+                    timer.response_started(now)
+                    if settings.server_timing_enabled:
+                        headers.append((b"server-timing", timer.server_timing(now - start_time)))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            # Track metrics for all requests (not just API calls)
+            duration = time.perf_counter() - start_time
+
+            # Handle different cases of cell_id
+            cell_id = state.get("cell_id", "")
+            if cell_id == "":
+                # This is for health checks, root endpoint, etc.
+                metric_cell_id = ""  # Will show as "No Cell ID" in dashboard
+            elif cell_id not in cell_registry.cell_ids:
+                # Invalid cell IDs
+                metric_cell_id = "unknown"  # Will show as "Invalid Cell ID" in dashboard
+            else:
+                # Valid cell IDs
+                metric_cell_id = cell_id
+
+            if timer is not None:
+                timer.observe()
+
+            method = scope["method"]
+            request_duration.labels(cell_id=metric_cell_id, method=method).observe(duration)
+            request_count.labels(
+                cell_id=metric_cell_id,
+                status=status_code,
+                method=method,
+                client=state.get("client_id", "unknown")
+            ).inc()
 
 
 async def auth_exception_handler(request: Request, exc: HTTPException):
@@ -1,35 +1,156 @@
 """Pydantic models for request/response validation."""
-from typing import Dict, Union
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Union
 from pydantic import BaseModel, Field, field_validator
 from config import settings
+from cells import cell_registry, CELL_ID_MIN_LENGTH, CELL_ID_MAX_LENGTH
+
+try:
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:  # pragma: no cover - orjson is an optional speed-up
+    json_loads = json.loads
+
+    def json_dumps(value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+ROUTING_KEY_MAX_LENGTH = 256
 
 
 class CellRequest(BaseModel):
     """Request model for routing to a specific cell."""
-    cellID: str = Field(..., min_length=1, max_length=10, description="Target cell ID")
+    cellID: str = Field(
+        ...,
+        min_length=CELL_ID_MIN_LENGTH,
+        max_length=CELL_ID_MAX_LENGTH,
+        description="Target cell ID"
+    )
 
     @field_validator('cellID')
     @classmethod
     def validate_cell_id(cls, v):
         """Ensure cell ID exists in configured services."""
-        valid_cells = list(settings.nginx_urls.keys())
-        if v not in valid_cells:
-            raise ValueError(f'cellID must be one of: {", ".join(valid_cells)}')
+        if v not in cell_registry.cell_ids:
+            raise ValueError(cell_registry.invalid_cell_message)
         return v
 
 
+class KeyRouteRequest(BaseModel):
+    """Request model for routing by an arbitrary key through the consistent-hash ring."""
+    routingKey: str = Field(
+        ...,
+        min_length=1,
+        max_length=ROUTING_KEY_MAX_LENGTH,
+        description="Routing key, such as a tenant or user ID, mapped to a cell"
+    )
+
+
+def parse_cell_id(data: Any) -> str:
+    """Extract the cell ID from a decoded ``{"cellID": ...}`` body without building a model.
+
+    Anything the fast path does not accept is validated by ``CellRequest`` so
+    the errors are exactly the ones pydantic reports. Raises
+    ``pydantic.ValidationError`` for invalid bodies.
+    """
+    if type(data) is dict:
+        cell_id = data.get("cellID")
+        if (
+            type(cell_id) is str
+            and CELL_ID_MIN_LENGTH <= len(cell_id) <= CELL_ID_MAX_LENGTH
+            and cell_id in cell_registry.cell_ids
+        ):
+            return cell_id
+
+    return CellRequest.model_validate(data, from_attributes=True).cellID
+
+
 class HealthResponse(BaseModel):
     """Response model for health check endpoint."""
     status: str
     version: str
     upstreams: Dict[str, str]
+    upstream_latency_ms: Dict[str, float] = Field(default_factory=dict)
+    upstream_endpoints: Dict[str, Dict[str, str]] = Field(default_factory=dict)
     auth_enabled: bool
     auth_configured: bool
 
 
+class CellListResponse(BaseModel):
+    """Response model for the cell list endpoint."""
+    cells: List[str]
+    count: int
+
+
 class RouteResponse(BaseModel):
-    """Response model for route endpoint."""
+    """Response model for route endpoint.
+
+    Documents the response schema; the route itself returns an
+    ``EncodedRouteResponse`` body built by ``encode_route_response``.
+    """
+    cellID: str
+    upstream: str
+    status: int
+    response: Union[Dict, str]
+
+
+class EncodedRouteResponse(NamedTuple):
+    """A routed upstream answer, already encoded as the JSON body of a ``RouteResponse``."""
+    cellID: str
+    status: int
+    body: bytes
+    # The encoded ``response`` field on its own, for callers that embed it elsewhere
+    payload: bytes
+
+
+@lru_cache(maxsize=4096)
+def _envelope_prefix(cell_id: str) -> bytes:
+    return b'{"cellID":%s,"upstream":%s,"status":' % (json_dumps(cell_id), json_dumps(f"nginx-{cell_id}"))
+
+
+def json_payload(content: bytes) -> bytes:
+    """Return an upstream JSON body ready to embed in the envelope.
+
+    The body is always parsed, so malformed or truncated JSON never reaches a
+    client, but a JSON object is embedded byte for byte rather than
+    re-encoded. A string is re-encoded; any other JSON type is rejected, as
+    ``RouteResponse`` allows neither. Raises ``ValueError`` for invalid JSON
+    or any other JSON type.
+    """
+    value = json_loads(content)
+    if isinstance(value, dict):
+        return content
+    if not isinstance(value, str):
+        raise ValueError(f"Upstream JSON response is a {type(value).__name__}, not an object or string")
+    return json_dumps(value)
+
+
+def encode_route_response(cell_id: str, status: int, payload: bytes) -> EncodedRouteResponse:
+    """Wrap an encoded JSON payload in the ``RouteResponse`` envelope without decoding it."""
+    body = b"%s%d,\"response\":%s}" % (_envelope_prefix(cell_id), status, payload)
+    return EncodedRouteResponse(cell_id, status, body, payload)
+
+
+class BatchRouteRequest(BaseModel):
+    """Request model for routing several cell requests in one call."""
+    requests: List[CellRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=settings.batch_max_items,
+        description="Cell requests to route, results are returned in the same order"
+    )
+
+
+class BatchRouteItem(BaseModel):
+    """Result of a single item in a batch route call."""
     cellID: str
     upstream: str
     status: int
-    response: Union[Dict, str]
\ No newline at end of file
+    response: Optional[Union[Dict, str]] = None
+    error: Optional[str] = None
+
+
+class BatchRouteResponse(BaseModel):
+    """Response model for batch route endpoint."""
+    results: List[BatchRouteItem]
@@ -0,0 +1,110 @@
+"""Pre-warming and keepalive of the upstream connection pools.
+
+At startup every replica of every cell is sent ``POOL_PREWARM_CONNECTIONS``
+concurrent health requests, which leaves that many open connections in the
+cell's pool, and ``/ready`` reports not ready until that round is done, so
+the first routed requests after a rollout skip DNS and the TCP handshake.
+Afterwards the same round repeats every ``POOL_KEEPALIVE_INTERVAL`` seconds,
+which keeps the connections in use more often than ``POOL_KEEPALIVE_EXPIRY``
+and the pools warm through quiet periods.
+"""
+import time
+import asyncio
+import logging
+from typing import Optional
+from config import settings
+from cells import cell_registry
+from metrics import pool_warm_failures
+import dependencies
+
+logger = logging.getLogger(__name__)
+
+
+class PoolWarmer:
+    """Opens connections to every cell at startup and keeps them alive while idle."""
+
+    def __init__(self):
+        # True from start() until the first round has finished
+        self.warming = False
+        self._task: Optional[asyncio.Task] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def connections_per_endpoint(self, cell_id: str) -> int:
+        # Connections beyond the keepalive limit would be closed as soon as they are idle
+        max_keepalive = dependencies.get_pool_config(cell_id)["max_keepalive_connections"]
+        return max(0, min(settings.pool_prewarm_connections, max_keepalive))
+
+    async def _ping(self, cell_id: str, url: str) -> bool:
+        http_client = await dependencies.get_http_client(cell_id)
+        try:
+            await http_client.get(f"{url}/health", timeout=settings.pool_prewarm_timeout)
+            return True
+        except Exception as e:
+            logger.debug(f"Pool warm-up request to nginx-{cell_id} failed: {str(e)}")
+            pool_warm_failures.labels(cell_id=cell_id).inc()
+            return False
+
+    async def warm_endpoint(self, cell_id: str, url: str) -> int:
+        """Open connections to one replica by sending concurrent requests; returns how many succeeded."""
+        count = self.connections_per_endpoint(cell_id)
+        async with self._semaphore:
+            results = await asyncio.gather(*(self._ping(cell_id, url) for _ in range(count)))
+        return sum(results)
+
+    async def warm_all(self) -> int:
+        """Warm the pools of every registered cell; returns the number of connections used."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.health_check_concurrency)
+        endpoints = [(cell_id, url) for cell_id, urls in cell_registry.cells.items() for url in urls]
+        results = await asyncio.gather(*(self.warm_endpoint(cell_id, url) for cell_id, url in endpoints))
+        return sum(results)
+
+    async def run(self):
+        """Warm the pools once, then keep them alive on an interval."""
+        start_time = time.perf_counter()
+        try:
+            warmed = await self.warm_all()
+            logger.info(
+                f"Pre-warmed {warmed} upstream connections to {len(cell_registry)} cells "
+                f"in {time.perf_counter() - start_time:.2f}s"
+            )
+        except Exception as e:
+            logger.error(f"Upstream pool warm-up failed: {str(e)}")
+        finally:
+            self.warming = False
+
+        if settings.pool_keepalive_interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(settings.pool_keepalive_interval)
+            try:
+                await self.warm_all()
+            except Exception as e:
+                logger.error(f"Upstream pool keepalive round failed: {str(e)}")
+
+    def start(self):
+        """Start warming the pools in the background."""
+        if self._task is not None or settings.pool_prewarm_connections <= 0:
+            return
+        if settings.pool_keepalive_interval >= settings.pool_keepalive_expiry:
+            logger.warning(
+                f"POOL_KEEPALIVE_INTERVAL ({settings.pool_keepalive_interval}s) is not below "
+                f"POOL_KEEPALIVE_EXPIRY ({settings.pool_keepalive_expiry}s), idle connections will expire"
+            )
+        self.warming = True
+        self._task = asyncio.create_task(self.run(), name="pool-warmer")
+
+    async def stop(self):
+        """Stop the background warm-up and keepalive task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.warming = False
+
+
+# Global warmer instance
+warmer = PoolWarmer()
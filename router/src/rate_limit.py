@@ -0,0 +1,118 @@
+"""Per-client, per-cell token-bucket rate limiting.
+
+Rates must be positive: there is no "unlimited" rate, set RATE_LIMIT_ENABLED
+to false instead. Buckets live in each worker process, so with WORKERS > 1
+every worker enforces the limit on its own and a client can reach up to
+WORKERS times the configured rate.
+"""
+import json
+import time
+import logging
+from typing import Dict, Tuple
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second up to ``burst``."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take one token; return 0 if allowed, else the seconds until a token is available."""
+        tokens = self.tokens + (now - self.updated) * self.rate
+        if tokens > self.burst:
+            tokens = self.burst
+        self.updated = now
+
+        if tokens >= 1.0:
+            self.tokens = tokens - 1.0
+            return 0.0
+
+        self.tokens = tokens
+        return (1.0 - tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets keyed by client and then by cell.
+
+    Buckets live in nested dicts so the steady-state path does one or two dict
+    lookups and updates a bucket in place. Buckets idle for longer than
+    ``idle_ttl`` are swept out periodically from the request path.
+    """
+
+    def __init__(self, rate: float, burst: float, client_limits: Dict[str, Tuple[float, float]], idle_ttl: float):
+        self.rate = rate
+        self.burst = burst
+        self.client_limits = client_limits
+        self.idle_ttl = idle_ttl
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._next_sweep = time.monotonic() + idle_ttl
+
+    def __len__(self) -> int:
+        return sum(len(cells) for cells in self._buckets.values())
+
+    def acquire(self, client_id: str, cell_id: str) -> float:
+        """Take a token for the client and cell; return 0 if allowed, else the retry delay."""
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self.sweep(now)
+
+        cells = self._buckets.get(client_id)
+        if cells is None:
+            cells = self._buckets[client_id] = {}
+
+        bucket = cells.get(cell_id)
+        if bucket is None:
+            rate, burst = self.client_limits.get(client_id, (self.rate, self.burst))
+            bucket = cells[cell_id] = TokenBucket(rate, burst, now)
+
+        return bucket.take(now)
+
+    def sweep(self, now: float):
+        """Evict buckets that have been idle for longer than the TTL."""
+        cutoff = now - self.idle_ttl
+        for client_id in list(self._buckets):
+            cells = self._buckets[client_id]
+            for cell_id in [cell_id for cell_id, bucket in cells.items() if bucket.updated < cutoff]:
+                del cells[cell_id]
+            if not cells:
+                del self._buckets[client_id]
+        self._next_sweep = now + self.idle_ttl
+
+
+def load_client_limits() -> Dict[str, Tuple[float, float]]:
+    """Load per-client rates and bursts from configuration."""
+    if not settings.rate_limits_json:
+        return {}
+
+    try:
+        client_limits = {
+            client_id: (float(limits["rate"]), float(limits.get("burst", limits["rate"])))
+            for client_id, limits in json.loads(settings.rate_limits_json).items()
+        }
+    except (json.JSONDecodeError, AttributeError, KeyError, TypeError, ValueError):
+        logger.error('Failed to parse RATE_LIMITS_JSON - expected {"client": {"rate": 10, "burst": 20}}')
+        return {}
+
+    for client_id, (rate, burst) in list(client_limits.items()):
+        if rate <= 0 or burst < 1:
+            logger.warning(f"Ignoring RATE_LIMITS_JSON entry for {client_id}: rate must be above 0 and burst at least 1")
+            del client_limits[client_id]
+    return client_limits
+
+
+# Global rate limiter instance
+rate_limiter = RateLimiter(
+    rate=settings.rate_limit_rate,
+    burst=settings.rate_limit_burst,
+    client_limits=load_client_limits(),
+    idle_ttl=settings.rate_limit_idle_ttl,
+)
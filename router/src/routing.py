@@ -1,73 +1,547 @@
 """Main routing logic for cell-based request routing."""
+import json
+import math
 import time
+import asyncio
 import logging
-from fastapi import APIRouter, Request, Depends, HTTPException, status
+import email.message
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi import APIRouter, Request, Depends, HTTPException, Query, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
 import httpx
-from models import CellRequest, RouteResponse
+from models import (
+    CellRequest, KeyRouteRequest, RouteResponse, EncodedRouteResponse,
+    BatchRouteRequest, BatchRouteItem, BatchRouteResponse, CellListResponse,
+    encode_route_response, json_dumps, json_loads, json_payload, parse_cell_id
+)
 from config import settings
+from cells import cell_registry
+from balancer import CellBalancer, Endpoint, get_balancer
+from concurrency import AdaptiveLimiter, Overloaded, get_limiter
 from auth import verify_api_key
-from metrics import upstream_errors
-from dependencies import get_http_client
+from metrics import upstream_errors, circuit_breaker_rejections, rate_limited_requests
+from rate_limit import rate_limiter
+from circuit_breaker import CircuitBreaker, get_breaker
+from cache import response_cache, cache_key, cache_ttl
+import coalescing
+from timing import get_timer, record_upstream, trace_extensions
+import dependencies
+import hashring
+import hedging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api", tags=["routing"])
 
+# Upstream response headers passed through in streaming mode
+STREAMED_HEADERS = ("content-type", "content-encoding", "cache-control")
 
-@router.post("/route", response_model=RouteResponse)
-async def route_request(
-    cell_request: CellRequest,
-    request: Request,
-    client_id: str = Depends(verify_api_key)
-):
-    """Route request to appropriate NGINX instance based on cell ID."""
-    cell_id = cell_request.cellID
-    nginx_url = settings.nginx_urls[cell_id]
-    
-    # Store state for metrics
-    request.state.cell_id = cell_id
-    request.state.client_id = client_id
-    
-    target_url = f"{nginx_url}/api"
-    logger.info(f"Routing request from client '{client_id}' for cell_id={cell_id} to {target_url}")
-    
-    http_client = await get_http_client()
-    
+
+def is_json_content_type(content_type: str) -> bool:
+    """Match FastAPI's check for a JSON request body."""
+    if content_type == "application/json":
+        return True
+    message = email.message.Message()
+    message["content-type"] = content_type
+    if message.get_content_maintype() != "application":
+        return False
+    subtype = message.get_content_subtype()
+    return subtype == "json" or subtype.endswith("+json")
+
+
+async def read_json_body(request: Request) -> Any:
+    """Read and decode the request body the way FastAPI does for a JSON body parameter.
+
+    Declared as the first dependency of the route so that, as before, malformed
+    JSON is rejected before authentication runs.
+    """
+    body = await request.body()
+    if not body:
+        return None
+
+    content_type = request.headers.get("content-type")
+    if content_type and not is_json_content_type(content_type):
+        return body
+
+    start_time = time.perf_counter()
     try:
-        response = await http_client.post(
-            target_url,
-            json={"cellID": cell_id, "timestamp": time.time()},
-            headers={
-                "X-Cell-ID": cell_id,
-                "X-Client-ID": client_id,
-                "X-Forwarded-For": request.client.host if request.client else "unknown",
-                "X-Original-URI": str(request.url),
-            }
+        return json_loads(body)
+    except ValueError:
+        pass
+    finally:
+        timer = get_timer(request)
+        if timer is not None:
+            timer.add("validation", time.perf_counter() - start_time)
+
+    # Decode again with the standard library so error details match FastAPI's
+    try:
+        return json.loads(body)
+    except json.JSONDecodeError as e:
+        raise RequestValidationError(
+            [{"type": "json_invalid", "loc": ("body", e.pos), "msg": "JSON decode error", "input": {}, "ctx": {"error": e.msg}}],
+            body=e.doc,
+        ) from e
+
+
+def validate_cell_request(data: Any) -> str:
+    """Validate a decoded route body and return its cell ID, raising FastAPI's usual 422 errors."""
+    if data is None:
+        raise RequestValidationError(
+            [{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}]
+        )
+    try:
+        return parse_cell_id(data)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)],
+            body=data,
+        )
+
+
+def enforce_rate_limit(client_id: str, cell_id: str):
+    """Reject the request with 429 if the client is over its limit for the cell."""
+    if not settings.rate_limit_enabled:
+        return
+
+    retry_after = rate_limiter.acquire(client_id, cell_id)
+    if retry_after > 0:
+        rate_limited_requests.labels(client=client_id, cell_id=cell_id).inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+
+def acquire_breaker(cell_id: str) -> Optional[CircuitBreaker]:
+    """Get the cell's circuit breaker, failing fast if the circuit is open."""
+    if not settings.circuit_breaker_enabled:
+        return None
+
+    breaker = get_breaker(cell_id)
+    if not breaker.allow_request():
+        circuit_breaker_rejections.labels(cell_id=cell_id).inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Circuit open for nginx-{cell_id}",
+            headers={"Retry-After": str(max(1, math.ceil(breaker.retry_after())))}
+        )
+    return breaker
+
+
+async def acquire_concurrency_slot(cell_id: str, breaker: Optional[CircuitBreaker]) -> Optional[AdaptiveLimiter]:
+    """Take one of the cell's concurrency slots, shedding the request with a 503 if none frees up in time."""
+    if not settings.concurrency_limit_enabled:
+        return None
+
+    limiter = get_limiter(cell_id)
+    try:
+        await limiter.acquire()
+    except asyncio.CancelledError:
+        if breaker is not None:
+            breaker.release()
+        raise
+    except Overloaded as e:
+        if breaker is not None:
+            breaker.release()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "1"}
         )
-        
-        return RouteResponse(
-            cellID=cell_id,
-            upstream=f"nginx-{cell_id}",
-            status=response.status_code,
-            response=response.json() if response.headers.get("content-type") == "application/json" else response.text
+    return limiter
+
+
+def cell_balancer(cell_id: str) -> CellBalancer:
+    """Get the cell's replica balancer; the cell may have been removed since the request was validated."""
+    balancer = get_balancer(cell_id)
+    if balancer is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Cell {cell_id} is no longer configured"
         )
-        
-    except httpx.TimeoutException:
+    return balancer
+
+
+async def call_endpoint(
+    cell_id: str,
+    endpoint: Endpoint,
+    send: Callable[[], Awaitable[httpx.Response]]
+) -> httpx.Response:
+    """Send one attempt to a replica and report its latency and outcome to the balancer."""
+    endpoint.start()
+    start_time = time.perf_counter()
+    try:
+        response = await send()
+    except asyncio.CancelledError:
+        endpoint.cancel()
+        raise
+    except Exception:
+        endpoint.finish(cell_id, None, False)
+        raise
+    endpoint.finish(cell_id, time.perf_counter() - start_time, response.status_code < 500)
+    return response
+
+
+def build_upstream_headers(cell_id: str, client_id: str, request: Request, shared: bool = False) -> Dict[str, str]:
+    """Build the headers sent to the NGINX instance, leaving out the client's for calls shared across clients."""
+    headers = {"X-Cell-ID": cell_id, "X-Original-URI": str(request.url)}
+    if not shared:
+        headers["X-Client-ID"] = client_id
+        headers["X-Forwarded-For"] = request.client.host if request.client else "unknown"
+    return headers
+
+
+def upstream_error(cell_id: str, exc: Exception, breaker: Optional[CircuitBreaker]) -> HTTPException:
+    """Record an upstream failure and map it to the HTTP error returned to the client."""
+    if isinstance(exc, httpx.TimeoutException):
         upstream_errors.labels(cell_id=cell_id, upstream=f"nginx-{cell_id}").inc()
+        if breaker is not None:
+            breaker.record_failure()
         logger.error(f"Timeout connecting to nginx-{cell_id}")
-        raise HTTPException(
+        return HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail=f"Timeout connecting to nginx-{cell_id}"
         )
-    except httpx.RequestError as e:
+
+    if isinstance(exc, httpx.RequestError):
         upstream_errors.labels(cell_id=cell_id, upstream=f"nginx-{cell_id}").inc()
-        logger.error(f"Error connecting to nginx-{cell_id}: {str(e)}")
-        raise HTTPException(
+        if breaker is not None:
+            breaker.record_failure()
+        logger.error(f"Error connecting to nginx-{cell_id}: {str(exc)}")
+        return HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail=f"Error connecting to nginx-{cell_id}"
         )
+
+    if breaker is not None:
+        breaker.release()
+    logger.error(f"Unexpected error routing to nginx-{cell_id}: {str(exc)}")
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail="Internal server error"
+    )
+
+
+async def fetch_from_cell(
+    cell_id: str,
+    client_id: str,
+    request: Request,
+    cache_entry_key=None,
+    shared: bool = False
+) -> EncodedRouteResponse:
+    """Call a replica of the NGINX instance serving the cell and cache the result if requested.
+
+    Slow attempts may be hedged and connection failures retried on another
+    replica, within the retry budget. A ``shared`` call answers requests from
+    several clients and is sent without client headers.
+    """
+    balancer = cell_balancer(cell_id)
+    http_client = await dependencies.get_http_client(cell_id)
+    headers = build_upstream_headers(cell_id, client_id, request, shared)
+    timer = get_timer(request)
+    # Nothing may fail between taking the slot and the try block that returns it
+    breaker = acquire_breaker(cell_id)
+    limiter = await acquire_concurrency_slot(cell_id, breaker)
+    tried: List[Endpoint] = []
+
+    async def attempt() -> httpx.Response:
+        endpoint = balancer.pick(tried)
+        tried.append(endpoint)
+        return await call_endpoint(cell_id, endpoint, lambda: http_client.post(
+            f"{endpoint.url}/api",
+            json={"cellID": cell_id, "timestamp": time.time()},
+            headers=headers,
+            timeout=settings.request_timeout,
+            extensions=trace_extensions(timer)
+        ))
+
+    start_time = time.perf_counter()
+    try:
+        response = await hedging.call_with_hedging(cell_id, attempt)
+    except asyncio.CancelledError:
+        if limiter is not None:
+            limiter.abandon()
+        if breaker is not None:
+            breaker.release()
+        raise
+    except Exception as e:
+        if limiter is not None:
+            limiter.release(time.perf_counter() - start_time, False)
+        raise upstream_error(cell_id, e, breaker)
+    if limiter is not None:
+        limiter.release(time.perf_counter() - start_time, response.status_code < 500)
+    record_upstream(timer, response)
+
+    try:
+        if breaker is not None:
+            breaker.record_success()
+
+        if response.headers.get("content-type") == "application/json":
+            payload = json_payload(response.content)
+        else:
+            payload = json_dumps(response.text)
+        result = encode_route_response(cell_id, response.status_code, payload)
+
     except Exception as e:
-        logger.error(f"Unexpected error routing to nginx-{cell_id}: {str(e)}")
+        raise upstream_error(cell_id, e, breaker)
+
+    if cache_entry_key is not None and response.status_code == 200:
+        ttl = cache_ttl(cell_id, response.headers.get("cache-control"))
+        response_cache.set(cache_entry_key, cell_id, result, len(result.body) + len(result.payload), ttl)
+
+    return result
+
+
+async def forward_to_cell(
+    cell_id: str,
+    client_id: str,
+    request: Request
+) -> EncodedRouteResponse:
+    """Send a single request to the NGINX instance serving the cell.
+
+    The response cache is consulted first; on a miss, identical concurrent
+    requests share one upstream call when coalescing is enabled.
+    """
+    logger.info("Routing request from client '%s' for cell_id=%s", client_id, cell_id)
+
+    key = None
+    if settings.cache_enabled:
+        key = cache_key(cell_id, client_id, request)
+        cached = response_cache.get(key, cell_id)
+        if cached is not None:
+            return cached
+
+    if settings.coalesce_enabled:
+        shared = not coalescing.is_per_client(coalescing.coalesce_key)
+        return await coalescing.single_flight.do(
+            coalescing.coalesce_key(cell_id, client_id, request),
+            cell_id,
+            lambda: fetch_from_cell(cell_id, client_id, request, key, shared)
+        )
+    return await fetch_from_cell(cell_id, client_id, request, key)
+
+
+class RelayResponse(StreamingResponse):
+    """Streaming response that runs ``on_close`` once sending ends, however it ends.
+
+    The cleanup cannot live in the body generator: if the client disconnects
+    or sending the headers fails, the generator is never started.
+    """
+
+    def __init__(self, content, on_close: Callable[[], Awaitable[None]], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
+
+
+async def stream_from_cell(
+    cell_id: str,
+    client_id: str,
+    request: Request
+) -> RelayResponse:
+    """Stream the NGINX instance's response body straight through to the client.
+
+    Routing metadata is returned in ``X-Cell-ID``, ``X-Upstream`` and
+    ``X-Upstream-Status`` headers instead of a JSON envelope.
+    """
+    balancer = cell_balancer(cell_id)
+    logger.info("Streaming request from client '%s' for cell_id=%s", client_id, cell_id)
+
+    http_client = await dependencies.get_http_client(cell_id)
+    headers = build_upstream_headers(cell_id, client_id, request)
+    timer = get_timer(request)
+    # Nothing may fail between taking the slot and the try block that returns it
+    breaker = acquire_breaker(cell_id)
+    limiter = await acquire_concurrency_slot(cell_id, breaker)
+    tried: List[Endpoint] = []
+
+    async def attempt() -> Tuple[Endpoint, httpx.Response, float]:
+        endpoint = balancer.pick(tried)
+        tried.append(endpoint)
+        upstream_request = http_client.build_request(
+            "POST",
+            f"{endpoint.url}/api",
+            json={"cellID": cell_id, "timestamp": time.time()},
+            headers=headers,
+            timeout=settings.request_timeout,
+            extensions=trace_extensions(timer)
+        )
+        endpoint.start()
+        start_time = time.perf_counter()
+        try:
+            response = await http_client.send(upstream_request, stream=True)
+        except asyncio.CancelledError:
+            endpoint.cancel()
+            raise
+        except Exception:
+            endpoint.finish(cell_id, None, False)
+            raise
+        # Balance on time to headers; the body length is up to the upstream
+        return endpoint, response, time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    try:
+        # A started stream cannot be raced, so streams are retried but never hedged
+        endpoint, response, latency = await hedging.call_with_hedging(cell_id, attempt, hedge=False)
+        if breaker is not None:
+            breaker.record_success()
+    except asyncio.CancelledError:
+        if limiter is not None:
+            limiter.abandon()
+        if breaker is not None:
+            breaker.release()
+        raise
+    except Exception as e:
+        if limiter is not None:
+            limiter.release(time.perf_counter() - start_time, False)
+        raise upstream_error(cell_id, e, breaker)
+    record_upstream(timer, response)
+
+    ok = response.status_code < 500
+    closed = False
+
+    async def relay_body():
+        nonlocal ok
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        except httpx.HTTPError as e:
+            ok = False
+            upstream_errors.labels(cell_id=cell_id, upstream=f"nginx-{cell_id}").inc()
+            logger.error(f"Stream from nginx-{cell_id} aborted: {str(e)}")
+            raise
+
+    async def close():
+        nonlocal closed
+        if closed:
+            return
+        closed = True
+        endpoint.finish(cell_id, latency, ok)
+        # The concurrency slot is held until the body has been relayed
+        if limiter is not None:
+            limiter.release(latency, ok)
+        await response.aclose()
+
+    headers = {
+        "X-Cell-ID": cell_id,
+        "X-Upstream": f"nginx-{cell_id}",
+        "X-Upstream-Status": str(response.status_code),
+    }
+    for name in STREAMED_HEADERS:
+        if name in response.headers:
+            headers[name] = response.headers[name]
+
+    return RelayResponse(relay_body(), close, status_code=response.status_code, headers=headers)
+
+
+def route_response(result: EncodedRouteResponse) -> Response:
+    """Send an encoded route result as is, skipping FastAPI's response model validation and encoding."""
+    return Response(content=result.body, media_type="application/json")
+
+
+@router.post(
+    "/route",
+    response_model=RouteResponse,
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": CellRequest.model_json_schema()}},
+            "required": True,
+        }
+    },
+)
+async def route_request(
+    request: Request,
+    body: Any = Depends(read_json_body),
+    client_id: str = Depends(verify_api_key),
+    stream: bool = Query(False, description="Stream the raw upstream body, with routing metadata in headers")
+):
+    """Route request to appropriate NGINX instance based on cell ID."""
+    start_time = time.perf_counter()
+    cell_id = validate_cell_request(body)
+    timer = get_timer(request)
+    if timer is not None:
+        timer.add("validation", time.perf_counter() - start_time)
+
+    # Store state for metrics
+    request.state.cell_id = cell_id
+    request.state.client_id = client_id
+
+    enforce_rate_limit(client_id, cell_id)
+
+    if stream:
+        return await stream_from_cell(cell_id, client_id, request)
+    return route_response(await forward_to_cell(cell_id, client_id, request))
+
+
+@router.post("/route/key", response_model=RouteResponse)
+async def route_by_key(
+    key_request: KeyRouteRequest,
+    request: Request,
+    client_id: str = Depends(verify_api_key),
+    stream: bool = Query(False, description="Stream the raw upstream body, with routing metadata in headers")
+):
+    """Route to the cell that owns the routing key on the consistent-hash ring."""
+    cell_id = hashring.hash_ring.lookup(key_request.routingKey)
+    if cell_id is None:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error"
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="No cells available for key routing"
         )
+
+    # Store state for metrics
+    request.state.cell_id = cell_id
+    request.state.client_id = client_id
+
+    enforce_rate_limit(client_id, cell_id)
+
+    if stream:
+        return await stream_from_cell(cell_id, client_id, request)
+    return route_response(await forward_to_cell(cell_id, client_id, request))
+
+
+@router.post("/route/batch", response_model=BatchRouteResponse)
+async def route_batch_request(
+    batch_request: BatchRouteRequest,
+    request: Request,
+    client_id: str = Depends(verify_api_key)
+):
+    """Route several cell requests concurrently, returning results in request order."""
+    request.state.client_id = client_id
+
+    semaphore = asyncio.Semaphore(max(1, settings.batch_concurrency))
+
+    async def route_item(cell_id: str) -> BatchRouteItem:
+        async with semaphore:
+            try:
+                enforce_rate_limit(client_id, cell_id)
+                result = await forward_to_cell(cell_id, client_id, request)
+            except HTTPException as e:
+                return BatchRouteItem(
+                    cellID=cell_id,
+                    upstream=f"nginx-{cell_id}",
+                    status=e.status_code,
+                    error=str(e.detail)
+                )
+            return BatchRouteItem(
+                cellID=cell_id,
+                upstream=f"nginx-{cell_id}",
+                status=result.status,
+                response=json_loads(result.payload)
+            )
+
+    results = await asyncio.gather(*(route_item(item.cellID) for item in batch_request.requests))
+    return BatchRouteResponse(results=list(results))
+
+
+@router.get("/cells", response_model=CellListResponse)
+async def list_cells(client_id: str = Depends(verify_api_key)):
+    """List the cell IDs currently in the registry."""
+    cell_ids = sorted(cell_registry.cell_ids, key=lambda cell_id: (len(cell_id), cell_id))
+    return CellListResponse(cells=cell_ids, count=len(cell_ids))
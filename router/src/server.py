@@ -0,0 +1,143 @@
+"""Server entry point supporting several worker processes on one port.
+
+With ``WORKERS`` > 1 every worker binds its own listening socket with
+``SO_REUSEPORT`` so the kernel balances connections across processes, and
+Prometheus metrics are collected in multiprocess mode so ``/metrics``
+aggregates all workers. Run with ``python server.py``.
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import tempfile
+import multiprocessing
+from typing import Dict
+import uvicorn
+from config import settings
+from logging_config import setup_logging
+
+logger = logging.getLogger("server")
+
+# Seconds to wait for workers to exit after a shutdown signal
+SHUTDOWN_TIMEOUT = 30.0
+
+
+def create_reuseport_socket(host: str, port: int) -> socket.socket:
+    """Create a listening socket that other workers can bind to the same port."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve_worker(host: str, port: int):
+    """Run one uvicorn worker on its own SO_REUSEPORT socket."""
+    setup_logging()
+    sock = create_reuseport_socket(host, port)
+    config = uvicorn.Config("main:app", host=host, port=port, log_config=None)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def prepare_multiprocess_dir() -> str:
+    """Point prometheus_client at a clean directory shared by all workers."""
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        path = tempfile.mkdtemp(prefix="router-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+    return path
+
+
+def run_workers(workers: int):
+    """Start the workers, restart any that die, pass SIGHUP on to them and stop them all on SIGTERM/SIGINT."""
+    from prometheus_client import multiprocess
+
+    context = multiprocessing.get_context("spawn")
+    processes: Dict[int, multiprocessing.Process] = {}
+    stopping = False
+
+    def spawn():
+        process = context.Process(target=serve_worker, args=(settings.host, settings.port), daemon=False)
+        # The worker inherits the ignored SIGHUP until its lifespan installs the reload handler
+        forward = signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        try:
+            process.start()
+        finally:
+            signal.signal(signal.SIGHUP, forward)
+        processes[process.pid] = process
+        logger.info(f"Started worker {process.pid}")
+
+    def handle_signal(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for process in processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    def forward_reload(signum, frame):
+        for process in processes.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGHUP)
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGHUP, forward_reload)
+
+    for _ in range(workers):
+        spawn()
+
+    while processes:
+        for pid, process in list(processes.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            del processes[pid]
+            multiprocess.mark_process_dead(pid)
+            if not stopping:
+                logger.warning(f"Worker {pid} exited with code {process.exitcode}, restarting")
+                spawn()
+        if stopping:
+            deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+            for process in processes.values():
+                process.join(max(0.0, deadline - time.monotonic()))
+                if process.is_alive():
+                    process.kill()
+        time.sleep(0.5)
+
+
+def main():
+    """Run the router with the configured number of workers."""
+    # SIGHUP reloads the settings once the app has started (see live_reload.py);
+    # until then it must not terminate the process, as it does by default
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    if settings.workers <= 1:
+        setup_logging()
+        uvicorn.run("main:app", host=settings.host, port=settings.port, log_config=None)
+        return
+
+    # Must be set before the workers start so they import prometheus_client in multiprocess mode
+    path = prepare_multiprocess_dir()
+    setup_logging()
+    logger.info(f"Starting {settings.workers} workers on {settings.host}:{settings.port}, metrics in {path}")
+
+    if not hasattr(socket, "SO_REUSEPORT"):
+        logger.warning("SO_REUSEPORT is not available, falling back to uvicorn's shared-socket workers")
+        uvicorn.run("main:app", host=settings.host, port=settings.port, workers=settings.workers, log_config=None)
+        return
+
+    run_workers(settings.workers)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
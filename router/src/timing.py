@@ -0,0 +1,121 @@
+"""Per-phase request timing.
+
+The middleware attaches a ``PhaseTimer`` to every request's state and the
+request path records how long each phase took into it:
+
+- ``auth``: API key verification
+- ``validation``: decoding and validating the request body
+- ``pool_wait``: waiting for a connection from the cell's pool
+- ``connect``: TCP and TLS handshake when a new connection is opened
+- ``ttfb``: from sending the upstream request to its response headers
+- ``serialize``: from the upstream answer to the router's response headers
+
+Each phase is observed in its own histogram when the request finishes, and
+with ``SERVER_TIMING_ENABLED`` the phases are also returned to the client in
+a ``Server-Timing`` header. The upstream phases come from httpcore's trace
+hook, so a timer costs a few clock reads per request.
+"""
+import time
+from typing import Any, Dict, Optional
+from starlette.requests import Request
+from metrics import request_phase_duration
+
+# Bound on first use so recording a phase skips the label lookup; phases that
+# never occur (such as auth with authentication disabled) are not exported
+_phase_histograms: Dict[str, Any] = {}
+
+
+class PhaseTimer:
+    """Durations of the phases of one request, in seconds."""
+
+    __slots__ = ("durations", "upstream_done")
+
+    def __init__(self):
+        self.durations: Dict[str, float] = {}
+        # When the upstream answer arrived; serialisation is measured from here
+        self.upstream_done: Optional[float] = None
+
+    def add(self, phase: str, seconds: float):
+        self.durations[phase] = self.durations.get(phase, 0.0) + seconds
+
+    def response_started(self, now: float):
+        """Close the serialize phase when the response headers are sent."""
+        if self.upstream_done is not None:
+            self.add("serialize", now - self.upstream_done)
+            self.upstream_done = None
+
+    def observe(self):
+        for phase, seconds in self.durations.items():
+            histogram = _phase_histograms.get(phase)
+            if histogram is None:
+                histogram = _phase_histograms[phase] = request_phase_duration.labels(phase=phase)
+            histogram.observe(seconds)
+
+    def server_timing(self, total: float) -> bytes:
+        """Render the phases and the total so far as a ``Server-Timing`` header value (milliseconds)."""
+        metrics = [f"{phase};dur={seconds * 1000:.3f}" for phase, seconds in self.durations.items()]
+        metrics.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(metrics).encode("latin-1")
+
+
+def get_timer(request: Request) -> Optional[PhaseTimer]:
+    """Get the request's timer, or None when phase timing is disabled."""
+    return request.scope.get("state", {}).get("timings")
+
+
+class UpstreamTrace:
+    """httpcore trace hook splitting one upstream attempt into pool wait, connect and time to first byte.
+
+    Passed as the ``trace`` request extension. Transports that emit no trace
+    events (such as ``httpx.MockTransport``) are timed as time to first byte.
+    """
+
+    __slots__ = ("start", "pool_wait", "connect", "ttfb", "_connect_start", "_send_start")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.pool_wait: Optional[float] = None
+        self.connect: Optional[float] = None
+        self.ttfb: Optional[float] = None
+        self._connect_start = 0.0
+        self._send_start = 0.0
+
+    async def __call__(self, event_name: str, info: dict):
+        now = time.perf_counter()
+        if self.pool_wait is None:
+            # The first event fires once the pool has handed over a connection
+            self.pool_wait = now - self.start
+        if event_name.endswith(".connect_tcp.started"):
+            self._connect_start = now
+        elif event_name.endswith((".connect_tcp.complete", ".start_tls.complete")):
+            self.connect = now - self._connect_start
+        elif event_name.endswith(".send_request_headers.started"):
+            self._send_start = now
+        elif event_name.endswith(".receive_response_headers.complete"):
+            self.ttfb = now - self._send_start
+
+    def record(self, timer: PhaseTimer):
+        """Add this attempt's phases to the request's timer and start the serialize phase."""
+        now = time.perf_counter()
+        if self.pool_wait is None:
+            timer.add("ttfb", now - self.start)
+        else:
+            timer.add("pool_wait", self.pool_wait)
+            if self.connect is not None:
+                timer.add("connect", self.connect)
+            if self.ttfb is not None:
+                timer.add("ttfb", self.ttfb)
+        timer.upstream_done = now
+
+
+def trace_extensions(timer: Optional[PhaseTimer]) -> Optional[dict]:
+    """Request extensions that trace one upstream attempt, if the request is being timed."""
+    return {"trace": UpstreamTrace()} if timer is not None else None
+
+
+def record_upstream(timer: Optional[PhaseTimer], response) -> None:
+    """Record the phases of the attempt that produced ``response``; with hedging only the winner counts."""
+    if timer is not None:
+        trace = response.request.extensions.get("trace")
+        if isinstance(trace, UpstreamTrace):
+            trace.record(timer)
@@ -0,0 +1,130 @@
+"""Background health monitoring of the upstream NGINX cells."""
+import time
+import random
+import asyncio
+import logging
+from typing import Dict, List, NamedTuple, Optional
+from config import settings
+from cells import cell_registry
+from metrics import upstream_up, upstream_probe_latency
+import dependencies
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamState(NamedTuple):
+    """Result of the last health probe of a cell or of one of its replicas.
+
+    A cell is "healthy" when all of its replicas are, "degraded" when only some
+    are, and otherwise takes the status of its first replica. Its latency is the
+    mean over the replicas that answered, and ``endpoints`` holds the status of
+    each replica by URL.
+    """
+    status: str
+    latency: Optional[float]
+    checked_at: float
+    endpoints: Dict[str, str] = {}
+
+
+def combine_states(states: Dict[str, UpstreamState]) -> UpstreamState:
+    """Summarise the probe results of a cell's replicas, keyed by URL, as the state of the cell."""
+    statuses = [state.status for state in states.values()]
+    healthy = statuses.count("healthy")
+    if healthy == len(statuses):
+        status = "healthy"
+    elif healthy:
+        status = "degraded"
+    else:
+        status = statuses[0]
+
+    latencies: List[float] = [state.latency for state in states.values() if state.latency is not None]
+    return UpstreamState(
+        status=status,
+        latency=sum(latencies) / len(latencies) if latencies else None,
+        checked_at=max(state.checked_at for state in states.values()),
+        endpoints={url: state.status for url, state in states.items()},
+    )
+
+
+class UpstreamMonitor:
+    """Probes all cells in parallel on an interval and keeps a snapshot of the results.
+
+    The snapshot is replaced as a whole after every round, so readers never see a
+    partially updated view and never have to wait for a probe.
+    """
+
+    def __init__(self):
+        self.snapshot: Dict[str, UpstreamState] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def probe(self, cell_id: str, url: str) -> UpstreamState:
+        """Probe the health endpoint of a single replica of a cell."""
+        http_client = await dependencies.get_http_client(cell_id)
+        start_time = time.perf_counter()
+        try:
+            response = await http_client.get(f"{url}/health", timeout=settings.health_check_timeout)
+            latency = time.perf_counter() - start_time
+            status = "healthy" if response.status_code == 200 else "unhealthy"
+        except Exception as e:
+            logger.warning(f"Health check failed for nginx-{cell_id} at {url}: {str(e)}")
+            latency = None
+            status = "unreachable"
+        return UpstreamState(status=status, latency=latency, checked_at=time.time())
+
+    async def _probe_limited(self, cell_id: str, url: str) -> UpstreamState:
+        async with self._semaphore:
+            return await self.probe(cell_id, url)
+
+    async def probe_cell(self, cell_id: str, urls: List[str]) -> UpstreamState:
+        """Probe every replica of a cell concurrently and record the combined state."""
+        results = await asyncio.gather(*(self._probe_limited(cell_id, url) for url in urls))
+        state = combine_states(dict(zip(urls, results)))
+
+        upstream_up.labels(cell_id=cell_id).set(1 if state.status in ("healthy", "degraded") else 0)
+        if state.latency is not None:
+            upstream_probe_latency.labels(cell_id=cell_id).set(state.latency)
+        return state
+
+    async def probe_all(self) -> Dict[str, UpstreamState]:
+        """Probe every replica of every registered cell concurrently and publish a new snapshot."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.health_check_concurrency)
+        cells = [(cell_id, list(urls)) for cell_id, urls in cell_registry.cells.items() if urls]
+        results = await asyncio.gather(*(self.probe_cell(cell_id, urls) for cell_id, urls in cells))
+        self.snapshot = dict(zip((cell_id for cell_id, _ in cells), results))
+        return self.snapshot
+
+    def is_ready(self) -> bool:
+        """Return whether at least one replica of any cell passed its last probe."""
+        return any(state.status in ("healthy", "degraded") for state in self.snapshot.values())
+
+    async def run(self):
+        """Probe the cells forever, sleeping a jittered interval between rounds."""
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error(f"Upstream health monitor round failed: {str(e)}")
+
+            jitter = settings.health_check_interval * settings.health_check_jitter
+            await asyncio.sleep(settings.health_check_interval + random.uniform(-jitter, jitter))
+
+    def start(self):
+        """Start the background probe task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name="upstream-monitor")
+
+    async def stop(self):
+        """Stop the background probe task."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global monitor instance
+monitor = UpstreamMonitor()
@@ -0,0 +1,114 @@
+"""Tests for replica load balancing."""
+from collections import Counter
+from unittest.mock import patch
+
+import httpx
+from fastapi.testclient import TestClient
+
+from balancer import CellBalancer, Endpoint, round_robin, least_outstanding, p2c_ewma
+from main import app
+
+client = TestClient(app)
+
+URLS = ["http://nginx-1a", "http://nginx-1b", "http://nginx-1c"]
+
+
+def test_round_robin_cycles_endpoints():
+    """Test round robin visits every replica in turn."""
+    balancer = CellBalancer("1", URLS, round_robin)
+
+    assert [balancer.pick().url for _ in range(4)] == URLS + URLS[:1]
+
+
+def test_least_outstanding_avoids_busy_endpoint():
+    """Test the replica with the fewest in-flight requests is chosen."""
+    balancer = CellBalancer("1", URLS, least_outstanding)
+    balancer.endpoints[0].start()
+    balancer.endpoints[1].start()
+
+    assert balancer.pick().url == "http://nginx-1c"
+
+
+def test_p2c_ewma_prefers_fast_endpoint():
+    """Test power of two choices sends most traffic away from a slow replica."""
+    balancer = CellBalancer("1", URLS[:2], p2c_ewma)
+    fast, slow = balancer.endpoints
+    for endpoint, latency in ((fast, 0.01), (slow, 0.5)):
+        endpoint.start()
+        endpoint.finish("1", latency, True)
+
+    picks = Counter(balancer.pick().url for _ in range(100))
+
+    assert picks["http://nginx-1a"] == 100
+
+
+def test_failing_endpoint_is_ejected():
+    """Test consecutive failures eject a replica until every replica is ejected."""
+    balancer = CellBalancer("1", URLS[:2], round_robin)
+    bad = balancer.endpoints[1]
+    with patch("config.settings.balancer_ejection_failures", 2):
+        for _ in range(2):
+            bad.start()
+            bad.finish("1", None, False)
+
+    assert {balancer.pick().url for _ in range(10)} == {"http://nginx-1a"}
+
+    balancer.endpoints[0].ejected_until = bad.ejected_until
+    assert {balancer.pick().url for _ in range(10)} == set(URLS[:2])
+
+
+def test_update_keeps_endpoint_statistics():
+    """Test a registry update keeps the state of replicas that remain."""
+    balancer = CellBalancer("1", URLS[:2], p2c_ewma)
+    kept = balancer.endpoints[1]
+    kept.start()
+
+    balancer.update(URLS[1:])
+
+    assert balancer.endpoints[0] is kept
+    assert isinstance(balancer.endpoints[1], Endpoint)
+    assert kept.outstanding == 1
+
+
+def test_route_spreads_over_replicas():
+    """Test /api/route sends requests to every replica of the cell."""
+    seen = Counter()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen[request.url.host] += 1
+        return httpx.Response(200, json={"ok": True})
+
+    async def get_client(cell_id=None):
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    balancer = CellBalancer("1", URLS, round_robin)
+    with patch("dependencies.get_http_client", get_client), \
+            patch.dict("balancer._balancers", {"1": balancer}), \
+            patch("config.settings.api_key_enabled", False):
+        for _ in range(6):
+            response = client.post("/api/route", json={"cellID": "1"})
+            assert response.status_code == 200
+
+    assert seen == {"nginx-1a": 2, "nginx-1b": 2, "nginx-1c": 2}
+    assert all(endpoint.outstanding == 0 for endpoint in balancer.endpoints)
+
+
+def test_p2c_ewma_new_and_failing_endpoints_are_not_free():
+    """Test a new replica starts from the cell's mean latency and fast errors count as slow."""
+    balancer = CellBalancer("1", URLS[:2], p2c_ewma)
+    healthy, failing = balancer.endpoints
+    for endpoint in balancer.endpoints:
+        endpoint.start()
+        endpoint.finish("1", 0.02, True)
+
+    balancer.update(URLS)
+    added = balancer.endpoints[2]
+    assert added.ewma == 0.02
+    for _ in range(3):
+        added.start()
+    assert added.cost() > healthy.cost()
+
+    failing.start()
+    failing.finish("1", 0.001, False)
+    assert failing.ewma > 0.02
+    assert Counter(balancer.pick([added]).url for _ in range(50)) == {"http://nginx-1a": 50}
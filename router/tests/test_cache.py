@@ -0,0 +1,68 @@
+"""Tests for the response cache."""
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from main import app
+from cache import ResponseCache, cache_ttl, response_cache
+
+client = TestClient(app)
+
+
+def test_cache_lru_eviction_by_size():
+    """Test least recently used entries are evicted to respect the byte bound."""
+    cache = ResponseCache(max_bytes=100)
+    cache.set("a", "1", "A", size=40, ttl=60)
+    cache.set("b", "1", "B", size=40, ttl=60)
+    assert cache.get("a", "1") == "A"
+
+    cache.set("c", "2", "C", size=40, ttl=60)
+    assert cache.get("b", "1") is None
+    assert cache.get("a", "1") == "A"
+    assert cache.get("c", "2") == "C"
+    assert cache.size == 80
+
+
+def test_cache_expiry():
+    """Test entries are served until their TTL passes, then dropped."""
+    cache = ResponseCache(max_bytes=100)
+    with patch("cache.time.monotonic", return_value=1000.0):
+        cache.set("a", "1", "A", size=10, ttl=5)
+        assert cache.get("a", "1") == "A"
+
+    with patch("cache.time.monotonic", return_value=1005.0):
+        assert cache.get("a", "1") is None
+    assert len(cache) == 0
+    assert cache.size == 0
+
+
+def test_cache_ttl_from_cache_control():
+    """Test Cache-Control from the cell overrides the configured TTL."""
+    assert cache_ttl("1", None) == 1.0
+    assert cache_ttl("1", "public, max-age=30") == 30.0
+    assert cache_ttl("1", "max-age=30, s-maxage=5") == 5.0
+    assert cache_ttl("1", "no-store") == 0.0
+    assert cache_ttl("1", "private, max-age=30") == 0.0
+
+
+def test_route_served_from_cache():
+    """Test repeated identical requests hit the upstream once."""
+    response_cache.clear()
+    with patch('dependencies.get_http_client') as mock_get_client, \
+            patch('config.settings.api_key_enabled', False), \
+            patch('config.settings.cache_enabled', True):
+        mock_client = AsyncMock()
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"test": "response"}
+        mock_response.headers = {"content-type": "application/json"}
+        mock_response.content = b'{"test": "response"}'
+        mock_client.post.return_value = mock_response
+        mock_get_client.return_value = mock_client
+
+        for _ in range(3):
+            response = client.post("/api/route", json={"cellID": "3"})
+            assert response.status_code == 200
+            assert response.json()["response"] == {"test": "response"}
+
+        assert mock_client.post.call_count == 1
+    response_cache.clear()
@@ -0,0 +1,88 @@
+"""Tests for the cell registry."""
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from cells import CellRegistry, parse_cell_document, cell_registry
+from main import app
+
+client = TestClient(app)
+
+
+def test_parse_url_mapping():
+    """Test cells given as URLs, URL lists and comma-separated URLs."""
+    cells = parse_cell_document({"cells": {
+        "1": "http://nginx-1/",
+        "2": ["http://nginx-2a", "http://nginx-2b"],
+        "3": "http://nginx-3a, http://nginx-3b",
+    }})
+
+    assert cells == {
+        "1": ("http://nginx-1",),
+        "2": ("http://nginx-2a", "http://nginx-2b"),
+        "3": ("http://nginx-3a", "http://nginx-3b"),
+    }
+
+    for invalid in ([1, 2], {"urls": ["http://nginx-4", None]}):
+        with pytest.raises(ValueError):
+            parse_cell_document({"cells": {"4": invalid}})
+
+
+def test_parse_endpoints_list():
+    """Test every ready address of a labelled Kubernetes Endpoints object becomes a replica on the selected port."""
+    document = {
+        "kind": "EndpointsList",
+        "items": [
+            {
+                "metadata": {"name": "nginx-7-nginx-cell", "labels": {"cell-id": "7"}},
+                "subsets": [{
+                    "addresses": [{"ip": "10.0.0.1"}, {"ip": "10.0.0.2"}],
+                    "ports": [{"name": "http", "port": 8080}, {"name": "metrics", "port": 9113}],
+                }],
+            },
+            {"metadata": {"name": "nginx-8-nginx-cell", "labels": {"cell-id": "8"}}, "subsets": []},
+            # Without the label the name would be taken as a cell ID too long to ever route to
+            {"metadata": {"name": "nginx-9-nginx-cell"}, "subsets": []},
+            {"metadata": {"name": "nginx-10", "labels": {"cell-id": "nginx-10-nginx-cell"}}, "subsets": []},
+        ],
+    }
+
+    cells = parse_cell_document(document)
+
+    assert cells == {"7": ("http://10.0.0.1:8080", "http://10.0.0.2:8080"), "8": ()}
+    assert parse_cell_document(document, port="9113")["7"] == ("http://10.0.0.1:9113", "http://10.0.0.2:9113")
+
+
+def test_replace_notifies_listeners():
+    """Test a reload swaps the snapshot and tells listeners what changed."""
+    registry = CellRegistry({"1": ("http://nginx-1",)})
+    changes = []
+    registry.subscribe(lambda old, new: changes.append((set(old), set(new))))
+
+    registry.replace({"1": ("http://nginx-1",)})
+    registry.replace({"2": ("http://nginx-2",)})
+
+    assert changes == [({"1"}, {"2"})]
+    assert "2" in registry and "1" not in registry
+    assert registry.url("2") == "http://nginx-2"
+    assert registry.url("1") is None
+
+
+def test_validation_follows_registry():
+    """Test a cell added to the registry is routable and listed without a restart."""
+    cells = {str(cell_id): (f"http://nginx-{cell_id}",) for cell_id in range(1, 2001)}
+    with patch.object(cell_registry, "cells", cell_registry.cells), \
+            patch.object(cell_registry, "cell_ids", cell_registry.cell_ids), \
+            patch.object(cell_registry, "invalid_cell_message", cell_registry.invalid_cell_message), \
+            patch.object(cell_registry, "_listeners", []):
+        cell_registry.replace(cells)
+
+        with patch("config.settings.api_key_enabled", False):
+            response = client.get("/api/cells")
+            assert response.status_code == 200
+            assert response.json()["count"] == 2000
+
+            response = client.post("/api/route/batch", json={"requests": [{"cellID": "2001"}]})
+            assert response.status_code == 422
+            assert "1980 more" in response.text
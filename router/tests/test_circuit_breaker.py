@@ -0,0 +1,104 @@
+"""Tests for the per-cell circuit breaker."""
+import asyncio
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+from unittest.mock import patch, AsyncMock
+
+from main import app
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from concurrency import AdaptiveLimiter
+import routing
+
+client = TestClient(app)
+
+
+def test_breaker_state_transitions():
+    """Test closed -> open -> half_open -> closed transitions."""
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=0.0, half_open_max_calls=1)
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    # Recovery timeout elapsed: one trial request is allowed
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_breaker_half_open_failure_reopens():
+    """Test a failed trial request re-opens the circuit."""
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.0, half_open_max_calls=1)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+
+def test_route_fails_fast_when_open():
+    """Test an open circuit returns 503 without calling the upstream."""
+    breaker = CircuitBreaker("2", failure_threshold=1, recovery_timeout=60.0, half_open_max_calls=1)
+
+    with patch('routing.get_breaker', return_value=breaker), \
+            patch('dependencies.get_http_client') as mock_get_client, \
+            patch('config.settings.api_key_enabled', False), \
+            patch('config.settings.retry_enabled', False):
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = httpx.ConnectTimeout("timed out")
+        mock_get_client.return_value = mock_client
+
+        assert client.post("/api/route", json={"cellID": "2"}).status_code == 504
+        response = client.post("/api/route", json={"cellID": "2"})
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) > 0
+        assert mock_client.post.call_count == 1
+
+
+def test_cancelled_trial_request_frees_half_open_slot():
+    """Test a client disconnecting during a half-open trial, or while queued for a slot, does not wedge the circuit."""
+    breaker = CircuitBreaker("2", failure_threshold=1, recovery_timeout=0.0, half_open_max_calls=1)
+    breaker.record_failure()
+    limiter = AdaptiveLimiter(
+        "2", initial_limit=1.0, min_limit=1.0, max_limit=1.0, tolerance=2.0, backoff=0.5,
+        queue_size=1, queue_timeout=10.0, min_rtt_window=30.0,
+    )
+    scope = {"type": "http", "method": "POST", "path": "/api/route", "headers": [], "query_string": b""}
+
+    async def hang(request):
+        await asyncio.Event().wait()
+
+    async def get_client(cell_id=None):
+        return httpx.AsyncClient(transport=httpx.MockTransport(hang))
+
+    async def cancel_route():
+        task = asyncio.create_task(routing.fetch_from_cell("2", "client", Request(scope)))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    async def run():
+        # Cancelled while waiting for the upstream
+        await cancel_route()
+        assert breaker.state == HALF_OPEN
+        assert breaker.half_open_calls == 0
+
+        # Cancelled while queued behind a busy concurrency slot
+        with patch('config.settings.concurrency_limit_enabled', True):
+            limiter.inflight = 1
+            await cancel_route()
+            assert breaker.half_open_calls == 0
+        assert breaker.allow_request()
+
+    with patch('routing.get_breaker', return_value=breaker), \
+            patch('routing.get_limiter', return_value=limiter), \
+            patch('dependencies.get_http_client', get_client), \
+            patch('config.settings.retry_enabled', False):
+        asyncio.run(run())
@@ -0,0 +1,90 @@
+"""Tests for single-flight request coalescing."""
+import asyncio
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from main import app
+from coalescing import SingleFlight, load_key_function, key_by_cell, key_by_cell_and_client
+
+client = TestClient(app)
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    """Test identical concurrent calls run the function once."""
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"cell": "1"}
+
+    async def run():
+        group = SingleFlight(max_waiters=100)
+        results = await asyncio.gather(*(group.do("1", "1", fetch) for _ in range(50)))
+        assert len(group) == 0
+        return results
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(result == {"cell": "1"} for result in results)
+
+
+def test_waiter_cap_starts_new_call():
+    """Test a full call does not take more waiters than the cap."""
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def run():
+        group = SingleFlight(max_waiters=4)
+        return await asyncio.gather(*(group.do("1", "1", fetch) for _ in range(10)))
+
+    asyncio.run(run())
+    assert calls == 2
+
+
+def test_errors_propagate_to_all_waiters():
+    """Test an upstream failure is raised to every waiter."""
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        group = SingleFlight(max_waiters=10)
+        return await asyncio.gather(*(group.do("1", "1", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_load_key_function():
+    """Test key functions resolve by name or import path."""
+    assert load_key_function("cell") is key_by_cell
+    assert load_key_function("coalescing:key_by_cell") is key_by_cell
+
+
+def test_calls_shared_across_clients_omit_client_headers():
+    """Test a cell-only coalescing key sends no client headers upstream, while the per-client key keeps them."""
+    for key_function, shared in ((key_by_cell, True), (key_by_cell_and_client, False)):
+        with patch('dependencies.get_http_client') as mock_get_client, \
+                patch('config.settings.api_key_enabled', False), \
+                patch('config.settings.coalesce_enabled', True), \
+                patch('coalescing.coalesce_key', key_function):
+            mock_client = AsyncMock()
+            mock_response = MagicMock()
+            mock_response.status_code = 200
+            mock_response.content = b'{"test": "response"}'
+            mock_response.headers = {"content-type": "application/json"}
+            mock_client.post.return_value = mock_response
+            mock_get_client.return_value = mock_client
+
+            assert client.post("/api/route", json={"cellID": "1"}).status_code == 200
+            headers = mock_client.post.call_args.kwargs["headers"]
+            assert headers["X-Cell-ID"] == "1"
+            assert ("X-Client-ID" in headers) is not shared
+            assert ("X-Forwarded-For" in headers) is not shared
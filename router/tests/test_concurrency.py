@@ -0,0 +1,122 @@
+"""Tests for adaptive concurrency limiting."""
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from concurrency import AdaptiveLimiter, Overloaded
+from main import app
+import routing
+
+client = TestClient(app)
+
+
+def make_limiter(**overrides) -> AdaptiveLimiter:
+    options = dict(
+        initial_limit=2.0, min_limit=1.0, max_limit=10.0, tolerance=2.0, backoff=0.5,
+        queue_size=1, queue_timeout=0.05, min_rtt_window=30.0,
+    )
+    options.update(overrides)
+    return AdaptiveLimiter("1", **options)
+
+
+def test_requests_over_limit_queue_then_shed():
+    """Test one request waits for a free slot, the next is shed and a slow wait times out."""
+    limiter = make_limiter()
+
+    async def run():
+        await limiter.acquire()
+        await limiter.acquire()
+
+        queued = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded, match="queue_full"):
+            await limiter.acquire()
+
+        limiter.release(0.01, True)
+        await queued
+        assert limiter.inflight == 2
+
+        with pytest.raises(Overloaded, match="queue_timeout"):
+            await limiter.acquire()
+
+    asyncio.run(run())
+
+
+def test_limit_follows_latency():
+    """Test the limit grows while latency is low and backs off when it climbs."""
+    limiter = make_limiter(initial_limit=4.0)
+
+    async def run():
+        for _ in range(4):
+            await limiter.acquire()
+        for _ in range(4):
+            limiter.release(0.01, True)
+        grown = limiter.limit
+        assert grown > 4.0
+
+        await limiter.acquire()
+        limiter.release(0.5, True)
+        assert limiter.limit == pytest.approx(grown * 0.5)
+
+    asyncio.run(run())
+
+
+def test_route_is_shed_when_cell_is_overloaded():
+    """Test /api/route answers 503 quickly when no slot frees up in time."""
+    limiter = make_limiter(initial_limit=1.0, queue_size=0)
+    limiter.inflight = 1
+
+    async def get_client(cell_id=None):
+        return httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json={})))
+
+    with patch("dependencies.get_http_client", get_client), \
+            patch("routing.get_limiter", return_value=limiter), \
+            patch("config.settings.concurrency_limit_enabled", True), \
+            patch("config.settings.api_key_enabled", False):
+        response = client.post("/api/route", json={"cellID": "1"})
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+
+        limiter.inflight = 0
+        assert client.post("/api/route", json={"cellID": "1"}).status_code == 200
+        assert limiter.inflight == 0
+
+
+def test_aborted_stream_returns_its_slot_once():
+    """Test a stream the client abandons gives its slot back exactly once, whether or not the body started."""
+    limiter = make_limiter(initial_limit=1.0, queue_size=0)
+    scope = {"type": "http", "method": "POST", "path": "/api/route", "headers": [], "query_string": b""}
+
+    class Body(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield b"{}"
+
+    async def get_client(cell_id=None):
+        return httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, stream=Body())))
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    def failing_send(fail_on: str):
+        async def send(message):
+            if message["type"] == fail_on:
+                raise OSError("connection reset by peer")
+        return send
+
+    async def run():
+        for fail_on in ("http.response.start", "http.response.body"):
+            response = await routing.stream_from_cell("1", "client", Request(scope))
+            assert limiter.inflight == 1
+            with pytest.raises(OSError):
+                await response(scope, receive, failing_send(fail_on))
+            assert limiter.inflight == 0
+
+    with patch("dependencies.get_http_client", get_client), \
+            patch("routing.get_limiter", return_value=limiter), \
+            patch("config.settings.concurrency_limit_enabled", True):
+        asyncio.run(run())
@@ -31,9 +31,15 @@ def test_env_override():
 def test_nginx_url_configuration():
     """Test NGINX URL configuration from environment."""
     os.environ["NGINX_1_URL"] = "http://custom-nginx-1.local"
+    os.environ["NGINX_PROXY_URL"] = "http://proxy.local"
+    os.environ["NGINX_1_SERVICE_URL"] = "http://service.local"
     
     settings = Settings()
     assert settings.nginx_urls["1"] == "http://custom-nginx-1.local"
+    assert "PROXY" not in settings.nginx_urls
+    assert "1_SERVICE" not in settings.nginx_urls
     
     # Cleanup
-    del os.environ["NGINX_1_URL"]
\ No newline at end of file
+    del os.environ["NGINX_1_URL"]
+    del os.environ["NGINX_PROXY_URL"]
+    del os.environ["NGINX_1_SERVICE_URL"]
\ No newline at end of file
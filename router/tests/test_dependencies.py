@@ -0,0 +1,40 @@
+"""Tests for shared dependencies."""
+import asyncio
+from unittest.mock import patch
+
+import dependencies
+
+
+def test_pool_config_defaults_and_overrides():
+    """Test per-cell pool overrides are applied on top of the defaults."""
+    with patch.dict(dependencies.CELL_POOL_OVERRIDES, {"2": {"max_connections": 5, "http2": True}}):
+        default = dependencies.get_pool_config("1")
+        override = dependencies.get_pool_config("2")
+
+    assert default["max_connections"] == dependencies.settings.pool_max_connections
+    assert override["max_connections"] == 5
+    assert override["http2"] is True
+    assert override["keepalive_expiry"] == default["keepalive_expiry"]
+
+
+def test_http_client_per_cell():
+    """Test each cell gets its own HTTP client and connection pool."""
+    async def run():
+        client_1 = await dependencies.get_http_client("1")
+        client_2 = await dependencies.get_http_client("2")
+        assert client_1 is not client_2
+        assert client_1 is await dependencies.get_http_client("1")
+        # One TLS context is shared instead of loading the CA bundle per pool
+        assert client_1._transport._pool._ssl_context is client_2._transport._pool._ssl_context
+        await dependencies.close_http_client()
+        assert client_1.is_closed
+
+    asyncio.run(run())
+
+
+def test_pool_overrides_skip_invalid_entries():
+    """Test pool options that are not JSON objects are ignored instead of failing the import."""
+    with patch("config.settings.cell_pools_json", '{"1": 5, "2": {"max_connections": 7, "bogus": 1}}'):
+        assert dependencies.load_pool_overrides() == {"2": {"max_connections": 7}}
+    with patch("config.settings.cell_pools_json", "[1, 2]"):
+        assert dependencies.load_pool_overrides() == {}
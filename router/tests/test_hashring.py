@@ -0,0 +1,81 @@
+"""Tests for consistent-hash routing."""
+import asyncio
+from collections import Counter
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from fastapi.testclient import TestClient
+
+import hashring
+from cells import CellRegistry
+from hashring import HashRing
+from main import app
+
+client = TestClient(app)
+
+KEYS = [f"tenant-{i}" for i in range(10000)]
+
+
+def test_adding_cell_moves_about_one_nth_of_keys():
+    """Test a new cell takes over roughly 1/N of the keys and nothing else moves."""
+    before = HashRing({str(cell_id): 1.0 for cell_id in range(1, 10)}, vnodes=100)
+    after = HashRing({str(cell_id): 1.0 for cell_id in range(1, 11)}, vnodes=100)
+
+    moved = [key for key in KEYS if before.lookup(key) != after.lookup(key)]
+
+    assert all(after.lookup(key) == "10" for key in moved)
+    assert 0.05 < len(moved) / len(KEYS) < 0.15
+
+
+def test_weights_scale_key_share():
+    """Test a cell with twice the weight owns about twice the keys."""
+    ring = HashRing({"1": 1.0, "2": 2.0, "3": 0.0}, vnodes=200)
+
+    owners = Counter(ring.lookup(key) for key in KEYS)
+
+    assert "3" not in owners
+    assert 1.6 < owners["2"] / owners["1"] < 2.4
+
+
+def test_lookup_cache_and_empty_ring():
+    """Test lookups are memoised and an empty ring owns nothing."""
+    ring = HashRing({"1": 1.0, "2": 1.0}, vnodes=10, cache_size=16)
+    assert ring.lookup("tenant-1") == ring.lookup("tenant-1")
+    assert ring.lookup.cache_info().hits == 1
+
+    assert HashRing({}, vnodes=10).lookup("tenant-1") is None
+
+
+def test_route_by_key():
+    """Test /api/route/key routes to the cell owning the key."""
+    ring = HashRing({"2": 1.0}, vnodes=10)
+    with patch('dependencies.get_http_client') as mock_get_client:
+        mock_client = AsyncMock()
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"content-type": "application/json"}
+        mock_response.json.return_value = {"status": "ok"}
+        mock_response.content = b'{"status": "ok"}'
+        mock_client.post.return_value = mock_response
+        mock_get_client.return_value = mock_client
+
+        with patch('config.settings.api_key_enabled', False), patch('hashring.hash_ring', ring):
+            response = client.post("/api/route/key", json={"routingKey": "tenant-42"})
+            assert response.status_code == 200
+            assert response.json()["cellID"] == "2"
+
+            response = client.post("/api/route/key", json={"routingKey": ""})
+            assert response.status_code == 422
+
+
+def test_ring_follows_registry():
+    """Test a registry change rebuilds the ring in the background."""
+    registry = CellRegistry({"1": ("http://nginx-1",)})
+    registry.subscribe(hashring.rebuild_ring)
+
+    async def run():
+        with patch('hashring.cell_registry', registry), patch('hashring.hash_ring', hashring.hash_ring):
+            registry.replace({"5": ("http://nginx-5",), "6": ()})
+            await asyncio.gather(*hashring._builds)
+            assert hashring.hash_ring.cell_ids == {"5"}
+
+    asyncio.run(run())
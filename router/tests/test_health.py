@@ -0,0 +1,94 @@
+"""Tests for health endpoints and the upstream monitor."""
+import asyncio
+import httpx
+from fastapi.testclient import TestClient
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from main import app
+from cells import cell_registry
+from upstream_monitor import monitor, UpstreamState
+
+client = TestClient(app)
+
+
+def test_monitor_probes_cells_in_parallel():
+    """Test a probe round probes the cells concurrently and records healthy and unreachable cells."""
+    inflight = 0
+    peak = 0
+
+    async def fake_get(url, timeout=None):
+        nonlocal inflight, peak
+        inflight += 1
+        peak = max(peak, inflight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            inflight -= 1
+        if "nginx-2" in url:
+            raise httpx.ConnectError("connection refused")
+        response = MagicMock()
+        response.status_code = 200
+        return response
+
+    with patch('dependencies.get_http_client') as mock_get_client, \
+            patch.object(monitor, "snapshot", monitor.snapshot), \
+            patch.object(monitor, "_semaphore", None):
+        mock_client = AsyncMock()
+        mock_client.get.side_effect = fake_get
+        mock_get_client.return_value = mock_client
+
+        snapshot = asyncio.run(monitor.probe_all())
+
+        assert peak == 3
+        assert snapshot["1"].status == "healthy"
+        assert snapshot["2"].status == "unreachable"
+        assert snapshot["1"].latency is not None
+        assert monitor.is_ready()
+
+
+def test_monitor_probes_every_replica():
+    """Test every replica of a cell is probed and a cell with some failing replicas is reported as degraded."""
+    probed = []
+
+    async def fake_get(url, timeout=None):
+        probed.append(url)
+        if "nginx-1b" in url or "nginx-2" in url:
+            raise httpx.ConnectError("connection refused")
+        response = MagicMock()
+        response.status_code = 200
+        return response
+
+    cells = {"1": ("http://nginx-1a", "http://nginx-1b"), "2": ("http://nginx-2a", "http://nginx-2b")}
+    with patch('dependencies.get_http_client') as mock_get_client, \
+            patch.object(cell_registry, "cells", cells), \
+            patch.object(monitor, "snapshot", monitor.snapshot), \
+            patch.object(monitor, "_semaphore", None):
+        mock_client = AsyncMock()
+        mock_client.get.side_effect = fake_get
+        mock_get_client.return_value = mock_client
+
+        snapshot = asyncio.run(monitor.probe_all())
+
+        assert sorted(probed) == sorted(f"{url}/health" for urls in cells.values() for url in urls)
+        assert snapshot["1"].status == "degraded"
+        assert snapshot["1"].endpoints == {"http://nginx-1a": "healthy", "http://nginx-1b": "unreachable"}
+        assert snapshot["2"].status == "unreachable"
+        assert snapshot["2"].latency is None
+        assert monitor.is_ready()
+
+        data = client.get("/health").json()
+        assert data["upstream_endpoints"]["nginx-1"]["http://nginx-1b"] == "unreachable"
+
+
+def test_health_and_ready_use_snapshot():
+    """Test health and readiness answer from the monitor snapshot."""
+    unhealthy = {cell_id: UpstreamState("unreachable", None, 0.0) for cell_id in ("1", "2", "3")}
+    with patch.object(monitor, "snapshot", unhealthy):
+        assert client.get("/ready").status_code == 503
+        data = client.get("/health").json()
+        assert data["upstreams"]["nginx-1"] == "unreachable"
+
+    healthy = dict(unhealthy, **{"3": UpstreamState("healthy", 0.002, 0.0)})
+    with patch.object(monitor, "snapshot", healthy):
+        assert client.get("/ready").status_code == 200
+        assert client.get("/health").json()["upstream_latency_ms"]["nginx-3"] == 2.0
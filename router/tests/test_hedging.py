@@ -0,0 +1,90 @@
+"""Tests for hedged requests and budgeted retries."""
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+import hedging
+from hedging import LatencyTracker, RetryBudget, call_with_hedging
+
+
+def make_attempts(*behaviours):
+    """Build an attempt function that plays the given behaviours in order."""
+    calls = []
+
+    async def attempt():
+        behaviour = behaviours[len(calls)]
+        calls.append(behaviour)
+        delay, outcome = behaviour
+        await asyncio.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return attempt, calls
+
+
+def test_hedge_wins_over_slow_attempt():
+    """Test a hedge started after the delay answers before the slow original."""
+    attempt, calls = make_attempts((1.0, "slow"), (0.0, "fast"))
+
+    with patch("config.settings.hedge_enabled", True), patch("config.settings.hedge_delay", 0.01), \
+            patch("hedging.retry_budget", RetryBudget(0.1, 1.0)):
+        result = asyncio.run(call_with_hedging("1", attempt))
+
+    assert result == "fast"
+    assert len(calls) == 2
+
+
+def test_connect_error_is_retried():
+    """Test a connection failure is retried and the retry's answer is returned."""
+    attempt, calls = make_attempts((0.0, httpx.ConnectError("refused")), (0.0, "ok"))
+
+    with patch("config.settings.retry_enabled", True), patch("hedging.retry_budget", RetryBudget(0.1, 1.0)):
+        assert asyncio.run(call_with_hedging("1", attempt)) == "ok"
+    assert len(calls) == 2
+
+
+def test_retries_are_off_by_default():
+    """Test a connection failure is not retried unless RETRY_ENABLED is set."""
+    attempt, calls = make_attempts((0.0, httpx.ConnectError("refused")), (0.0, "ok"))
+
+    with patch("hedging.retry_budget", RetryBudget(0.1, 1.0)):
+        with pytest.raises(httpx.ConnectError):
+            asyncio.run(call_with_hedging("1", attempt))
+    assert len(calls) == 1
+
+
+def test_other_errors_are_not_retried():
+    """Test a failure that may have reached the upstream is not repeated."""
+    attempt, calls = make_attempts((0.0, httpx.ReadTimeout("slow")), (0.0, "ok"))
+
+    with patch("config.settings.retry_enabled", True), patch("hedging.retry_budget", RetryBudget(0.1, 1.0)):
+        with pytest.raises(httpx.ReadTimeout):
+            asyncio.run(call_with_hedging("1", attempt))
+    assert len(calls) == 1
+
+
+def test_exhausted_budget_stops_retries():
+    """Test retries stop once the budget is spent."""
+    budget = RetryBudget(0.0, 0.0)
+    budget.tokens = 1.0
+    attempt, calls = make_attempts(*[(0.0, httpx.ConnectError("refused"))] * 3)
+
+    with patch("config.settings.retry_enabled", True), patch("hedging.retry_budget", budget):
+        with pytest.raises(httpx.ConnectError):
+            asyncio.run(call_with_hedging("1", attempt))
+    assert len(calls) == 2
+
+
+def test_latency_tracker_percentile():
+    """Test the tracked percentile needs enough samples and follows the window."""
+    tracker = LatencyTracker(0.95)
+    for _ in range(hedging.MIN_LATENCY_SAMPLES - 1):
+        tracker.record(0.01)
+    assert tracker.value is None
+
+    for latency in list(range(100)) * 11:
+        tracker.record(latency / 1000)
+    assert 0.09 <= tracker.value <= 0.1
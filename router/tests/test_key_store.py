@@ -0,0 +1,44 @@
+"""Tests for the hashed API key store."""
+import asyncio
+import json
+import os
+
+from key_store import ApiKeyStore, HASH_PREFIX, hash_api_key
+from file_watch import FileWatcher
+
+
+def test_keys_are_stored_hashed():
+    """Test plaintext keys are hashed and prehashed keys are accepted."""
+    prehashed = f"{HASH_PREFIX}{hash_api_key('key-2').hex()}"
+    store = ApiKeyStore.from_plaintext({"key-1": "client1", prehashed: "client2"})
+
+    assert store.lookup("key-1") == "client1"
+    assert store.lookup("key-2") == "client2"
+    assert store.lookup("wrong-key") is None
+    assert "key-1" not in repr(dict(store._keys))
+
+
+def test_file_reload_swaps_snapshot(tmp_path):
+    """Test a changed key file is picked up by the watcher."""
+    path = tmp_path / "api-keys.json"
+    path.write_text(json.dumps({"old-key": "client1"}))
+    store = ApiKeyStore()
+
+    async def run():
+        watcher = FileWatcher(str(path), 0.01, lambda: store.reload_file(str(path)))
+        watcher.signature = None
+        assert await watcher.check()
+        assert store.lookup("old-key") == "client1"
+
+        path.write_text(json.dumps({"new-key": "client2", "another": "client3"}))
+        os.utime(path, ns=(0, 10**9))
+        assert await watcher.check()
+        assert store.lookup("old-key") is None
+        assert store.lookup("new-key") == "client2"
+
+        # A broken file keeps the previous keys
+        path.write_text("{not json")
+        assert not await watcher.check()
+        assert store.lookup("new-key") == "client2"
+
+    asyncio.run(run())
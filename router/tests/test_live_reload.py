@@ -0,0 +1,70 @@
+"""Tests for live reload of settings and upstreams."""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from pydantic import ValidationError
+
+import dependencies
+import live_reload
+from cells import cell_registry
+from config import settings
+
+
+@pytest.fixture
+def settings_file(tmp_path):
+    """A settings file for the reload, with the settings and cells restored afterwards."""
+    saved = dict(settings.__dict__)
+    path = tmp_path / "router.env"
+    with patch.object(cell_registry, "cells", cell_registry.cells), \
+            patch.object(cell_registry, "weights", cell_registry.weights), \
+            patch.object(cell_registry, "cell_ids", cell_registry.cell_ids), \
+            patch.object(cell_registry, "invalid_cell_message", cell_registry.invalid_cell_message), \
+            patch("config.settings.settings_file", str(path)), \
+            patch.dict(dependencies._http_clients, clear=True):
+        yield path
+    settings.__dict__.update(saved)
+
+
+def test_reload_swaps_settings_and_keeps_unchanged_pools(settings_file):
+    """Test a reload applies new values and upstreams, drains only the pools that changed and ignores restart-only settings."""
+    settings_file.write_text(
+        "REQUEST_TIMEOUT=7.5\n"
+        "NGINX_2_URL=http://nginx-2-new\n"
+        "NGINX_3_URL=http://nginx-3\n"
+        f"PORT={settings.port + 1}\n"
+    )
+
+    async def run():
+        client_1 = await dependencies.get_http_client("1")
+        client_2 = await dependencies.get_http_client("2")
+        await live_reload.reload_settings()
+        await asyncio.gather(*dependencies._closing)
+        return client_1, client_2
+
+    port = settings.port
+    client_1, client_2 = asyncio.run(run())
+
+    assert settings.request_timeout == 7.5
+    assert settings.port == port
+    assert cell_registry.url("2") == "http://nginx-2-new"
+    assert cell_registry.url("3") == "http://nginx-3"
+    assert dependencies._http_clients == {"1": client_1}
+    assert not client_1.is_closed
+    assert client_2.is_closed
+
+
+def test_invalid_settings_keep_the_running_version(settings_file):
+    """Test a reload with an invalid value, or invalid state derived from one, fails before anything is swapped in."""
+    timeout = settings.request_timeout
+
+    settings_file.write_text("REQUEST_TIMEOUT=soon\n")
+    with pytest.raises(ValidationError):
+        asyncio.run(live_reload.reload_settings())
+
+    settings_file.write_text("REQUEST_TIMEOUT=7.5\nNGINX_9_URL=http://nginx-9\nAPI_KEYS_JSON={not json\n")
+    with pytest.raises(ValueError):
+        asyncio.run(live_reload.reload_settings())
+
+    assert settings.request_timeout == timeout
+    assert "9" not in cell_registry.cell_ids
@@ -0,0 +1,48 @@
+"""Tests for the non-blocking logging configuration."""
+import json
+import queue
+import logging
+
+from logging_config import DroppingQueueHandler, JsonFormatter, SamplingFilter
+from metrics import registry
+
+
+def make_record(level=logging.INFO, msg="Routing request for cell_id=%s", args=("1",)):
+    return logging.LogRecord("routing", level, __file__, 1, msg, args, None)
+
+
+def test_full_queue_drops_and_counts():
+    """Test records are dropped instead of blocking when the queue is full."""
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    before = registry.get_sample_value("router_log_records_dropped_total") or 0
+
+    handler.emit(make_record())
+    handler.emit(make_record())
+
+    assert handler.queue.qsize() == 1
+    assert registry.get_sample_value("router_log_records_dropped_total") == before + 1
+
+
+def test_queued_record_is_not_formatted():
+    """Test formatting is left to the listener thread."""
+    handler = DroppingQueueHandler(queue.Queue())
+    handler.emit(make_record())
+    record = handler.queue.get_nowait()
+    assert record.msg == "Routing request for cell_id=%s"
+    assert record.args == ("1",)
+
+
+def test_json_formatter():
+    """Test records are formatted as JSON objects."""
+    entry = json.loads(JsonFormatter().format(make_record()))
+    assert entry["message"] == "Routing request for cell_id=1"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "routing"
+
+
+def test_sampling_keeps_warnings():
+    """Test sampling drops INFO records but never warnings."""
+    sampler = SamplingFilter(0.0)
+    assert not sampler.filter(make_record())
+    assert sampler.filter(make_record(level=logging.WARNING))
+    assert SamplingFilter(1.0).filter(make_record())
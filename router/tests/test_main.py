@@ -3,6 +3,7 @@ import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock, AsyncMock
 
+import main
 from main import app
 
 client = TestClient(app)
@@ -33,6 +34,7 @@ def test_route_valid_cell():
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = {"test": "response"}
+        mock_response.content = b'{"test": "response"}'
         mock_response.headers = {"content-type": "application/json"}
         mock_client.post.return_value = mock_response
         mock_get_client.return_value = mock_client
@@ -56,4 +58,15 @@ def test_metrics_endpoint():
     """Test metrics endpoint."""
     response = client.get("/metrics")
     assert response.status_code == 200
-    assert "router_requests_total" in response.text
\ No newline at end of file
+    assert "router_requests_total" in response.text
+
+
+def test_openapi_served_from_prebuilt_file(tmp_path):
+    """Test /openapi.json is read from OPENAPI_FILE instead of being generated."""
+    path = tmp_path / "openapi.json"
+    path.write_text('{"openapi": "3.1.0", "info": {"title": "prebuilt", "version": "1"}, "paths": {}}')
+
+    with patch("config.settings.openapi_file", str(path)), \
+            patch.object(app, "openapi_schema", None), \
+            patch.object(app, "openapi", main.prebuilt_openapi):
+        assert client.get("/openapi.json").json()["info"]["title"] == "prebuilt"
@@ -0,0 +1,36 @@
+"""Tests for the request tracking middleware."""
+import httpx
+from fastapi.testclient import TestClient
+from unittest.mock import patch, AsyncMock
+
+from main import app
+from metrics import registry
+
+client = TestClient(app)
+
+
+def test_security_headers_added():
+    """Test security headers are set and the server header is removed."""
+    response = client.get("/")
+    assert response.headers["X-Content-Type-Options"] == "nosniff"
+    assert response.headers["X-Frame-Options"] == "DENY"
+    assert response.headers["Permissions-Policy"] == "geolocation=(), microphone=(), camera=()"
+    assert "server" not in response.headers
+
+
+def test_metrics_record_cell_and_client_from_route():
+    """Test cell and client IDs set by the route are used as metric labels."""
+    def handler(upstream_request):
+        return httpx.Response(200, json={"ok": True})
+
+    labels = {"cell_id": "3", "status": "200", "method": "POST", "client": "anonymous"}
+    before = registry.get_sample_value("router_requests_total", labels) or 0
+
+    mock_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with patch('dependencies.get_http_client', AsyncMock(return_value=mock_client)), \
+            patch('config.settings.api_key_enabled', False):
+        response = client.post("/api/route", json={"cellID": "3"})
+        assert response.status_code == 200
+        assert response.headers["Strict-Transport-Security"].startswith("max-age=")
+
+    assert registry.get_sample_value("router_requests_total", labels) == before + 1
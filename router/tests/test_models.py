@@ -2,7 +2,10 @@
 import pytest
 from pydantic import ValidationError
 
-from models import CellRequest, HealthResponse, RouteResponse
+from models import (
+    CellRequest, HealthResponse, RouteResponse,
+    encode_route_response, json_dumps, json_loads, json_payload, parse_cell_id
+)
 
 
 def test_cell_request_valid():
@@ -67,4 +70,36 @@ def test_route_response():
         status=200,
         response="Plain text response"
     )
-    assert response.response == "Plain text response"
\ No newline at end of file
+    assert response.response == "Plain text response"
+
+
+def test_parse_cell_id_fast_path():
+    """Test the fast path accepts valid bodies and reports pydantic's errors otherwise."""
+    assert parse_cell_id({"cellID": "2"}) == "2"
+    assert parse_cell_id({"cellID": "3", "extra": True}) == "3"
+
+    with pytest.raises(ValidationError) as exc_info:
+        parse_cell_id({"cellID": "999"})
+    assert "cellID must be one of" in str(exc_info.value)
+
+    for invalid in ({}, {"cellID": 1}, {"cellID": ""}, [], "1"):
+        with pytest.raises(ValidationError):
+            parse_cell_id(invalid)
+
+
+def test_encode_route_response_splices_upstream_json():
+    """Test the envelope embeds an upstream JSON object byte for byte and matches RouteResponse."""
+    upstream = b'{"b": 1, "a": [true, null]}\n'
+    result = encode_route_response("1", 200, json_payload(upstream))
+
+    assert upstream in result.body
+    expected = RouteResponse(cellID="1", upstream="nginx-1", status=200, response={"b": 1, "a": [True, None]})
+    assert json_loads(result.body) == expected.model_dump()
+
+    text = encode_route_response("2", 502, json_dumps('Bad "gateway"'))
+    assert json_loads(text.body)["response"] == 'Bad "gateway"'
+
+    assert json_loads(encode_route_response("3", 200, json_payload(b'"ok"')).body)["response"] == "ok"
+    for invalid in (b"[1, 2]", b"not json", b'{"a": ', b'{"a": 1} {'):
+        with pytest.raises(ValueError):
+            json_payload(invalid)
@@ -0,0 +1,50 @@
+"""Tests for upstream connection pre-warming."""
+import asyncio
+from unittest.mock import patch
+
+import httpx
+from fastapi.testclient import TestClient
+
+from main import app
+from prewarm import PoolWarmer
+from upstream_monitor import monitor, UpstreamState
+
+client = TestClient(app)
+
+
+def test_warm_all_sends_concurrent_requests_per_endpoint():
+    """Test each replica gets the configured number of concurrent requests, and failures are tolerated."""
+    inflight = {}
+    peak = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host.split("-nginx-cell")[0]
+        if host == "nginx-3":
+            raise httpx.ConnectError("connection refused")
+        inflight[host] = inflight.get(host, 0) + 1
+        peak[host] = max(peak.get(host, 0), inflight[host])
+        await asyncio.sleep(0.01)
+        inflight[host] -= 1
+        return httpx.Response(200)
+
+    async def get_client(cell_id=None):
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    with patch("dependencies.get_http_client", get_client), \
+            patch("config.settings.pool_prewarm_connections", 3):
+        warmed = asyncio.run(PoolWarmer().warm_all())
+
+    assert warmed == 6
+    assert peak == {"nginx-1": 3, "nginx-2": 3}
+
+
+def test_ready_waits_for_warm_up():
+    """Test /ready reports not ready until the first warm-up round has finished."""
+    healthy = {"1": UpstreamState("healthy", 0.001, 0.0)}
+    with patch.object(monitor, "snapshot", healthy):
+        with patch("prewarm.warmer.warming", True):
+            response = client.get("/ready")
+            assert response.status_code == 503
+            assert "Warming up" in response.json()["detail"]
+
+        assert client.get("/ready").status_code == 200
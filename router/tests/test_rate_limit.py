@@ -0,0 +1,71 @@
+"""Tests for per-client token-bucket rate limiting."""
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from main import app
+from config import Settings
+from rate_limit import RateLimiter, TokenBucket, load_client_limits
+
+client = TestClient(app)
+
+
+def test_token_bucket_refill():
+    """Test a bucket allows a burst and then refills at its rate."""
+    bucket = TokenBucket(rate=10.0, burst=2.0, now=0.0)
+    assert bucket.take(0.0) == 0.0
+    assert bucket.take(0.0) == 0.0
+    assert bucket.take(0.0) == 0.1
+    assert bucket.take(0.1) == 0.0
+
+
+def test_limiter_is_per_client_and_cell():
+    """Test buckets are independent per client and cell, with per-client overrides."""
+    limiter = RateLimiter(rate=1.0, burst=1.0, client_limits={"vip": (100.0, 5.0)}, idle_ttl=60.0)
+    assert limiter.acquire("client1", "1") == 0.0
+    assert limiter.acquire("client1", "1") > 0
+    assert limiter.acquire("client1", "2") == 0.0
+    assert limiter.acquire("client2", "1") == 0.0
+    assert all(limiter.acquire("vip", "1") == 0.0 for _ in range(5))
+
+
+def test_idle_buckets_are_evicted():
+    """Test the sweep removes idle buckets."""
+    limiter = RateLimiter(rate=1.0, burst=1.0, client_limits={}, idle_ttl=60.0)
+    limiter.acquire("client1", "1")
+    assert len(limiter) == 1
+    limiter.sweep(limiter._buckets["client1"]["1"].updated + 61.0)
+    assert len(limiter) == 0
+
+
+def test_route_returns_429_with_retry_after():
+    """Test over-limit requests are rejected before the upstream is called."""
+    limiter = RateLimiter(rate=0.5, burst=1.0, client_limits={}, idle_ttl=60.0)
+    with patch('routing.rate_limiter', limiter), \
+            patch('config.settings.rate_limit_enabled', True), \
+            patch('config.settings.api_key_enabled', False), \
+            patch('dependencies.get_http_client') as mock_get_client:
+        mock_client = AsyncMock()
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"test": "response"}
+        mock_response.content = b'{"test": "response"}'
+        mock_response.headers = {"content-type": "application/json"}
+        mock_client.post.return_value = mock_response
+        mock_get_client.return_value = mock_client
+
+        assert client.post("/api/route", json={"cellID": "1"}).status_code == 200
+        response = client.post("/api/route", json={"cellID": "1"})
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "2"
+        assert mock_client.post.call_count == 1
+
+
+def test_non_positive_rates_are_rejected():
+    """Test a rate of 0 is not silently treated as unlimited."""
+    with patch("config.settings.rate_limits_json", '{"blocked": {"rate": 0}, "vip": {"rate": 100, "burst": 5}}'):
+        assert load_client_limits() == {"vip": (100.0, 5.0)}
+
+    with pytest.raises(ValidationError):
+        Settings(rate_limit_rate=0)
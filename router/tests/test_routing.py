@@ -1,10 +1,16 @@
 """Tests for routing endpoints."""
+import asyncio
 import pytest
+import httpx
 from fastapi.testclient import TestClient
+from starlette.requests import Request
 from unittest.mock import patch, MagicMock, AsyncMock
 
 from main import app
 from config import settings
+from key_store import ApiKeyStore
+from balancer import get_balancer
+import routing
 
 client = TestClient(app)
 
@@ -17,6 +23,7 @@ def test_route_valid_cell():
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = {"test": "response"}
+        mock_response.content = b'{"test": "response"}'
         mock_response.headers = {"content-type": "application/json"}
         mock_client.post.return_value = mock_response
         mock_get_client.return_value = mock_client
@@ -45,7 +52,7 @@ def test_route_missing_cell_id():
 def test_route_with_auth_enabled():
     """Test routing with authentication enabled."""
     with patch('config.settings.api_key_enabled', True):
-        with patch('auth.VALID_API_KEYS', {"test-key": "test-client"}):
+        with patch('auth.key_store', ApiKeyStore.from_plaintext({"test-key": "test-client"})):
             # Without API key
             response = client.post("/api/route", json={"cellID": "1"})
             assert response.status_code == 401
@@ -56,6 +63,7 @@ def test_route_with_auth_enabled():
                 mock_response = MagicMock()
                 mock_response.status_code = 200
                 mock_response.json.return_value = {"test": "response"}
+                mock_response.content = b'{"test": "response"}'
                 mock_response.headers = {"content-type": "application/json"}
                 mock_client.post.return_value = mock_response
                 mock_get_client.return_value = mock_client
@@ -65,4 +73,128 @@ def test_route_with_auth_enabled():
                     json={"cellID": "1"},
                     headers={"X-API-Key": "test-key"}
                 )
-                assert response.status_code == 200
\ No newline at end of file
+                assert response.status_code == 200
+
+
+def test_route_batch_preserves_order():
+    """Test batch routing returns one result per item in request order."""
+    with patch('dependencies.get_http_client') as mock_get_client:
+        mock_client = AsyncMock()
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"test": "response"}
+        mock_response.content = b'{"test": "response"}'
+        mock_response.headers = {"content-type": "application/json"}
+        mock_client.post.return_value = mock_response
+        mock_get_client.return_value = mock_client
+
+        with patch('config.settings.api_key_enabled', False):
+            response = client.post(
+                "/api/route/batch",
+                json={"requests": [{"cellID": "3"}, {"cellID": "1"}, {"cellID": "2"}]}
+            )
+            assert response.status_code == 200
+            results = response.json()["results"]
+            assert [r["cellID"] for r in results] == ["3", "1", "2"]
+            assert all(r["status"] == 200 for r in results)
+            assert mock_client.post.call_count == 3
+
+
+def test_route_batch_item_error():
+    """Test a failing upstream call is reported per item without failing the batch."""
+    with patch('dependencies.get_http_client') as mock_get_client:
+        mock_client = AsyncMock()
+        mock_client.post.side_effect = httpx.ConnectError("connection refused")
+        mock_get_client.return_value = mock_client
+
+        with patch('config.settings.api_key_enabled', False):
+            response = client.post("/api/route/batch", json={"requests": [{"cellID": "1"}]})
+            assert response.status_code == 200
+            result = response.json()["results"][0]
+            assert result["status"] == 502
+            assert result["error"] == "Error connecting to nginx-1"
+
+
+def test_route_batch_invalid_cell():
+    """Test batch routing rejects invalid cell IDs."""
+    response = client.post("/api/route/batch", json={"requests": [{"cellID": "1"}, {"cellID": "999"}]})
+    assert response.status_code == 422
+
+
+def test_route_stream_mode():
+    """Test streaming mode passes the upstream body through with metadata headers."""
+    chunks = [b'{"payload": "', b"x" * 100000, b'"}']
+    body = b"".join(chunks)
+
+    class ChunkedStream(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            for chunk in chunks:
+                yield chunk
+
+    def handler(upstream_request):
+        return httpx.Response(201, stream=ChunkedStream(), headers={"content-type": "application/json"})
+
+    stream_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    with patch('dependencies.get_http_client', AsyncMock(return_value=stream_client)):
+        with patch('config.settings.api_key_enabled', False):
+            response = client.post("/api/route?stream=true", json={"cellID": "2"})
+            assert response.status_code == 201
+            assert response.content == body
+            assert response.headers["X-Cell-ID"] == "2"
+            assert response.headers["X-Upstream"] == "nginx-2"
+            assert response.headers["X-Upstream-Status"] == "201"
+
+
+def test_route_stream_cleanup_when_client_disconnects_before_body():
+    """Test the upstream response is closed and the endpoint released even if the body is never sent."""
+    closed = []
+
+    class TrackedStream(httpx.AsyncByteStream):
+        async def __aiter__(self):
+            yield b"{}"
+
+        async def aclose(self):
+            closed.append(True)
+
+    stream_client = httpx.AsyncClient(transport=httpx.MockTransport(
+        lambda upstream_request: httpx.Response(200, stream=TrackedStream())
+    ))
+    scope = {"type": "http", "method": "POST", "path": "/api/route", "headers": [], "query_string": b""}
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        raise OSError("connection reset by peer")
+
+    async def run():
+        response = await routing.stream_from_cell("2", "client", Request(scope))
+        with pytest.raises(OSError):
+            await response(scope, receive, send)
+
+    with patch('dependencies.get_http_client', AsyncMock(return_value=stream_client)):
+        asyncio.run(run())
+
+    assert closed == [True]
+    assert all(endpoint.outstanding == 0 for endpoint in get_balancer("2").endpoints)
+
+
+def test_route_malformed_upstream_json():
+    """Test a truncated upstream JSON body is answered with 500, not spliced into the response or cached."""
+    mock_client = AsyncMock()
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.content = b'{"a": '
+    mock_response.headers = {"content-type": "application/json"}
+    mock_client.post.return_value = mock_response
+
+    with patch('dependencies.get_http_client', AsyncMock(return_value=mock_client)), \
+            patch('config.settings.api_key_enabled', False), \
+            patch('config.settings.cache_enabled', True):
+        response = client.post("/api/route", json={"cellID": "3"})
+        assert response.status_code == 500
+
+        response = client.post("/api/route/batch", json={"requests": [{"cellID": "3"}]})
+        assert response.status_code == 200
+        assert response.json()["results"][0]["status"] == 500
+        assert mock_client.post.call_count == 2
@@ -0,0 +1,56 @@
+"""Tests for per-phase request timing."""
+import asyncio
+from unittest.mock import patch
+
+import httpx
+from fastapi.testclient import TestClient
+
+from key_store import ApiKeyStore
+from main import app
+from timing import PhaseTimer, UpstreamTrace
+
+client = TestClient(app)
+
+
+def test_upstream_trace_splits_attempt_into_phases():
+    """Test httpcore trace events are turned into pool wait, connect and time to first byte."""
+    trace = UpstreamTrace()
+
+    async def replay():
+        for event in (
+            "connection.connect_tcp.started",
+            "connection.connect_tcp.complete",
+            "http11.send_request_headers.started",
+            "http11.send_request_headers.complete",
+            "http11.receive_response_headers.started",
+            "http11.receive_response_headers.complete",
+        ):
+            await trace(event, {})
+
+    asyncio.run(replay())
+    timer = PhaseTimer()
+    trace.record(timer)
+
+    assert list(timer.durations) == ["pool_wait", "connect", "ttfb"]
+    assert all(seconds >= 0 for seconds in timer.durations.values())
+    assert timer.upstream_done is not None
+
+
+def test_server_timing_header_lists_phases():
+    """Test an authenticated request reports its phases in Server-Timing only when enabled."""
+    async def get_client(cell_id=None):
+        return httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json={})))
+
+    with patch("dependencies.get_http_client", get_client), \
+            patch("auth.key_store", ApiKeyStore.from_plaintext({"test-key": "test-client"})), \
+            patch("config.settings.api_key_enabled", True):
+        response = client.post("/api/route", json={"cellID": "1"}, headers={"X-API-Key": "test-key"})
+        assert response.status_code == 200
+        assert "server-timing" not in response.headers
+
+        with patch("config.settings.server_timing_enabled", True):
+            response = client.post("/api/route", json={"cellID": "1"}, headers={"X-API-Key": "test-key"})
+
+    assert response.status_code == 200
+    phases = [metric.split(";")[0] for metric in response.headers["server-timing"].split(", ")]
+    assert phases == ["validation", "auth", "ttfb", "serialize", "total"]
@@ -2,313 +2,339 @@
 """
 Fuzzy load test script for Cell Router API
 Generates various types of traffic to populate monitoring dashboards
+
+Traffic is open-loop: requests are sent at a fixed (or linearly ramped)
+arrival rate whether or not earlier requests have answered, over keep-alive
+connections. Latency is measured from each request's intended send time,
+so a stalled router shows up in the percentiles instead of silently
+slowing the generator down (coordinated omission). Results are printed and
+optionally written as JSON with p50 to p99.99 from HDR-style histograms.
+
+Usage:
+    python scripts/fuzzy-load-test.py [--rate 50] [--ramp-to 500] [--duration 300] [--output results.json]
 """
 
-import requests
-import random
-import time
+import sys
 import json
-import threading
-from datetime import datetime, timedelta
+import time
+import random
 import signal
-import sys
+import asyncio
+import argparse
+from typing import Dict, Optional, Tuple
+
+import httpx
 
 # Configuration
 ROUTER_URL = "http://localhost:8080"  # Change if using different port
-API_ENDPOINT = f"{ROUTER_URL}/api/route"
-HEALTH_ENDPOINT = f"{ROUTER_URL}/health"
-METRICS_ENDPOINT = f"{ROUTER_URL}/metrics"
 
 # Test configuration
 VALID_API_KEYS = ["demo-key-1", "demo-key-2", "test-key"]
 INVALID_API_KEYS = ["wrong-key", "expired-key", "hack-attempt", ""]
-VALID_CELL_IDS = ["1", "2", "3"]
+VALID_CELL_IDS = ["1", "2", "3"]  # Replaced by the router's cell registry at startup
 INVALID_CELL_IDS = ["4", "99", "0", "-1", "abc", ""]
 
-# Test duration
-TEST_DURATION_MINUTES = 5
-END_TIME = datetime.now() + timedelta(minutes=TEST_DURATION_MINUTES)
-
-# Statistics
-stats = {
-    "total_requests": 0,
-    "successful": 0,
-    "auth_failures": 0,
-    "validation_errors": 0,
-    "server_errors": 0,
-    "timeouts": 0
-}
-
-# Thread-safe lock for stats
-stats_lock = threading.Lock()
-
-# Flag to stop threads
-stop_threads = False
-
-
-def signal_handler(sig, frame):
-    """Handle Ctrl+C gracefully"""
-    global stop_threads
-    print("\n\nStopping test gracefully...")
-    stop_threads = True
-    sys.exit(0)
-
-
-signal.signal(signal.SIGINT, signal_handler)
-
-
-def update_stats(key):
-    """Thread-safe stats update"""
-    with stats_lock:
-        stats[key] += 1
-        stats["total_requests"] += 1
-
-
-def send_request(cell_id, api_key=None, timeout=5):
-    """Send a single request to the router"""
-    headers = {
-        "Content-Type": "application/json"
-    }
-    
-    if api_key:
-        headers["X-API-Key"] = api_key
-    
-    payload = {"cellID": cell_id}
-    
-    try:
-        response = requests.post(
-            API_ENDPOINT,
-            json=payload,
-            headers=headers,
-            timeout=timeout
-        )
-        
-        if response.status_code == 200:
-            update_stats("successful")
-            return "success", response.status_code
-        elif response.status_code == 401:
-            update_stats("auth_failures")
-            return "auth_failed", response.status_code
-        elif response.status_code == 403:
-            update_stats("auth_failures")
-            return "forbidden", response.status_code
-        elif response.status_code == 422:
-            update_stats("validation_errors")
-            return "validation_error", response.status_code
-        elif response.status_code >= 500:
-            update_stats("server_errors")
-            return "server_error", response.status_code
-        else:
-            return "other", response.status_code
-            
-    except requests.exceptions.Timeout:
-        update_stats("timeouts")
-        return "timeout", 0
-    except Exception as e:
-        return "error", 0
-
-
-def normal_traffic_pattern():
-    """Simulate normal traffic with valid requests"""
-    while datetime.now() < END_TIME and not stop_threads:
-        cell_id = random.choice(VALID_CELL_IDS)
-        api_key = random.choice(VALID_API_KEYS)
-        
-        send_request(cell_id, api_key)
-        
-        # Normal rate: 1-5 requests per second
-        time.sleep(random.uniform(0.2, 1.0))
-
-
-def burst_traffic_pattern():
-    """Simulate burst traffic"""
-    while datetime.now() < END_TIME and not stop_threads:
-        # Burst for 10-30 seconds
-        burst_duration = random.uniform(10, 30)
-        burst_end = datetime.now() + timedelta(seconds=burst_duration)
-        
-        print(f"\n🚀 Starting burst traffic for {burst_duration:.0f} seconds...")
-        
-        while datetime.now() < burst_end and not stop_threads:
+# Share of requests per traffic pattern outside bursts
+DEFAULT_MIX = {"normal": 0.6, "targeted": 0.2, "invalid": 0.15, "slow": 0.05}
+
+PERCENTILES = [50, 75, 90, 95, 99, 99.9, 99.99]
+
+
+class Histogram:
+    """HDR-style latency histogram with a fixed number of significant digits.
+
+    Values (in microseconds) fall into buckets whose width grows with the
+    value, so the relative error stays below 10^-digits over the whole range
+    while memory stays proportional to the number of distinct buckets used.
+    """
+
+    def __init__(self, significant_digits: int = 3):
+        # Enough sub-buckets per power of two to resolve the requested digits
+        self.sub_bucket_bits = (2 * 10 ** significant_digits - 1).bit_length()
+        self.counts: Dict[Tuple[int, int], int] = {}
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, seconds: float):
+        value = max(0, int(seconds * 1_000_000))
+        shift = max(0, value.bit_length() - self.sub_bucket_bits)
+        key = (shift, value >> shift)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.total += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, percentile: float) -> float:
+        """Return the value at a percentile in milliseconds."""
+        if not self.total:
+            return 0.0
+        target = max(1, round(self.total * percentile / 100))
+        seen = 0
+        for shift, sub_bucket in sorted(self.counts, key=lambda key: key[1] << key[0]):
+            seen += self.counts[(shift, sub_bucket)]
+            if seen >= target:
+                # Report the highest value that falls into the bucket, as HdrHistogram does
+                return min(self.max, ((sub_bucket + 1) << shift) - 1) / 1000
+        return self.max / 1000
+
+    def summary(self) -> Dict[str, float]:
+        summary = {f"p{p:g}": round(self.percentile(p), 3) for p in PERCENTILES}
+        summary["min"] = round((self.min or 0) / 1000, 3)
+        summary["max"] = round(self.max / 1000, 3)
+        summary["count"] = self.total
+        return summary
+
+
+class LoadTest:
+    """Open-loop traffic generator with per-pattern latency histograms."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.api_endpoint = f"{args.url}/api/route"
+        self.mix = DEFAULT_MIX if not args.mix else json.loads(args.mix)
+        # Corrected latency (from intended send time) and raw service time
+        self.latency = {pattern: Histogram() for pattern in [*self.mix, "burst"]}
+        self.service = Histogram()
+        self.overall = Histogram()
+        self.stats = {
+            "total_requests": 0,
+            "successful": 0,
+            "auth_failures": 0,
+            "validation_errors": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "dropped": 0,
+        }
+        self.inflight = 0
+        self.stopping = False
+
+    def rate_at(self, elapsed: float) -> float:
+        """Arrival rate at a point in the run, ramped and boosted during bursts."""
+        args = self.args
+        rate = args.rate
+        if args.ramp_to is not None:
+            rate += (args.ramp_to - args.rate) * min(1.0, elapsed / args.duration)
+        if self.in_burst(elapsed):
+            rate *= args.burst_factor
+        return rate
+
+    def in_burst(self, elapsed: float) -> bool:
+        args = self.args
+        return args.burst_every > 0 and elapsed % args.burst_every < args.burst_duration
+
+    def choose_request(self, elapsed: float) -> Tuple[str, str, Optional[str], float]:
+        """Pick a traffic pattern and build its (pattern, cell_id, api_key, timeout)."""
+        timeout = self.args.timeout
+        if self.in_burst(elapsed):
             # 80% valid requests during burst
             if random.random() < 0.8:
-                cell_id = random.choice(VALID_CELL_IDS)
-                api_key = random.choice(VALID_API_KEYS)
+                return "burst", random.choice(VALID_CELL_IDS), random.choice(VALID_API_KEYS), 2.0
+            return (
+                "burst",
+                random.choice(VALID_CELL_IDS + INVALID_CELL_IDS),
+                random.choice(VALID_API_KEYS + INVALID_API_KEYS),
+                2.0,
+            )
+
+        pattern = random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if pattern == "targeted":
+            # 60% to the first cell, 30% to the second, 10% to the third
+            rand = random.random()
+            if rand < 0.6:
+                cell_id = VALID_CELL_IDS[0]
+            elif rand < 0.9:
+                cell_id = VALID_CELL_IDS[1 % len(VALID_CELL_IDS)]
             else:
-                cell_id = random.choice(VALID_CELL_IDS + INVALID_CELL_IDS)
-                api_key = random.choice(VALID_API_KEYS + INVALID_API_KEYS)
-            
-            send_request(cell_id, api_key, timeout=2)
-            
-            # High rate: 10-50 requests per second
-            time.sleep(random.uniform(0.02, 0.1))
-        
-        # Cool down period
-        cooldown = random.uniform(20, 40)
-        print(f"💤 Cooling down for {cooldown:.0f} seconds...")
-        time.sleep(cooldown)
-
-
-def invalid_requests_pattern():
-    """Simulate various invalid requests"""
-    while datetime.now() < END_TIME and not stop_threads:
-        request_type = random.choice([
-            "invalid_cell",
-            "invalid_api_key",
-            "missing_api_key",
-            "both_invalid",
-            "malformed"
-        ])
-        
-        if request_type == "invalid_cell":
-            cell_id = random.choice(INVALID_CELL_IDS)
-            api_key = random.choice(VALID_API_KEYS)
-        elif request_type == "invalid_api_key":
-            cell_id = random.choice(VALID_CELL_IDS)
-            api_key = random.choice(INVALID_API_KEYS)
-        elif request_type == "missing_api_key":
-            cell_id = random.choice(VALID_CELL_IDS)
-            api_key = None
-        elif request_type == "both_invalid":
-            cell_id = random.choice(INVALID_CELL_IDS)
-            api_key = random.choice(INVALID_API_KEYS)
-        else:  # malformed
-            cell_id = ""
-            api_key = ""
-        
-        send_request(cell_id, api_key)
-        
-        # Moderate rate for invalid requests
-        time.sleep(random.uniform(0.5, 2.0))
-
-
-def slow_requests_pattern():
-    """Simulate slow requests that might timeout"""
-    while datetime.now() < END_TIME and not stop_threads:
-        cell_id = random.choice(VALID_CELL_IDS)
-        api_key = random.choice(VALID_API_KEYS)
-        
-        # Use very short timeout to simulate timeouts
-        send_request(cell_id, api_key, timeout=0.1)
-        
-        # Slow rate
-        time.sleep(random.uniform(5, 10))
-
-
-def targeted_cell_pattern():
-    """Target specific cells to show distribution"""
-    while datetime.now() < END_TIME and not stop_threads:
-        # 60% to cell 1, 30% to cell 2, 10% to cell 3
-        rand = random.random()
-        if rand < 0.6:
-            cell_id = "1"
-        elif rand < 0.9:
-            cell_id = "2"
-        else:
-            cell_id = "3"
-        
-        api_key = random.choice(VALID_API_KEYS)
-        send_request(cell_id, api_key)
-        
-        time.sleep(random.uniform(0.3, 0.7))
-
-
-def health_check_pattern():
-    """Periodic health checks"""
-    while datetime.now() < END_TIME and not stop_threads:
+                cell_id = VALID_CELL_IDS[2 % len(VALID_CELL_IDS)]
+            return pattern, cell_id, random.choice(VALID_API_KEYS), timeout
+        if pattern == "invalid":
+            request_type = random.choice([
+                "invalid_cell", "invalid_api_key", "missing_api_key", "both_invalid", "malformed"
+            ])
+            if request_type == "invalid_cell":
+                return pattern, random.choice(INVALID_CELL_IDS), random.choice(VALID_API_KEYS), timeout
+            if request_type == "invalid_api_key":
+                return pattern, random.choice(VALID_CELL_IDS), random.choice(INVALID_API_KEYS), timeout
+            if request_type == "missing_api_key":
+                return pattern, random.choice(VALID_CELL_IDS), None, timeout
+            if request_type == "both_invalid":
+                return pattern, random.choice(INVALID_CELL_IDS), random.choice(INVALID_API_KEYS), timeout
+            return pattern, "", "", timeout
+        if pattern == "slow":
+            # Use very short timeout to simulate timeouts
+            return pattern, random.choice(VALID_CELL_IDS), random.choice(VALID_API_KEYS), 0.1
+        return pattern, random.choice(VALID_CELL_IDS), random.choice(VALID_API_KEYS), timeout
+
+    def count(self, status_code: int):
+        if status_code == 200:
+            self.stats["successful"] += 1
+        elif status_code in (401, 403):
+            self.stats["auth_failures"] += 1
+        elif status_code == 422:
+            self.stats["validation_errors"] += 1
+        elif status_code == 429:
+            self.stats["rate_limited"] += 1
+        elif status_code >= 500:
+            self.stats["server_errors"] += 1
+
+    async def send_request(self, client: httpx.AsyncClient, intended: float, elapsed: float):
+        """Send a single request to the router and record its latency from the intended send time."""
+        pattern, cell_id, api_key, timeout = self.choose_request(elapsed)
+        headers = {"Content-Type": "application/json"}
+        if api_key:
+            headers["X-API-Key"] = api_key
+
+        self.inflight += 1
+        sent = time.perf_counter()
         try:
-            response = requests.get(HEALTH_ENDPOINT, timeout=5)
-            if response.status_code == 200:
-                print("✅ Health check: OK")
-            else:
-                print(f"❌ Health check failed: {response.status_code}")
-        except Exception as e:
-            print(f"❌ Health check error: {e}")
-        
-        # Check every 30 seconds
-        time.sleep(30)
-
-
-def print_stats():
-    """Print statistics periodically"""
-    while datetime.now() < END_TIME and not stop_threads:
-        time.sleep(10)
-        with stats_lock:
-            total = stats["total_requests"]
+            response = await client.post(self.api_endpoint, json={"cellID": cell_id}, headers=headers, timeout=timeout)
+            self.count(response.status_code)
+        except httpx.TimeoutException:
+            self.stats["timeouts"] += 1
+        except httpx.HTTPError:
+            self.stats["errors"] += 1
+        finally:
+            done = time.perf_counter()
+            self.inflight -= 1
+            self.stats["total_requests"] += 1
+            self.latency[pattern].record(done - intended)
+            self.overall.record(done - intended)
+            self.service.record(done - sent)
+
+    async def run(self) -> Dict:
+        args = self.args
+        limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+        tasks = set()
+
+        async with httpx.AsyncClient(limits=limits) as client:
+            reporter = asyncio.create_task(self.report_progress())
+            start = time.perf_counter()
+            next_send = start
+
+            while not self.stopping:
+                elapsed = next_send - start
+                if elapsed >= args.duration:
+                    break
+
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                if self.inflight >= args.max_inflight:
+                    # The router is not keeping up: count the request as lost rather than queueing it here
+                    self.stats["dropped"] += 1
+                else:
+                    task = asyncio.create_task(self.send_request(client, next_send, elapsed))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+                interval = 1.0 / self.rate_at(elapsed)
+                next_send += random.expovariate(1.0 / interval) if args.poisson else interval
+
+            if tasks:
+                await asyncio.wait(tasks, timeout=args.timeout + 1)
+            reporter.cancel()
+            wall = time.perf_counter() - start
+
+        return {
+            "target": args.url,
+            "duration_s": round(wall, 3),
+            "rate": {"start": args.rate, "end": args.ramp_to if args.ramp_to is not None else args.rate},
+            "achieved_rps": round(self.stats["total_requests"] / wall, 1) if wall else 0.0,
+            "stats": self.stats,
+            "latency_ms": self.overall.summary(),
+            "service_time_ms": self.service.summary(),
+            "patterns": {pattern: hist.summary() for pattern, hist in self.latency.items() if hist.total},
+        }
+
+    async def report_progress(self):
+        """Print statistics periodically"""
+        while True:
+            await asyncio.sleep(10)
+            total = self.stats["total_requests"]
             if total > 0:
-                success_rate = (stats["successful"] / total) * 100
-                error_rate = ((stats["server_errors"] + stats["timeouts"]) / total) * 100
-                
                 print(f"\n📊 Stats Update:")
                 print(f"  Total Requests: {total}")
-                print(f"  Success Rate: {success_rate:.1f}%")
-                print(f"  Error Rate: {error_rate:.1f}%")
-                print(f"  Auth Failures: {stats['auth_failures']}")
-                print(f"  Validation Errors: {stats['validation_errors']}")
-                print(f"  Timeouts: {stats['timeouts']}")
-                print(f"  Time Remaining: {(END_TIME - datetime.now()).seconds}s")
+                print(f"  Success Rate: {self.stats['successful'] / total * 100:.1f}%")
+                print(f"  In Flight: {self.inflight}  Dropped: {self.stats['dropped']}")
+                print(f"  p50/p99/p99.9: {self.overall.percentile(50):.1f} / "
+                      f"{self.overall.percentile(99):.1f} / {self.overall.percentile(99.9):.1f} ms")
+
+
+def load_cell_ids(url: str):
+    """Fetch the configured cell IDs from the router's cell registry"""
+    global VALID_CELL_IDS, INVALID_CELL_IDS
+    try:
+        response = httpx.get(f"{url}/api/cells", headers={"X-API-Key": VALID_API_KEYS[0]}, timeout=5)
+        response.raise_for_status()
+        cells = response.json()["cells"]
+    except Exception as e:
+        print(f"⚠️  Could not fetch cells from {url}/api/cells ({e}), using {VALID_CELL_IDS}")
+        return
+
+    if cells:
+        VALID_CELL_IDS = cells
+        INVALID_CELL_IDS = [cell_id for cell_id in INVALID_CELL_IDS if cell_id not in cells]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=ROUTER_URL, help="Router base URL")
+    parser.add_argument("--duration", type=float, default=300.0, help="Test duration in seconds")
+    parser.add_argument("--rate", type=float, default=50.0, help="Arrival rate in requests per second")
+    parser.add_argument("--ramp-to", type=float, help="Ramp the arrival rate linearly to this value")
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times instead of fixed")
+    parser.add_argument("--mix", help=f"Pattern weights as JSON, default {json.dumps(DEFAULT_MIX)}")
+    parser.add_argument("--burst-every", type=float, default=60.0, help="Seconds between bursts, 0 disables")
+    parser.add_argument("--burst-duration", type=float, default=15.0, help="Burst length in seconds")
+    parser.add_argument("--burst-factor", type=float, default=5.0, help="Rate multiplier during bursts")
+    parser.add_argument("--connections", type=int, default=100, help="Keep-alive connections to the router")
+    parser.add_argument("--max-inflight", type=int, default=10000, help="Requests in flight before new ones are dropped")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Request timeout in seconds")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    return parser.parse_args()
 
 
 def main():
     """Main function to run the fuzzy test"""
+    args = parse_args()
+    load_cell_ids(args.url)
+    ramp = f" → {args.ramp_to:g}" if args.ramp_to is not None else ""
     print(f"""
 🧪 Cell Router Fuzzy Load Test
 ================================
-Duration: {TEST_DURATION_MINUTES} minutes
-Target: {ROUTER_URL}
+Duration: {args.duration:g} seconds
+Target: {args.url}
+Rate: {args.rate:g}{ramp} req/s (open loop)
+Cells: {len(VALID_CELL_IDS)}
 Press Ctrl+C to stop early
 ================================
     """)
-    
-    # Create threads for different traffic patterns
-    threads = [
-        threading.Thread(target=normal_traffic_pattern, name="Normal"),
-        threading.Thread(target=burst_traffic_pattern, name="Burst"),
-        threading.Thread(target=invalid_requests_pattern, name="Invalid"),
-        threading.Thread(target=slow_requests_pattern, name="Slow"),
-        threading.Thread(target=targeted_cell_pattern, name="Targeted"),
-        threading.Thread(target=health_check_pattern, name="Health"),
-        threading.Thread(target=print_stats, name="Stats")
-    ]
-    
-    # Start all threads
-    for thread in threads:
-        thread.daemon = True
-        thread.start()
-        print(f"✅ Started {thread.name} traffic pattern")
-    
-    # Wait for test duration or interruption
-    try:
-        while datetime.now() < END_TIME and not stop_threads:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        pass
-    
+
+    test = LoadTest(args)
+
+    def stop(sig, frame):
+        """Handle Ctrl+C gracefully"""
+        print("\n\nStopping test gracefully...")
+        test.stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    results = asyncio.run(test.run())
+
     # Final statistics
-    print("\n\n" + "="*50)
+    print("\n\n" + "=" * 50)
     print("🏁 FINAL TEST RESULTS")
-    print("="*50)
-    
-    with stats_lock:
-        total = stats["total_requests"]
-        if total > 0:
-            print(f"Total Requests: {total}")
-            print(f"Successful: {stats['successful']} ({stats['successful']/total*100:.1f}%)")
-            print(f"Auth Failures: {stats['auth_failures']} ({stats['auth_failures']/total*100:.1f}%)")
-            print(f"Validation Errors: {stats['validation_errors']} ({stats['validation_errors']/total*100:.1f}%)")
-            print(f"Server Errors: {stats['server_errors']} ({stats['server_errors']/total*100:.1f}%)")
-            print(f"Timeouts: {stats['timeouts']} ({stats['timeouts']/total*100:.1f}%)")
-            
-            # Calculate requests per second
-            duration_seconds = TEST_DURATION_MINUTES * 60
-            rps = total / duration_seconds
-            print(f"\nAverage RPS: {rps:.2f}")
-        else:
-            print("No requests were sent. Check if the router is running.")
-    
-    print("\n✅ Test completed! Check your Grafana dashboards.")
-    print(f"   http://localhost:3000")
+    print("=" * 50)
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())